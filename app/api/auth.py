@@ -11,6 +11,7 @@ from app.schemas.user import (
 )
 from app.core.security import hash_password, verify_password, create_access_token
 from app.core.dependencies import get_current_user
+from app.services.user_card_service import invalidate_user_card
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
@@ -115,6 +116,7 @@ async def update_current_user(
     db.add(current_user)
     await db.commit()
     await db.refresh(current_user)
+    await invalidate_user_card(current_user.id)
     
     return UserResponse.from_orm(current_user)
 
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
+from typing import Optional
+from datetime import datetime
 from uuid import UUID
 
 from app.database import get_db
-from app.models import FeedPost, Like, Comment, User, Reel
+from app.models import FeedPost, Comment, User, Reel
 from app.schemas.feed import (
     FeedPostCreate, FeedPostUpdate, FeedPostResponse,
-    CommentCreate, CommentResponse, LikeResponse
+    CommentCreate, CommentResponse, LikeResponse,
+    CommentThreadResponse, CommentThreadPage, CommentReplyResponse, CommentReplyPage,
+    TagCountResponse
 )
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_optional_user
+from app.services.image_derivative_service import resolve_image_assets
+from app.services.engagement_counter_service import get_engagement_counter_service
+from app.services.feed_ranking_service import get_feed_ranking_service
+from app.services.follow_service import get_follow_service, to_score
+from app.services.user_card_service import UserCardLoader, get_user_card_loader
+from app.services.tag_service import sync_post_tags, tag_page, get_trending_tag_service
+from app.services.comment_thread_service import load_threads, load_replies
+from app.services.like_service import add_like, remove_like, mark_liked, LikeTargetNotFoundError
 
 router = APIRouter(prefix="/api/feed", tags=["feed"])
 
@@ -17,45 +29,100 @@ router = APIRouter(prefix="/api/feed", tags=["feed"])
 async def get_feed(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    refresh: bool = Query(False),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
-    """Get user feed (chronological + trending)"""
-    result = await db.execute(
-        select(FeedPost)
-        .where(FeedPost.is_published == True)
-        .order_by(desc(FeedPost.created_at))
-        .offset(skip)
-        .limit(limit)
+    """Get user feed (ranked recent + trending + similar; refresh=true re-ranks)"""
+    posts = await get_feed_ranking_service().page(db, current_user.id, skip, limit, refresh)
+    
+    items = await get_engagement_counter_service().overlay(
+        "feed_posts", [FeedPostResponse.from_orm(post) for post in posts]
     )
-    posts = result.scalars().all()
+    await mark_liked(db, current_user, "post", items)
+    return await loader.attach(items)
+
+@router.get("/following", response_model=list[FeedPostResponse])
+async def get_following_feed(
+    before: Optional[datetime] = Query(None, description="created_at of the last post on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Posts from people the user follows, newest first"""
+    posts = await get_follow_service().timeline(
+        db, "posts", current_user.id, to_score(before) if before else None, limit
+    )
+    
+    items = await get_engagement_counter_service().overlay(
+        "feed_posts", [FeedPostResponse.from_orm(post) for post in posts]
+    )
+    await mark_liked(db, current_user, "post", items)
+    return await loader.attach(items)
+
+@router.get("/tags/trending", response_model=list[TagCountResponse])
+async def get_trending_tags(
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Most used tags over the last 24h"""
+    return [TagCountResponse(tag=tag, count=count) for tag, count in await get_trending_tag_service().top(limit)]
+
+@router.get("/tags/{tag}/posts", response_model=list[FeedPostResponse])
+async def get_tag_posts(
+    tag: str,
+    before: Optional[datetime] = Query(None, description="created_at of the last post on the previous page"),
+    before_id: Optional[UUID] = Query(None, description="id of the last post on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Newest posts with a tag"""
+    posts = await tag_page(db, tag, before, before_id, limit)
     
-    return [FeedPostResponse.from_orm(post) for post in posts]
+    items = await get_engagement_counter_service().overlay(
+        "feed_posts", [FeedPostResponse.from_orm(post) for post in posts]
+    )
+    await mark_liked(db, current_user, "post", items)
+    return await loader.attach(items)
 
 @router.post("/posts", response_model=FeedPostResponse, status_code=status.HTTP_201_CREATED)
 async def create_post(
     post_data: FeedPostCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Create new feed post"""
     new_post = FeedPost(
         user_id=current_user.id,
         caption=post_data.caption,
-        images=post_data.images,
+        images=await resolve_image_assets(db, post_data.images),
         tags=post_data.tags,
     )
     
     db.add(new_post)
+    await db.flush()
+    new_tags = await sync_post_tags(db, new_post)
     await db.commit()
     await db.refresh(new_post)
+    await get_trending_tag_service().record(new_tags)
+    
+    # Push into followers' timelines after the response goes out
+    background_tasks.add_task(
+        get_follow_service().publish, "posts", current_user.id, new_post.id, new_post.created_at
+    )
     
-    return FeedPostResponse.from_orm(new_post)
+    return (await loader.attach([FeedPostResponse.from_orm(new_post)]))[0]
 
 @router.get("/posts/{post_id}", response_model=FeedPostResponse)
 async def get_post(
     post_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Get single post"""
     result = await db.execute(
@@ -69,14 +136,16 @@ async def get_post(
             detail="Post not found"
         )
     
-    return FeedPostResponse.from_orm(post)
+    items = await get_engagement_counter_service().overlay("feed_posts", [FeedPostResponse.from_orm(post)])
+    return (await loader.attach(items))[0]
 
 @router.put("/posts/{post_id}", response_model=FeedPostResponse)
 async def update_post(
     post_id: UUID,
     post_data: FeedPostUpdate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Update post"""
     result = await db.execute(
@@ -97,14 +166,19 @@ async def update_post(
         )
     
     update_data = post_data.dict(exclude_unset=True)
+    if update_data.get("images") is not None:
+        update_data["images"] = await resolve_image_assets(db, update_data["images"])
     for field, value in update_data.items():
         setattr(post, field, value)
     
     db.add(post)
+    new_tags = await sync_post_tags(db, post) if "tags" in update_data else []
     await db.commit()
     await db.refresh(post)
+    await get_trending_tag_service().record(new_tags)
     
-    return FeedPostResponse.from_orm(post)
+    items = await get_engagement_counter_service().overlay("feed_posts", [FeedPostResponse.from_orm(post)])
+    return (await loader.attach(items))[0]
 
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
@@ -126,6 +200,7 @@ async def delete_post(
     
     await db.delete(post)
     await db.commit()
+    await get_follow_service().retract("posts", post.user_id, post_id)
 
 @router.post("/posts/{post_id}/like")
 async def like_post(
@@ -133,45 +208,20 @@ async def like_post(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Like a post"""
-    # Check post exists
-    post_result = await db.execute(
-        select(FeedPost).where(FeedPost.id == post_id)
-    )
-    post = post_result.scalars().first()
-    
-    if not post:
+    """Like a post (idempotent)"""
+    try:
+        created = await add_like(db, current_user.id, "post", post_id)
+    except LikeTargetNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
     
-    # Check if already liked
-    like_result = await db.execute(
-        select(Like).where(
-            (Like.user_id == current_user.id) &
-            (Like.post_id == post_id)
-        )
-    )
-    existing_like = like_result.scalars().first()
+    # Only a new like moves the count (write-behind, so the post row is not locked)
+    if created:
+        await get_engagement_counter_service().incr(db, "feed_posts", post_id, "like_count", 1)
     
-    if existing_like:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already liked"
-        )
-    
-    # Create like
-    new_like = Like(user_id=current_user.id, post_id=post_id)
-    db.add(new_like)
-    
-    # Update like count
-    post.like_count += 1
-    db.add(post)
-    
-    await db.commit()
-    
-    return {"status": "success"}
+    return {"status": "success", "liked": True}
 
 @router.post("/posts/{post_id}/unlike")
 async def unlike_post(
@@ -179,44 +229,19 @@ async def unlike_post(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Unlike a post"""
-    # Get like
-    like_result = await db.execute(
-        select(Like).where(
-            (Like.user_id == current_user.id) &
-            (Like.post_id == post_id)
-        )
-    )
-    like = like_result.scalars().first()
+    """Unlike a post (idempotent)"""
+    if await remove_like(db, current_user.id, "post", post_id):
+        await get_engagement_counter_service().incr(db, "feed_posts", post_id, "like_count", -1)
     
-    if not like:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Like not found"
-        )
-    
-    # Delete like
-    await db.delete(like)
-    
-    # Update like count
-    post_result = await db.execute(
-        select(FeedPost).where(FeedPost.id == post_id)
-    )
-    post = post_result.scalars().first()
-    if post and post.like_count > 0:
-        post.like_count -= 1
-        db.add(post)
-    
-    await db.commit()
-    
-    return {"status": "success"}
+    return {"status": "success", "liked": False}
 
 @router.get("/posts/{post_id}/comments", response_model=list[CommentResponse])
 async def get_post_comments(
     post_id: UUID,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Get post comments"""
     result = await db.execute(
@@ -228,14 +253,51 @@ async def get_post_comments(
     )
     comments = result.scalars().all()
     
-    return [CommentResponse.from_orm(comment) for comment in comments]
+    return await loader.attach([CommentResponse.from_orm(comment) for comment in comments])
+
+@router.get("/posts/{post_id}/comments/thread", response_model=CommentThreadPage)
+async def get_post_comment_threads(
+    post_id: UUID,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    replies: int = Query(3, ge=0, le=20),
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Top-level comments with their first replies and reply counts"""
+    try:
+        page = await load_threads(db, "post", post_id, cursor, limit, replies)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    threads = [CommentThreadResponse.model_validate(thread) for thread in page["items"]]
+    await loader.attach(threads + [reply for thread in threads for reply in thread.replies])
+    return CommentThreadPage(items=threads, next_cursor=page["next_cursor"])
+
+@router.get("/comments/{comment_id}/replies", response_model=CommentReplyPage)
+async def get_comment_replies(
+    comment_id: UUID,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Replies to a post or reel comment, oldest first"""
+    try:
+        page = await load_replies(db, comment_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    items = await loader.attach([CommentReplyResponse.model_validate(reply) for reply in page["items"]])
+    return CommentReplyPage(items=items, next_cursor=page["next_cursor"])
 
 @router.post("/posts/{post_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def create_post_comment(
     post_id: UUID,
     comment_data: CommentCreate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Create post comment"""
     # Verify post exists
@@ -258,10 +320,8 @@ async def create_post_comment(
     )
     
     db.add(new_comment)
-    post.comment_count += 1
-    db.add(post)
-    
     await db.commit()
     await db.refresh(new_comment)
+    await get_engagement_counter_service().incr(db, "feed_posts", post_id, "comment_count", 1)
     
-    return CommentResponse.from_orm(new_comment)
+    return (await loader.attach([CommentResponse.from_orm(new_comment)]))[0]
@@ -1,61 +1,159 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from uuid import UUID, uuid4
-import os
-from pathlib import Path
-from typing import List
+from typing import Awaitable, Dict, List
+from datetime import datetime, timedelta
+import base64
+import binascii
+import io
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
+from app.config import get_settings
 from app.models.user import User
+from app.models.media import MediaUpload, TranscodeJob
+from app.schemas.media import UploadIntentRequest, UploadIntentResponse, UploadFinalizeResponse
 from app.core.dependencies import get_current_user
-from app.services.storage_service import StorageService
+from app.services.storage_service import get_storage_service
+from app.services.image_derivative_service import get_image_derivative_service
+from app.services.look_snapshot_service import IMMUTABLE_CACHE_CONTROL
+from app.services.media_dedup_service import (
+    content_key,
+    acquire_object,
+    register_object,
+    release_object,
+    CONTENT_PREFIX
+)
+from app.services.transcode_service import get_transcode_service
+from app.services.resumable_upload_service import (
+    get_resumable_upload_service,
+    UploadSessionNotFoundError,
+    UploadOffsetMismatchError,
+    UploadLockedError
+)
+from app.services.media_ingest_service import (
+    stream_upload,
+    stream_uploads,
+    multipart_file_chunks,
+    read_upload,
+    sniff_content_type,
+    EXTENSIONS,
+    UploadTooLargeError,
+    UnsupportedMediaTypeError,
+    MalformedUploadError
+)
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
-storage_service = StorageService()
 
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
 ALLOWED_VIDEO_TYPES = {"video/mp4", "video/webm", "video/quicktime"}
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB
+MAX_FORM_OVERHEAD = 64 * 1024  # Boundaries and part headers around a streamed file
 
-@router.post("/image")
-async def upload_image(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
-    """Upload single image"""
-    if file.content_type not in ALLOWED_IMAGE_TYPES:
+UPLOAD_KINDS = {
+    "image": (ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, "images"),
+    "video": (ALLOWED_VIDEO_TYPES, MAX_VIDEO_SIZE, "videos"),
+}
+
+TUS_VERSION = "1.0.0"
+TUS_HEADERS = {"Tus-Resumable": TUS_VERSION}
+
+async def _ingest(upload: Awaitable[dict], label: str) -> dict:
+    """Await one streamed upload, mapping ingest errors to HTTP errors"""
+    try:
+        return await upload
+    except UnsupportedMediaTypeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid image type"
+            detail=f"Invalid {label} type"
         )
-    
-    # Check file size
-    content = await file.read()
-    if len(content) > MAX_IMAGE_SIZE:
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Image too large"
+            detail=f"{label.capitalize()} too large"
+        )
+    except MalformedUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-    
-    try:
-        # Upload to storage service (S3/R2)
-        file_key = f"images/{current_user.id}/{uuid4()}.{file.filename.split('.')[-1]}"
-        url = await storage_service.upload_file(file_key, content, file.content_type)
-        
-        return {
-            "url": url,
-            "key": file_key,
-            "size": len(content),
-            "type": file.content_type
-        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Upload failed: {str(e)}"
         )
 
+async def _store_image(file: UploadFile, user_id: UUID) -> dict:
+    """
+    Store an image under its content hash and build its responsive
+    variants. A payload that is already stored is not written again.
+    """
+    upload = await read_upload(file, ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE)
+    data = upload.pop("data")
+    settings = get_settings()
+    storage_service = get_storage_service()
+    
+    # Batch uploads run concurrently, so each one indexes on its own session
+    async with AsyncSessionLocal() as session:
+        existing = await acquire_object(session, upload["sha256"])
+        await session.commit()
+    if existing:
+        return {
+            "url": storage_service.public_url(settings.AWS_S3_BUCKET, existing["key"]),
+            "key": existing["key"],
+            **upload,
+            "deduplicated": True,
+            "asset": existing["asset"],
+        }
+    
+    key = content_key(upload["sha256"], upload["type"])
+    stored = await storage_service.upload_file(
+        io.BytesIO(data),
+        settings.AWS_S3_BUCKET,
+        key,
+        content_type=upload["type"],
+        cache_control=IMMUTABLE_CACHE_CONTROL
+    )
+    asset = await get_image_derivative_service().process(
+        settings.AWS_S3_BUCKET, key, stored["url"], data
+    )
+    async with AsyncSessionLocal() as session:
+        await register_object(session, upload["sha256"], key, upload["type"], upload["size"], asset)
+        await session.commit()
+    return {"url": stored["url"], "key": key, **upload, "deduplicated": False, "asset": asset}
+
+def _register_image(db: AsyncSession, user_id: UUID, result: dict) -> dict:
+    """Record a streamed image so posts/products can pick up its variants"""
+    asset = result.pop("asset")
+    db.add(MediaUpload(
+        user_id=user_id,
+        key=result["key"],
+        kind="image",
+        content_type=result["type"],
+        size=result["size"],
+        sha256=result["sha256"],
+        status="complete",
+        completed_at=datetime.utcnow(),
+        asset=asset
+    ))
+    for field in ("width", "height", "blurhash", "dominant_color"):
+        result[field] = asset[field] if asset else None
+    result["variants"] = asset["variants"] if asset else []
+    return result
+
+@router.post("/image")
+async def upload_image(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload single image"""
+    result = await _ingest(_store_image(file, current_user.id), "image")
+    _register_image(db, current_user.id, result)
+    await db.commit()
+    return result
+
 @router.post("/images")
 async def upload_images(
     files: List[UploadFile] = File(...),
@@ -69,75 +167,510 @@ async def upload_images(
             detail="Maximum 10 files allowed"
         )
     
+    results = await stream_uploads(files, lambda file: _store_image(file, current_user.id))
     uploaded = []
+    for r in results:
+        if r["success"]:
+            _register_image(db, current_user.id, r)
+            uploaded.append({"url": r["url"], "key": r["key"], "size": r["size"]})
+    await db.commit()
     
-    for file in files:
-        if file.content_type not in ALLOWED_IMAGE_TYPES:
-            continue
-        
-        content = await file.read()
-        if len(content) > MAX_IMAGE_SIZE:
-            continue
-        
-        try:
-            file_key = f"images/{current_user.id}/{uuid4()}.{file.filename.split('.')[-1]}"
-            url = await storage_service.upload_file(file_key, content, file.content_type)
-            
-            uploaded.append({
-                "url": url,
-                "key": file_key,
-                "size": len(content)
-            })
-        except:
-            continue
-    
-    return {"uploaded": uploaded, "count": len(uploaded)}
+    return {"uploaded": uploaded, "count": len(uploaded), "results": results}
 
 @router.post("/video")
 async def upload_video(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Upload video for reels"""
-    if file.content_type not in ALLOWED_VIDEO_TYPES:
+    """
+    Upload video for reels (multipart/form-data, field `file`). The body is
+    parsed as it arrives instead of being spooled by UploadFile, so an
+    oversized video is rejected mid-transfer.
+    """
+    try:
+        declared = int(request.headers.get("content-length", ""))
+    except ValueError:
+        declared = None
+    if declared is not None and declared > MAX_VIDEO_SIZE + MAX_FORM_OVERHEAD:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video type"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Video too large"
         )
     
-    content = await file.read()
-    if len(content) > MAX_VIDEO_SIZE:
+    result = await _ingest(
+        stream_upload(
+            multipart_file_chunks(request, "file"),
+            f"videos/{current_user.id}/{uuid4()}",
+            ALLOWED_VIDEO_TYPES,
+            MAX_VIDEO_SIZE
+        ),
+        "video"
+    )
+    job = await get_transcode_service().enqueue(db, current_user.id, result["key"])
+    result["transcode_job_id"] = str(job.id)
+    result["message"] = "Video uploaded. Transcoding in progress."
+    return result
+
+@router.get("/video/{job_id}")
+async def get_transcode_status(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Transcoding status for an uploaded video"""
+    result = await db.execute(
+        select(TranscodeJob).where(
+            TranscodeJob.id == job_id,
+            TranscodeJob.user_id == current_user.id
+        )
+    )
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transcode job not found"
+        )
+    
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "reel_id": str(job.reel_id) if job.reel_id else None,
+        "output": job.output,
+        "error": job.error if job.status == "failed" else None,
+    }
+
+@router.post("/intent", response_model=UploadIntentResponse)
+async def create_upload_intent(
+    request: UploadIntentRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Presign a direct client-to-bucket upload; confirm it with /finalize"""
+    if request.kind not in UPLOAD_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid upload kind"
+        )
+    allowed_types, max_size, prefix = UPLOAD_KINDS[request.kind]
+    if request.content_type not in allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {request.kind} type"
+        )
+    if request.size > max_size:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Video too large"
+            detail=f"{request.kind.capitalize()} too large"
         )
     
+    settings = get_settings()
+    storage_service = get_storage_service()
+    upload_id = uuid4()
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.UPLOAD_INTENT_EXPIRES_SECONDS)
+    
+    # With a declared hash, images go to their content-addressed key (the
+    # signed checksum guarantees the bytes), and known content skips the upload
+    content_addressed = request.kind == "image" and request.sha256 is not None
+    if content_addressed:
+        existing = await acquire_object(db, request.sha256)
+        if existing:
+            db.add(MediaUpload(
+                id=upload_id,
+                user_id=current_user.id,
+                key=existing["key"],
+                kind=request.kind,
+                content_type=existing["content_type"],
+                size=existing["size"],
+                sha256=request.sha256,
+                status="complete",
+                completed_at=datetime.utcnow(),
+                asset=existing["asset"]
+            ))
+            await db.commit()
+            return UploadIntentResponse(
+                upload_id=upload_id,
+                key=existing["key"],
+                expires_at=expires_at,
+                duplicate=True
+            )
+        key = content_key(request.sha256, request.content_type)
+    else:
+        key = f"{prefix}/{current_user.id}/{upload_id}.{EXTENSIONS[request.content_type]}"
+    # S3 wants the raw digest base64-encoded; clients send hex
+    checksum = base64.b64encode(bytes.fromhex(request.sha256)).decode() if request.sha256 else None
+    
     try:
-        # Upload to storage
-        file_key = f"videos/{current_user.id}/{uuid4()}.{file.filename.split('.')[-1]}"
-        url = await storage_service.upload_file(file_key, content, file.content_type)
-        
-        return {
-            "url": url,
-            "key": file_key,
-            "size": len(content),
-            "type": file.content_type,
-            "message": "Video uploaded. Transcoding in progress."
-        }
+        presigned = await storage_service.create_presigned_upload(
+            settings.AWS_S3_BUCKET,
+            key,
+            content_type=request.content_type,
+            max_size=max_size,
+            size=request.size,
+            checksum_sha256=checksum,
+            expires_in=settings.UPLOAD_INTENT_EXPIRES_SECONDS
+        )
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Upload failed: {str(e)}"
+            detail=f"Upload intent failed: {str(e)}"
+        )
+    
+    upload = MediaUpload(
+        id=upload_id,
+        user_id=current_user.id,
+        key=key,
+        kind=request.kind,
+        content_type=request.content_type,
+        size=request.size,
+        sha256=request.sha256,
+        expires_at=expires_at
+    )
+    db.add(upload)
+    await db.commit()
+    
+    return UploadIntentResponse(
+        upload_id=upload_id,
+        key=key,
+        method=presigned["method"],
+        url=presigned["url"],
+        fields=presigned["fields"],
+        headers=presigned["headers"],
+        expires_at=upload.expires_at
+    )
+
+@router.post("/{upload_id}/finalize", response_model=UploadFinalizeResponse)
+async def finalize_upload(
+    upload_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Verify a directly uploaded object and register it"""
+    result = await db.execute(
+        select(MediaUpload).where(
+            MediaUpload.id == upload_id,
+            MediaUpload.user_id == current_user.id
+        )
+    )
+    upload = result.scalars().first()
+    if not upload:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    
+    settings = get_settings()
+    storage_service = get_storage_service()
+    bucket = settings.AWS_S3_BUCKET
+    
+    if upload.status != "complete":
+        if upload.status == "failed":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload failed verification"
+            )
+        
+        head = await storage_service.head_object(bucket, upload.key)
+        if head is None:
+            if upload.expires_at < datetime.utcnow():
+                upload.status = "failed"
+                await db.commit()
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Upload intent expired"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Object not uploaded yet"
+            )
+        
+        # POST policies only bound the size, so re-check the declared size,
+        # the checksum S3 computed, and the real leading bytes of the object
+        problem = None
+        if head["size"] != upload.size:
+            problem = "Size mismatch"
+        elif upload.sha256 and head["checksum_sha256"] and \
+                base64.b64decode(head["checksum_sha256"]).hex() != upload.sha256:
+            problem = "Checksum mismatch"
+        elif sniff_content_type(await storage_service.read_range(bucket, upload.key, 16)) != upload.content_type:
+            problem = f"Invalid {upload.kind} type"
+        
+        if problem:
+            # A content-addressed object may already be shared; if nobody
+            # registers it, orphan collection removes it
+            if not upload.key.startswith(CONTENT_PREFIX):
+                await storage_service.delete_file(bucket, upload.key)
+            upload.status = "failed"
+            await db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=problem
+            )
+        
+        if upload.key.startswith(CONTENT_PREFIX):
+            indexed = await register_object(
+                db, upload.sha256, upload.key, upload.content_type, upload.size
+            )
+            upload.asset = indexed["asset"]
+        
+        # Variants are built by a derivative worker reading from storage;
+        # the asset appears on the upload once it finishes
+        derivatives = get_image_derivative_service()
+        queued = upload.kind == "image" and upload.asset is None
+        if queued:
+            await derivatives.enqueue(db, upload.key, upload.size)
+        
+        upload.status = "complete"
+        upload.completed_at = datetime.utcnow()
+        await db.commit()
+        if queued:
+            derivatives.notify()
+    
+    return UploadFinalizeResponse(
+        upload_id=upload.id,
+        url=storage_service.public_url(bucket, upload.key),
+        key=upload.key,
+        size=upload.size,
+        type=upload.content_type,
+        asset=upload.asset
+    )
+
+def _require_tus(request: Request):
+    if request.headers.get("tus-resumable") != TUS_VERSION:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Unsupported tus version",
+            headers={"Tus-Version": TUS_VERSION}
+        )
+
+def _parse_upload_metadata(header: str) -> Dict[str, str]:
+    """Upload-Metadata is comma-separated `key base64(value)` pairs"""
+    metadata = {}
+    for pair in filter(None, (p.strip() for p in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid Upload-Metadata",
+                headers=TUS_HEADERS
+            )
+    return metadata
+
+async def _get_resumable_session(upload_id: UUID, user_id: UUID) -> dict:
+    try:
+        return await get_resumable_upload_service().get(upload_id, user_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found",
+            headers=TUS_HEADERS
+        )
+
+def _resumable_headers(session: dict) -> dict:
+    headers = {
+        **TUS_HEADERS,
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Expires": datetime.fromisoformat(session["expires_at"]).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+    }
+    if session["result"]:
+        headers["X-Upload-Url"] = session["result"]["url"]
+        if session.get("transcode_job_id"):
+            headers["X-Transcode-Job-Id"] = session["transcode_job_id"]
+    return headers
+
+@router.options("/resumable")
+async def resumable_options():
+    """tus capability discovery"""
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={
+            **TUS_HEADERS,
+            "Tus-Version": TUS_VERSION,
+            "Tus-Extension": "creation,expiration,termination",
+            "Tus-Max-Size": str(MAX_VIDEO_SIZE),
+        }
+    )
+
+@router.post("/resumable", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Open a resumable video upload; send the bytes with PATCH"""
+    _require_tus(request)
+    try:
+        length = int(request.headers["upload-length"])
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Length required",
+            headers=TUS_HEADERS
+        )
+    if length <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Length must be positive",
+            headers=TUS_HEADERS
+        )
+    if length > MAX_VIDEO_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Video too large",
+            headers=TUS_HEADERS
         )
+    
+    metadata = _parse_upload_metadata(request.headers.get("upload-metadata", ""))
+    session = await get_resumable_upload_service().create(
+        current_user.id, length, metadata, f"videos/{current_user.id}"
+    )
+    headers = _resumable_headers(session)
+    headers["Location"] = str(request.url_for("get_resumable_upload", upload_id=session["id"]))
+    return Response(status_code=status.HTTP_201_CREATED, headers=headers)
 
-@router.delete("/{file_key}")
+@router.head("/resumable/{upload_id}")
+async def head_resumable_upload(
+    upload_id: UUID,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Committed offset, so an interrupted client knows where to resume"""
+    _require_tus(request)
+    session = await _get_resumable_session(upload_id, current_user.id)
+    headers = _resumable_headers(session)
+    headers["Upload-Length"] = str(session["length"])
+    headers["Cache-Control"] = "no-store"
+    return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+@router.patch("/resumable/{upload_id}")
+async def patch_resumable_upload(
+    upload_id: UUID,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Append bytes at Upload-Offset; the last chunk queues transcoding"""
+    _require_tus(request)
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/offset+octet-stream",
+            headers=TUS_HEADERS
+        )
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Offset required",
+            headers=TUS_HEADERS
+        )
+    
+    resumable = get_resumable_upload_service()
+    session = await _get_resumable_session(upload_id, current_user.id)
+    try:
+        session = await resumable.append(session, offset, request.stream(), ALLOWED_VIDEO_TYPES)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found",
+            headers=TUS_HEADERS
+        )
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={**TUS_HEADERS, "Upload-Offset": str(e.offset)}
+        )
+    except UploadLockedError:
+        raise HTTPException(
+            status_code=status.HTTP_423_LOCKED,
+            detail="Upload in progress on another connection",
+            headers=TUS_HEADERS
+        )
+    except UnsupportedMediaTypeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid video type",
+            headers=TUS_HEADERS
+        )
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Upload exceeds Upload-Length",
+            headers=TUS_HEADERS
+        )
+    
+    if session["result"] and not session.get("transcode_job_id"):
+        job = await get_transcode_service().enqueue(db, current_user.id, session["key"])
+        session["transcode_job_id"] = str(job.id)
+        await resumable.save(session)
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_resumable_headers(session))
+
+@router.get("/resumable/{upload_id}")
+async def get_resumable_upload(
+    upload_id: UUID,
+    current_user: User = Depends(get_current_user)
+):
+    """Resumable upload progress as JSON"""
+    session = await _get_resumable_session(upload_id, current_user.id)
+    return {
+        "upload_id": session["id"],
+        "offset": session["offset"],
+        "length": session["length"],
+        "metadata": session["metadata"],
+        "expires_at": session["expires_at"],
+        "result": session["result"],
+        "transcode_job_id": session.get("transcode_job_id"),
+    }
+
+@router.delete("/resumable/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def terminate_resumable_upload(
+    upload_id: UUID,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Abandon a resumable upload and discard its bytes"""
+    _require_tus(request)
+    session = await _get_resumable_session(upload_id, current_user.id)
+    await get_resumable_upload_service().terminate(session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=TUS_HEADERS)
+
+@router.delete("/{file_key:path}")
 async def delete_file(
     file_key: str,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete uploaded file"""
+    if file_key.startswith(CONTENT_PREFIX):
+        # Shared content: drop this user's reference, the object goes once
+        # nobody holds one
+        result = await db.execute(
+            select(MediaUpload).where(
+                MediaUpload.key == file_key,
+                MediaUpload.user_id == current_user.id,
+                MediaUpload.status == "complete"
+            ).limit(1)
+        )
+        upload = result.scalars().first()
+        if not upload:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized"
+            )
+        await db.delete(upload)
+        await release_object(db, file_key)
+        await db.commit()
+        return {"status": "success"}
+    
     # Verify user owns this file
     if not file_key.startswith(f"images/{current_user.id}") and \
        not file_key.startswith(f"videos/{current_user.id}"):
@@ -147,7 +680,8 @@ async def delete_file(
         )
     
     try:
-        await storage_service.delete_file(file_key)
+        storage_service = get_storage_service()
+        await storage_service.delete_file(storage_service.settings.AWS_S3_BUCKET, file_key)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(
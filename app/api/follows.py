@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from typing import Optional
+from datetime import datetime
+from uuid import UUID
+
+from app.database import get_db
+from app.models import User, Follow
+from app.schemas.follow import FollowUserResponse, FollowStatsResponse
+from app.core.dependencies import get_current_user, get_optional_user
+from app.services.follow_service import get_follow_service, FollowTargetNotFoundError
+
+router = APIRouter(prefix="/api/users", tags=["follows"])
+
+@router.post("/{user_id}/follow")
+async def follow_user(
+    user_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Follow a user (idempotent)"""
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot follow yourself"
+        )
+    
+    try:
+        await get_follow_service().follow(db, current_user.id, user_id)
+    except FollowTargetNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    return {"status": "success", "following": True}
+
+@router.post("/{user_id}/unfollow")
+async def unfollow_user(
+    user_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Unfollow a user (idempotent)"""
+    await get_follow_service().unfollow(db, current_user.id, user_id)
+    return {"status": "success", "following": False}
+
+@router.get("/{user_id}/follow-stats", response_model=FollowStatsResponse)
+async def get_follow_stats(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """Follower/following counts, and whether the viewer follows this user"""
+    service = get_follow_service()
+    followers, following = await service.counts(db, user_id)
+    is_following = current_user is not None and await service.is_following(db, current_user.id, user_id)
+    return FollowStatsResponse(followers=followers, following=following, is_following=is_following)
+
+async def _follow_page(db: AsyncSession, user_column, other_column, user_id: UUID, before: Optional[datetime], limit: int):
+    """Keyset page of one side of the follow graph, newest follows first"""
+    query = (
+        select(User, Follow.created_at)
+        .join(Follow, other_column == User.id)
+        .where(user_column == user_id)
+    )
+    if before is not None:
+        query = query.where(Follow.created_at < before)
+    result = await db.execute(query.order_by(desc(Follow.created_at)).limit(limit))
+    return [
+        FollowUserResponse(
+            id=user.id,
+            username=user.username,
+            avatar_url=user.avatar_url,
+            is_verified=user.is_verified,
+            is_artist=user.is_artist,
+            followed_at=followed_at,
+        )
+        for user, followed_at in result.all()
+    ]
+
+@router.get("/{user_id}/followers", response_model=list[FollowUserResponse])
+async def get_followers(
+    user_id: UUID,
+    before: Optional[datetime] = Query(None, description="followed_at of the last item on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Users following this user"""
+    return await _follow_page(db, Follow.followee_id, Follow.follower_id, user_id, before, limit)
+
+@router.get("/{user_id}/following", response_model=list[FollowUserResponse])
+async def get_following(
+    user_id: UUID,
+    before: Optional[datetime] = Query(None, description="followed_at of the last item on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Users this user follows"""
+    return await _follow_page(db, Follow.follower_id, Follow.followee_id, user_id, before, limit)
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from app.services.storage_service import get_storage_service
+from app.services.local_media_service import (
+    get_local_media_service,
+    parse_range,
+    RangeNotSatisfiable
+)
+
+router = APIRouter(prefix="/uploads", tags=["media"])
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+async def serve_local_media(key: str, request: Request):
+    """Serve a locally stored upload with range, ETag and cache headers"""
+    if key.endswith((".meta", ".part")):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    try:
+        path = get_storage_service().local_path(key)
+    except (AttributeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    media = get_local_media_service()
+    info = media.describe(path)
+    if info is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    headers = {
+        "ETag": info["etag"],
+        "Last-Modified": info["last_modified"],
+        "Cache-Control": info["cache_control"],
+        "Accept-Ranges": "bytes",
+    }
+    if info["content_encoding"]:
+        headers["Content-Encoding"] = info["content_encoding"]
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or info["etag"] in if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # nginx re-validates and serves the body itself with sendfile()
+    accel = media.accel_redirect(key)
+    if accel:
+        headers["X-Accel-Redirect"] = accel
+        return Response(media_type=info["content_type"], headers=headers)
+
+    size = info["size"]
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range not in (info["etag"], info["last_modified"]):
+        # The client's cached copy is stale: send the whole current file
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}", **headers}
+        )
+
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, media_type=info["content_type"], headers=headers)
+
+    body = media.read_small(path, info["stat"], start, end)
+    if body is not None:
+        return Response(content=body, status_code=status_code, media_type=info["content_type"], headers=headers)
+    return StreamingResponse(
+        media.stream(path, start, end),
+        status_code=status_code,
+        media_type=info["content_type"],
+        headers=headers
+    )
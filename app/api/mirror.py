@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert
-from typing import Dict, Any, Optional
+from sqlalchemy.orm import load_only
+from typing import Dict, Any, Optional, List
 import uuid
 import logging
 
@@ -12,13 +13,97 @@ from app.models.user import User
 from app.schemas.mirror import (
     StyleRecommendationRequest,
     MirrorStyleResponse,
-    SaveLookRequest
+    SaveLookRequest,
+    SelfieAnalysisResponse,
+    MirrorStyleSummary
 )
 from app.services.ai_mirror_service import AIMirrorService
+from app.services.style_similarity_service import StyleSimilarityService, MAX_SIMILAR_LOOKS
+from app.services.face_analysis_service import (
+    get_face_analysis_service,
+    AnalysisQueueFullError
+)
 
 router = APIRouter(prefix="/api/v1/mirror", tags=["mirror"])
 logger = logging.getLogger(__name__)
 
+ALLOWED_SELFIE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+async def _recommend_and_store(
+    db: AsyncSession,
+    current_user: User,
+    style_mode: str,
+    face_analysis: Dict[str, Any],
+    user_preferences: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Run the recommendation engine and persist the draft style"""
+    mirror_service = AIMirrorService(db)
+    
+    # Get recommendations using pgVector similarity search
+    recommendations = await mirror_service.analyze_face_and_recommend(
+        user_id=str(current_user.id),
+        style_mode=style_mode,
+        face_analysis=face_analysis,
+        user_preferences=user_preferences
+    )
+    
+    # Store mirror style in database
+    mirror_style = MirrorStyle(
+        id=uuid.uuid4(),
+        user_id=current_user.id,
+        style_mode=style_mode,
+        face_analysis=face_analysis,
+        recommended_products=recommendations["recommended_products"],
+        makeup_guide=recommendations["makeup_guide"],
+        ar_overlay_data=recommendations["ar_overlay_data"],
+        is_saved="draft"
+    )
+    
+    db.add(mirror_style)
+    await db.commit()
+    await db.refresh(mirror_style)
+    
+    return {
+        "mirror_style_id": str(mirror_style.id),
+        "style_mode": style_mode,
+        "face_analysis": recommendations["face_analysis"],
+        "recommended_products": recommendations["recommended_products"],
+        "makeup_guide": recommendations["makeup_guide"],
+        "ar_overlay_data": recommendations["ar_overlay_data"],
+        "status": "draft"
+    }
+
+async def _analyze_upload(file: UploadFile) -> Dict[str, Any]:
+    """Validate a selfie upload and run it through the analysis pool"""
+    if file.content_type not in ALLOWED_SELFIE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image type"
+        )
+    
+    analysis_service = get_face_analysis_service()
+    content = await file.read(analysis_service.settings.FACE_ANALYSIS_MAX_UPLOAD + 1)
+    if len(content) > analysis_service.settings.FACE_ANALYSIS_MAX_UPLOAD:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Image too large"
+        )
+    
+    try:
+        return await analysis_service.analyze(content)
+    except AnalysisQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Face analysis is busy, please retry shortly",
+            headers={"Retry-After": "2"}
+        )
+    except Exception as e:
+        logger.error(f"Error analyzing selfie: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Could not analyze image"
+        )
+
 @router.post("/style", response_model=Dict[str, Any])
 async def get_ai_style_recommendation(
     request: StyleRecommendationRequest,
@@ -30,41 +115,13 @@ async def get_ai_style_recommendation(
     Uses pgVector to recommend products based on user profile
     """
     try:
-        mirror_service = AIMirrorService(db)
-        
-        # Get recommendations using pgVector similarity search
-        recommendations = await mirror_service.analyze_face_and_recommend(
-            user_id=str(current_user.id),
+        return await _recommend_and_store(
+            db,
+            current_user,
             style_mode=request.style_mode,
             face_analysis=request.face_analysis.dict(),
             user_preferences=request.user_preferences
         )
-        
-        # Store mirror style in database
-        mirror_style = MirrorStyle(
-            id=uuid.uuid4(),
-            user_id=current_user.id,
-            style_mode=request.style_mode,
-            face_analysis=request.face_analysis.dict(),
-            recommended_products=recommendations["recommended_products"],
-            makeup_guide=recommendations["makeup_guide"],
-            ar_overlay_data=recommendations["ar_overlay_data"],
-            is_saved="draft"
-        )
-        
-        db.add(mirror_style)
-        await db.commit()
-        await db.refresh(mirror_style)
-        
-        return {
-            "mirror_style_id": str(mirror_style.id),
-            "style_mode": request.style_mode,
-            "face_analysis": recommendations["face_analysis"],
-            "recommended_products": recommendations["recommended_products"],
-            "makeup_guide": recommendations["makeup_guide"],
-            "ar_overlay_data": recommendations["ar_overlay_data"],
-            "status": "draft"
-        }
     except Exception as e:
         logger.error(f"Error in get_ai_style_recommendation: {str(e)}")
         raise HTTPException(
@@ -72,35 +129,102 @@ async def get_ai_style_recommendation(
             detail="Failed to generate style recommendation"
         )
 
-@router.get("/styles/{user_id}")
+@router.post("/analyze-selfie", response_model=SelfieAnalysisResponse)
+async def analyze_selfie(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-side skin tone and undertone analysis for devices without AR support
+    """
+    return await _analyze_upload(file)
+
+@router.post("/style/selfie", response_model=Dict[str, Any])
+async def get_style_from_selfie(
+    file: UploadFile = File(...),
+    style_mode: str = Form("Office/College"),
+    face_shape: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Analyze an uploaded selfie on the server and return a full style recommendation
+    """
+    analysis = await _analyze_upload(file)
+    face_analysis = {
+        "skin_tone": analysis["skin_tone"],
+        "face_shape": face_shape,
+        "undertone": analysis["undertone"],
+        "skin_lab": analysis["skin_lab"],
+        "skin_hex": analysis["skin_hex"],
+    }
+    
+    try:
+        result = await _recommend_and_store(db, current_user, style_mode, face_analysis)
+    except Exception as e:
+        logger.error(f"Error in get_style_from_selfie: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate style recommendation"
+        )
+    
+    result["analysis_timings_ms"] = analysis["timings_ms"]
+    return result
+
+@router.get("/analysis/metrics")
+async def get_analysis_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Face analysis queue depth and per-image timing percentiles
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    return get_face_analysis_service().get_metrics()
+
+@router.get("/styles/{user_id}", response_model=List[MirrorStyleSummary])
 async def get_user_styles(
     user_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    is_saved: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get all saved styles for current user
+    Get style history for current user (summary only; see GET /style/{id} for full detail)
     """
     try:
-        query = select(MirrorStyle).where(
+        # Only the summary columns are loaded; the JSON and vector columns stay in Postgres
+        query = select(MirrorStyle).options(
+            load_only(
+                MirrorStyle.id,
+                MirrorStyle.style_mode,
+                MirrorStyle.is_saved,
+                MirrorStyle.created_at
+            )
+        ).where(
             MirrorStyle.user_id == current_user.id
-        ).order_by(MirrorStyle.created_at.desc())
+        )
+        
+        if is_saved:
+            query = query.where(MirrorStyle.is_saved == is_saved)
+        
+        query = query.order_by(MirrorStyle.created_at.desc()).offset(skip).limit(limit)
         
         result = await db.execute(query)
         styles = result.scalars().all()
         
         return [
-            {
-                "id": str(s.id),
-                "style_mode": s.style_mode,
-                "face_analysis": s.face_analysis,
-                "recommended_products": s.recommended_products,
-                "makeup_guide": s.makeup_guide,
-                "ar_overlay_data": s.ar_overlay_data,
-                "is_saved": s.is_saved,
-                "created_at": s.created_at.isoformat(),
-                "encrypted_url": s.encrypted_json_url
-            }
+            MirrorStyleSummary(
+                id=str(s.id),
+                style_mode=s.style_mode,
+                is_saved=s.is_saved,
+                created_at=s.created_at
+            )
             for s in styles
         ]
     except Exception as e:
@@ -110,6 +234,71 @@ async def get_user_styles(
             detail="Failed to fetch styles"
         )
 
+@router.get("/style/{style_id}")
+async def get_style_detail(
+    style_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get one mirror style in full
+    """
+    result = await db.execute(
+        select(MirrorStyle).where(
+            (MirrorStyle.id == style_id) & (MirrorStyle.user_id == current_user.id)
+        )
+    )
+    style = result.scalars().first()
+    
+    if not style:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Style not found"
+        )
+    
+    return {
+        "id": str(style.id),
+        "style_mode": style.style_mode,
+        "face_analysis": style.face_analysis,
+        "recommended_products": style.recommended_products,
+        "makeup_guide": style.makeup_guide,
+        "ar_overlay_data": style.ar_overlay_data,
+        "is_saved": style.is_saved,
+        "created_at": style.created_at.isoformat(),
+        "encrypted_url": style.encrypted_json_url
+    }
+
+@router.get("/style/{style_id}/similar")
+async def get_similar_looks(
+    style_id: uuid.UUID,
+    limit: int = Query(12, ge=1, le=MAX_SIMILAR_LOOKS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Looks saved by other users that are closest to this style (inspiration carousel)
+    """
+    try:
+        looks = await StyleSimilarityService(db).find_similar(
+            style_id=str(style_id),
+            user_id=str(current_user.id),
+            limit=limit
+        )
+    except Exception as e:
+        logger.error(f"Error finding similar looks: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to find similar looks"
+        )
+    
+    if looks is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Style not found"
+        )
+    
+    return {"style_id": str(style_id), "looks": looks}
+
 @router.post("/save-look")
 async def save_look(
     request: SaveLookRequest,
@@ -128,6 +317,11 @@ async def save_look(
             description=request.description
         )
         return result
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Style not found"
+        )
     except Exception as e:
         logger.error(f"Error saving look: {str(e)}")
         raise HTTPException(
@@ -10,6 +10,7 @@ from app.models import Order, OrderItem, Product, CartItem, User
 from app.schemas.product import OrderResponse, OrderCreate, RazorpayPaymentVerify, RazorpayOrderRequest
 from app.core.dependencies import get_current_user
 from app.services.razorpay_service import RazorpayService
+from app.services.shade_index import get_shade_index
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 razorpay_service = RazorpayService()
@@ -130,6 +131,11 @@ async def create_order(
     await db.commit()
     await db.refresh(new_order)
     
+    # Sold-out shades drop out of AR matching
+    shade_index = get_shade_index()
+    for item_data in order_items:
+        shade_index.upsert_product(item_data["product"])
+    
     # Create Razorpay order
     try:
         razorpay_order = razorpay_service.create_order(
@@ -12,6 +12,8 @@ from app.schemas.product import (
 )
 from app.models import User
 from app.core.dependencies import get_current_user
+from app.services.shade_index import get_shade_index
+from app.services.image_derivative_service import resolve_image_assets
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
@@ -37,9 +39,11 @@ async def list_products(
         query = query.where(Product.category_id == category_id)
     
     if trending:
-        query = query.where(Product.trending == True)
+        query = query.where(Product.trending == True).order_by(desc(Product.trending_score))
+    else:
+        query = query.order_by(desc(Product.created_at))
     
-    query = query.order_by(desc(Product.created_at)).offset(skip).limit(limit)
+    query = query.offset(skip).limit(limit)
     
     result = await db.execute(query)
     products = result.scalars().all()
@@ -93,13 +97,16 @@ async def create_product(
         price=product_data.price,
         discount_price=product_data.discount_price,
         stock_quantity=product_data.stock_quantity,
-        images=product_data.images,
+        images=await resolve_image_assets(db, product_data.images),
         sku=product_data.sku or str(uuid.uuid4()),
+        makeup_type=product_data.makeup_type,
+        shade_hex=product_data.shade_hex,
     )
     
     db.add(new_product)
     await db.commit()
     await db.refresh(new_product)
+    get_shade_index().upsert_product(new_product)
     
     return ProductResponse.from_orm(new_product)
 
@@ -129,12 +136,15 @@ async def update_product(
         )
     
     update_data = product_data.dict(exclude_unset=True)
+    if update_data.get("images") is not None:
+        update_data["images"] = await resolve_image_assets(db, update_data["images"])
     for field, value in update_data.items():
         setattr(product, field, value)
     
     db.add(product)
     await db.commit()
     await db.refresh(product)
+    get_shade_index().upsert_product(product)
     
     return ProductResponse.from_orm(product)
 
@@ -165,6 +175,7 @@ async def delete_product(
     product.is_active = False
     db.add(product)
     await db.commit()
+    get_shade_index().remove_product(product.id)
 
 @router.get("/{product_id}/reviews", response_model=list[ProductReviewResponse])
 async def get_product_reviews(
@@ -210,7 +221,7 @@ async def create_review(
         user_id=current_user.id,
         rating=review_data.rating,
         comment=review_data.comment,
-        images=review_data.images or []
+        images=await resolve_image_assets(db, review_data.images or [])
     )
     
     db.add(new_review)
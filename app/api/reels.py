@@ -1,43 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
+from typing import Optional
+from datetime import datetime
 from uuid import UUID
 
 from app.database import get_db
-from app.models import Reel, Like, Comment, User
+from app.models import Reel, Comment, User
 from app.schemas.feed import (
-    ReelCreate, ReelUpdate, ReelResponse,
-    CommentCreate, CommentResponse
+    ReelCreate, ReelUpdate, ReelResponse, ReelManifest, ReelPrefetch,
+    CommentCreate, CommentResponse, CommentThreadResponse, CommentThreadPage
 )
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_optional_user
+from app.services.image_derivative_service import resolve_image_asset
+from app.services.transcode_service import attach_reel
+from app.services.engagement_counter_service import get_engagement_counter_service
+from app.services.reel_view_service import get_reel_view_service
+from app.services.reel_queue_service import get_reel_queue_service
+from app.services.follow_service import get_follow_service, to_score
+from app.services.user_card_service import UserCardLoader, get_user_card_loader
+from app.services.comment_thread_service import load_threads
+from app.services.like_service import add_like, remove_like, mark_liked, LikeTargetNotFoundError
 
 router = APIRouter(prefix="/api/reels", tags=["reels"])
 
+# Reel detail is a pure read; counts may lag by a few seconds anyway
+REEL_CACHE_CONTROL = "public, max-age=10"
+
+async def _apply_thumbnail_placeholder(db: AsyncSession, reel: Reel):
+    """Copy blurhash/dominant colour from the ingested thumbnail, if any"""
+    asset = await resolve_image_asset(db, reel.thumbnail_url)
+    reel.thumbnail_blurhash = asset.get("blurhash") if asset else None
+    reel.thumbnail_color = asset.get("dominant_color") if asset else None
+
 @router.get("/", response_model=list[ReelResponse])
 async def get_reels(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     trending: bool = Query(False),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Get reels feed"""
     query = select(Reel)
     
     if trending:
-        query = query.where(Reel.trending == True)
+        query = query.where(Reel.trending == True).order_by(desc(Reel.trending_score))
+    else:
+        query = query.order_by(desc(Reel.created_at))
     
-    query = query.order_by(desc(Reel.created_at)).offset(skip).limit(limit)
+    query = query.offset(skip).limit(limit)
     
     result = await db.execute(query)
     reels = result.scalars().all()
     
-    return [ReelResponse.from_orm(reel) for reel in reels]
+    items = await get_engagement_counter_service().overlay(
+        "reels", [ReelResponse.from_orm(reel) for reel in reels]
+    )
+    await mark_liked(db, current_user, "reel", items)
+    return await loader.attach(items)
+
+@router.get("/following", response_model=list[ReelResponse])
+async def get_following_reels(
+    before: Optional[datetime] = Query(None, description="created_at of the last reel on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Reels from people the user follows, newest first"""
+    reels = await get_follow_service().timeline(
+        db, "reels", current_user.id, to_score(before) if before else None, limit
+    )
+    
+    items = await get_engagement_counter_service().overlay(
+        "reels", [ReelResponse.from_orm(reel) for reel in reels]
+    )
+    await mark_liked(db, current_user, "reel", items)
+    return await loader.attach(items)
 
 @router.post("/", response_model=ReelResponse, status_code=status.HTTP_201_CREATED)
 async def create_reel(
     reel_data: ReelCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Create new reel"""
     new_reel = Reel(
@@ -49,19 +98,58 @@ async def create_reel(
         duration=reel_data.duration,
         filters_applied=reel_data.filters_applied or {}
     )
+    await _apply_thumbnail_placeholder(db, new_reel)
     
     db.add(new_reel)
+    await db.flush()
+    await attach_reel(db, new_reel)
     await db.commit()
     await db.refresh(new_reel)
     
-    return ReelResponse.from_orm(new_reel)
+    background_tasks.add_task(
+        get_follow_service().publish, "reels", current_user.id, new_reel.id, new_reel.created_at
+    )
+    
+    return (await loader.attach([ReelResponse.from_orm(new_reel)]))[0]
+
+@router.get("/next", response_model=ReelManifest)
+async def get_next_reels(
+    limit: int = Query(5, ge=1, le=20),
+    refresh: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Next reels the user has not seen, plus what the client should prefetch"""
+    queue = get_reel_queue_service()
+    if refresh:
+        await queue.reset(current_user.id)
+    reels = await queue.next_reels(db, current_user.id, limit)
+    
+    items = await get_engagement_counter_service().overlay(
+        "reels", [ReelResponse.from_orm(reel) for reel in reels]
+    )
+    await mark_liked(db, current_user, "reel", items)
+    prefetch = [
+        ReelPrefetch(
+            id=item.id,
+            video_url=item.video_url,
+            poster_url=item.thumbnail_url,
+            poster_blurhash=item.thumbnail_blurhash,
+            duration=item.duration
+        )
+        for item in items
+    ]
+    return ReelManifest(items=await loader.attach(items), prefetch=prefetch)
 
 @router.get("/{reel_id}", response_model=ReelResponse)
 async def get_reel(
     reel_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
-    """Get single reel"""
+    """Get single reel (views are recorded with POST /{reel_id}/view)"""
     result = await db.execute(
         select(Reel).where(Reel.id == reel_id)
     )
@@ -73,19 +161,49 @@ async def get_reel(
             detail="Reel not found"
         )
     
-    # Increment view count
-    reel.view_count += 1
-    db.add(reel)
-    await db.commit()
+    response.headers["Cache-Control"] = REEL_CACHE_CONTROL
+    items = await get_engagement_counter_service().overlay("reels", [ReelResponse.from_orm(reel)])
+    return (await loader.attach(items))[0]
+
+@router.post("/{reel_id}/view", status_code=status.HTTP_204_NO_CONTENT)
+async def record_reel_view(
+    reel_id: UUID,
+    current_user: User = Depends(get_current_user)
+):
+    """Record a view when playback starts; buffered and flushed in batches"""
+    get_reel_view_service().record(reel_id, current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/{reel_id}/views")
+async def get_reel_views(
+    reel_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """View count and estimated unique viewers"""
+    result = await db.execute(
+        select(Reel.view_count).where(Reel.id == reel_id)
+    )
+    view_count = result.scalar()
     
-    return ReelResponse.from_orm(reel)
+    if view_count is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reel not found"
+        )
+    
+    return {
+        "reel_id": str(reel_id),
+        "view_count": view_count,
+        "unique_viewers": await get_reel_view_service().unique_viewers(reel_id),
+    }
 
 @router.put("/{reel_id}", response_model=ReelResponse)
 async def update_reel(
     reel_id: UUID,
     reel_data: ReelUpdate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Update reel"""
     result = await db.execute(
@@ -102,12 +220,15 @@ async def update_reel(
     update_data = reel_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(reel, field, value)
+    if "thumbnail_url" in update_data:
+        await _apply_thumbnail_placeholder(db, reel)
     
     db.add(reel)
     await db.commit()
     await db.refresh(reel)
     
-    return ReelResponse.from_orm(reel)
+    items = await get_engagement_counter_service().overlay("reels", [ReelResponse.from_orm(reel)])
+    return (await loader.attach(items))[0]
 
 @router.delete("/{reel_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_reel(
@@ -129,6 +250,7 @@ async def delete_reel(
     
     await db.delete(reel)
     await db.commit()
+    await get_follow_service().retract("reels", reel.user_id, reel_id)
 
 @router.post("/{reel_id}/like")
 async def like_reel(
@@ -136,41 +258,19 @@ async def like_reel(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Like a reel"""
-    reel_result = await db.execute(
-        select(Reel).where(Reel.id == reel_id)
-    )
-    reel = reel_result.scalars().first()
-    
-    if not reel:
+    """Like a reel (idempotent)"""
+    try:
+        created = await add_like(db, current_user.id, "reel", reel_id)
+    except LikeTargetNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reel not found"
         )
     
-    like_result = await db.execute(
-        select(Like).where(
-            (Like.user_id == current_user.id) &
-            (Like.reel_id == reel_id)
-        )
-    )
-    existing_like = like_result.scalars().first()
-    
-    if existing_like:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already liked"
-        )
+    if created:
+        await get_engagement_counter_service().incr(db, "reels", reel_id, "like_count", 1)
     
-    new_like = Like(user_id=current_user.id, reel_id=reel_id)
-    db.add(new_like)
-    
-    reel.like_count += 1
-    db.add(reel)
-    
-    await db.commit()
-    
-    return {"status": "success"}
+    return {"status": "success", "liked": True}
 
 @router.post("/{reel_id}/unlike")
 async def unlike_reel(
@@ -178,41 +278,19 @@ async def unlike_reel(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Unlike a reel"""
-    like_result = await db.execute(
-        select(Like).where(
-            (Like.user_id == current_user.id) &
-            (Like.reel_id == reel_id)
-        )
-    )
-    like = like_result.scalars().first()
+    """Unlike a reel (idempotent)"""
+    if await remove_like(db, current_user.id, "reel", reel_id):
+        await get_engagement_counter_service().incr(db, "reels", reel_id, "like_count", -1)
     
-    if not like:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Like not found"
-        )
-    
-    await db.delete(like)
-    
-    reel_result = await db.execute(
-        select(Reel).where(Reel.id == reel_id)
-    )
-    reel = reel_result.scalars().first()
-    if reel and reel.like_count > 0:
-        reel.like_count -= 1
-        db.add(reel)
-    
-    await db.commit()
-    
-    return {"status": "success"}
+    return {"status": "success", "liked": False}
 
 @router.get("/{reel_id}/comments", response_model=list[CommentResponse])
 async def get_reel_comments(
     reel_id: UUID,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Get reel comments"""
     result = await db.execute(
@@ -224,14 +302,34 @@ async def get_reel_comments(
     )
     comments = result.scalars().all()
     
-    return [CommentResponse.from_orm(comment) for comment in comments]
+    return await loader.attach([CommentResponse.from_orm(comment) for comment in comments])
+
+@router.get("/{reel_id}/comments/thread", response_model=CommentThreadPage)
+async def get_reel_comment_threads(
+    reel_id: UUID,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    replies: int = Query(3, ge=0, le=20),
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
+):
+    """Top-level comments with their first replies and reply counts (more via /api/feed/comments/{id}/replies)"""
+    try:
+        page = await load_threads(db, "reel", reel_id, cursor, limit, replies)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    threads = [CommentThreadResponse.model_validate(thread) for thread in page["items"]]
+    await loader.attach(threads + [reply for thread in threads for reply in thread.replies])
+    return CommentThreadPage(items=threads, next_cursor=page["next_cursor"])
 
 @router.post("/{reel_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def create_reel_comment(
     reel_id: UUID,
     comment_data: CommentCreate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    loader: UserCardLoader = Depends(get_user_card_loader)
 ):
     """Create reel comment"""
     reel_result = await db.execute(
@@ -253,10 +351,8 @@ async def create_reel_comment(
     )
     
     db.add(new_comment)
-    reel.comment_count += 1
-    db.add(reel)
-    
     await db.commit()
     await db.refresh(new_comment)
+    await get_engagement_counter_service().incr(db, "reels", reel_id, "comment_count", 1)
     
-    return CommentResponse.from_orm(new_comment)
+    return (await loader.attach([CommentResponse.from_orm(new_comment)]))[0]
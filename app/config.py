@@ -34,6 +34,101 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_S3_BUCKET: Optional[str] = None
     AWS_REGION: str = "ap-south-1"
+    AWS_S3_ENDPOINT_URL: Optional[str] = None  # S3-compatible stand-in (MinIO, moto server)
+    
+    # Storage backend: "s3" or "local" (tests, single-node deployments)
+    STORAGE_BACKEND: str = "s3"
+    STORAGE_LOCAL_ROOT: str = "uploads"
+    STORAGE_PUBLIC_BASE_URL: Optional[str] = None  # CDN origin in front of the bucket
+    STORAGE_LOCAL_ACCEL_REDIRECT: Optional[str] = None  # nginx internal location, e.g. "/_media/"
+    LOCAL_MEDIA_MMAP_MAX_BYTES: int = 1024 * 1024  # Files up to this size are served from mmap
+    LOCAL_MEDIA_MMAP_ENTRIES: int = 256
+    STORAGE_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # S3 minimum is 5MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_INTENT_EXPIRES_SECONDS: int = 900  # Presigned direct-upload lifetime
+    STORAGE_IO_THREADS: int = 16  # Process-wide cap on concurrent S3 calls
+    UPLOAD_BATCH_CONCURRENCY: int = 4  # Per-request cap for multi-file uploads
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = 24 * 3600  # Idle lifetime of a resumable upload session
+    MEDIA_DEDUP_PURGE_INTERVAL_SECONDS: int = 3600
+    MEDIA_DEDUP_PURGE_GRACE_SECONDS: int = 24 * 3600  # Unreferenced objects are kept this long
+    
+    # Orphan media collection
+    MEDIA_GC_INTERVAL_SECONDS: int = 6 * 3600
+    MEDIA_GC_GRACE_SECONDS: int = 7 * 24 * 3600  # Must exceed resumable/intent lifetimes
+    MEDIA_GC_DRY_RUN: bool = True  # Log orphans without deleting until enabled
+    MEDIA_GC_MAX_DELETES: int = 10000  # Per run
+    MEDIA_GC_DELETES_PER_SECOND: float = 200
+    MEDIA_GC_PREFIXES: list = ["images/", "videos/", "media/"]
+    
+    # Image derivatives (responsive WebP/AVIF variants)
+    IMAGE_VARIANT_WIDTHS: list = [320, 640, 1080]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_DERIVATIVE_WORKERS: int = 2
+    IMAGE_DERIVATIVE_POLL_SECONDS: int = 5  # Queued jobs for directly uploaded images
+    IMAGE_DERIVATIVE_JOB_TIMEOUT_SECONDS: int = 300
+    IMAGE_DERIVATIVE_MAX_ATTEMPTS: int = 3
+    
+    # Video transcoding (HLS ladders for reels)
+    FFMPEG_PATH: str = "ffmpeg"
+    FFPROBE_PATH: str = "ffprobe"
+    TRANSCODE_WORKERS: int = 1  # Concurrent encodes per node
+    TRANSCODE_POLL_SECONDS: int = 5
+    TRANSCODE_TIMEOUT_SECONDS: int = 1800
+    TRANSCODE_MAX_ATTEMPTS: int = 3
+    TRANSCODE_SEGMENT_SECONDS: int = 4
+    TRANSCODE_WORK_DIR: Optional[str] = None  # Defaults to the system temp dir
+    
+    # Face analysis (server-side selfie pipeline)
+    FACE_ANALYSIS_WORKERS: int = 2
+    FACE_ANALYSIS_MAX_QUEUE: int = 16
+    FACE_ANALYSIS_MAX_DIM: int = 256
+    FACE_ANALYSIS_MAX_UPLOAD: int = 8 * 1024 * 1024
+    SHADE_INDEX_REFRESH_SECONDS: int = 300
+    
+    # Mirror style retention
+    MIRROR_DRAFT_RETENTION_DAYS: int = 7
+    MIRROR_DRAFTS_PER_USER: int = 20
+    MIRROR_RETENTION_INTERVAL_SECONDS: int = 3600
+    STYLE_SIMILARITY_CACHE_SECONDS: int = 600
+    STYLE_SIMILARITY_EF_SEARCH: int = 64
+    
+    # Engagement counters (write-behind likes/comments)
+    COUNTER_FLUSH_INTERVAL_SECONDS: int = 5
+    REEL_VIEW_FLUSH_INTERVAL_SECONDS: int = 10
+    REEL_VIEW_BUFFER_MAX: int = 50000  # Buffered views that trigger an early flush
+    
+    # Feed ranking
+    FEED_RANK_RECENT_CANDIDATES: int = 300
+    FEED_RANK_TRENDING_CANDIDATES: int = 200
+    FEED_RANK_SIMILAR_CANDIDATES: int = 200
+    FEED_RANK_TASTE_LIKES: int = 50  # Most recent likes averaged into the taste vector
+    FEED_RANK_HALF_LIFE_HOURS: float = 24.0
+    FEED_RANK_SIMILARITY_WEIGHT: float = 1.5
+    FEED_RANK_CACHE_TTL_SECONDS: int = 1800  # Ranked list lifetime (a browsing session)
+    
+    # Follow graph and timelines
+    FOLLOW_CELEBRITY_THRESHOLD: int = 10000  # Above this, followers read the author's outbox instead
+    TIMELINE_MAX_LENGTH: int = 800
+    FOLLOW_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # Idle lifetime of adjacency sets, timelines and outboxes
+    
+    # Trending tags
+    TRENDING_TAGS_BUCKET_SECONDS: int = 300
+    TRENDING_TAGS_WINDOW_SECONDS: int = 24 * 3600
+    
+    # Trending scores (products, posts, reels)
+    TRENDING_INTERVAL_SECONDS: int = 600
+    TRENDING_WINDOW_HOURS: int = 72
+    TRENDING_DECAY_HOURS: float = 24.0  # Event weight falls by 1/e per this many hours
+    TRENDING_TOP_N: int = 50  # Rows flagged `trending` per table
+    
+    # Reels prefetch queue
+    REEL_QUEUE_LENGTH: int = 200  # Refill target per viewer
+    REEL_QUEUE_LOW_WATER: int = 20  # Below this, refill in the background
+    REEL_QUEUE_CANDIDATES: int = 500  # Per source (trending, newest) on refill
+    REEL_QUEUE_TTL_SECONDS: int = 3600
+    REEL_SEEN_BLOOM_BITS: int = 1 << 17  # 16KB per generation; ~1% false positives at 13k reels
+    REEL_SEEN_BLOOM_HASHES: int = 7
+    REEL_SEEN_WINDOW_SECONDS: int = 3 * 24 * 3600  # Seen reels return after one to two windows
     
     # CORS
     ALLOWED_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173", "*"]
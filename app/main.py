@@ -3,7 +3,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.database import init_db, close_db
 from app.config import get_settings
-from app.api import auth, users, products, cart, orders, feed, reels, chat, ws, search, community, referral
+from app.services.face_analysis_service import get_face_analysis_service
+from app.services.job_scheduler import get_job_scheduler
+from app.services.ai_mirror_service import run_draft_retention
+from app.services.media_dedup_service import run_media_purge
+from app.services.media_gc_service import run_orphan_media_gc
+from app.services.engagement_counter_service import run_counter_flush
+from app.services.reel_view_service import run_reel_view_flush
+from app.services.tag_service import run_trending_tags_rollover
+from app.services.trending_service import run_trending_refresh
+from app.services.redis_service import close_redis
+from app.services.storage_service import get_storage_service
+from app.services.image_derivative_service import get_image_derivative_service
+from app.services.transcode_service import get_transcode_service
+from app.services.local_media_service import get_local_media_service
+from app.api import auth, users, products, cart, orders, feed, reels, chat, ws, search, community, referral, mirror, file_upload, media, follows
 
 settings = get_settings()
 
@@ -11,8 +25,28 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    scheduler = get_job_scheduler()
+    scheduler.register("mirror_draft_retention", settings.MIRROR_RETENTION_INTERVAL_SECONDS, run_draft_retention)
+    scheduler.register("media_dedup_purge", settings.MEDIA_DEDUP_PURGE_INTERVAL_SECONDS, run_media_purge)
+    scheduler.register("orphan_media_gc", settings.MEDIA_GC_INTERVAL_SECONDS, run_orphan_media_gc)
+    scheduler.register("counter_flush", settings.COUNTER_FLUSH_INTERVAL_SECONDS, run_counter_flush)
+    scheduler.register("reel_view_flush", settings.REEL_VIEW_FLUSH_INTERVAL_SECONDS, run_reel_view_flush)
+    scheduler.register("trending_tags_rollover", settings.TRENDING_TAGS_BUCKET_SECONDS, run_trending_tags_rollover)
+    scheduler.register("trending_refresh", settings.TRENDING_INTERVAL_SECONDS, run_trending_refresh)
+    scheduler.start()
+    get_transcode_service().start()
+    get_image_derivative_service().start()
     yield
     # Shutdown
+    await get_transcode_service().stop()
+    await get_image_derivative_service().stop()
+    await scheduler.stop()
+    await scheduler.run_now("reel_view_flush")  # views only live in memory
+    get_face_analysis_service().shutdown()
+    get_image_derivative_service().shutdown()
+    get_storage_service().shutdown()
+    get_local_media_service().shutdown()
+    await close_redis()
     await close_db()
 
 app = FastAPI(
@@ -39,6 +73,7 @@ async def health():
 # Include all routes
 app.include_router(auth.router)
 app.include_router(users.router)
+app.include_router(follows.router)
 app.include_router(products.router)
 app.include_router(cart.router)
 app.include_router(orders.router)
@@ -49,6 +84,12 @@ app.include_router(ws.router)
 app.include_router(search.router)
 app.include_router(community.router)
 app.include_router(referral.router)
+app.include_router(mirror.router)
+app.include_router(file_upload.router)
+
+# Local storage backend serves its own files; S3 deployments use the bucket/CDN
+if settings.STORAGE_BACKEND == "local":
+    app.include_router(media.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,6 +1,6 @@
-from .user import User, UserProfile
+from .user import User, UserProfile, Follow
 from .product import Product, ProductCategory, ProductReview, CartItem, Order, OrderItem
-from .feed import FeedPost, Reel, Like, Comment
+from .feed import FeedPost, PostTag, Reel, Like, Comment
 from .chat import ChatConversation, ChatMessage
 from .notification import Notification
 from .booking import ArtistService, Booking
@@ -8,10 +8,12 @@ from .wallet import Wallet, Transaction
 from .moderation import ModerationLog, AuditLog
 from .community import IdeaSubmission, IdeaVote
 from .referral import ReferralCode, ReferralSignup, ReferralLeaderboard
+from .media import MediaUpload, MediaObject, ImageDerivativeJob, TranscodeJob
 
 __all__ = [
     "User",
     "UserProfile",
+    "Follow",
     "Product",
     "ProductCategory",
     "ProductReview",
@@ -19,6 +21,7 @@ __all__ = [
     "Order",
     "OrderItem",
     "FeedPost",
+    "PostTag",
     "Reel",
     "Like",
     "Comment",
@@ -36,4 +39,8 @@ __all__ = [
     "ReferralCode",
     "ReferralSignup",
     "ReferralLeaderboard",
+    "MediaUpload",
+    "MediaObject",
+    "ImageDerivativeJob",
+    "TranscodeJob",
 ]
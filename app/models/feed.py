@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, UUID, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, UUID, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON, VECTOR
 from datetime import datetime
@@ -18,12 +18,24 @@ class FeedPost(Base):
     comment_count = Column(Integer, default=0)
     share_count = Column(Integer, default=0)
     is_published = Column(Boolean, default=True)
+    trending_score = Column(Float, nullable=False, default=0)  # Maintained by the trending job
     embedding = Column(VECTOR(384), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="posts")
 
+class PostTag(Base):
+    __tablename__ = "post_tags"
+    __table_args__ = (
+        # Tag pages: keyset scan newest first
+        Index("idx_post_tags_tag_created", "tag", "created_at", "post_id"),
+    )
+    
+    post_id = Column(UUID(as_uuid=True), ForeignKey("feed_posts.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(100), primary_key=True)
+    created_at = Column(DateTime, nullable=False)  # Copied from the post
+
 class Reel(Base):
     __tablename__ = "reels"
     
@@ -33,6 +45,8 @@ class Reel(Base):
     description = Column(Text, nullable=True)
     video_url = Column(String(500), nullable=False)
     thumbnail_url = Column(String(500), nullable=True)
+    thumbnail_blurhash = Column(String(64), nullable=True)
+    thumbnail_color = Column(String(7), nullable=True)
     duration = Column(Integer, nullable=True)
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
@@ -40,6 +54,7 @@ class Reel(Base):
     share_count = Column(Integer, default=0)
     filters_applied = Column(JSON, default={})
     trending = Column(Boolean, default=False)
+    trending_score = Column(Float, nullable=False, default=0)
     embedding = Column(VECTOR(384), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -48,6 +63,11 @@ class Reel(Base):
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        # ON CONFLICT targets for idempotent likes
+        UniqueConstraint("user_id", "post_id"),
+        UniqueConstraint("user_id", "reel_id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
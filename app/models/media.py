@@ -0,0 +1,65 @@
+from sqlalchemy import Column, String, DateTime, UUID, ForeignKey, BigInteger, Integer, Text
+from sqlalchemy.dialects.postgresql import JSON
+from datetime import datetime
+import uuid
+
+from app.database import Base
+
+class MediaUpload(Base):
+    __tablename__ = "media_uploads"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    key = Column(String(500), nullable=False, index=True)  # shared by deduplicated uploads
+    kind = Column(String(20), nullable=False)  # image, video
+    content_type = Column(String(100), nullable=False)
+    size = Column(BigInteger, nullable=False)  # declared by the client at intent time
+    sha256 = Column(String(64), nullable=True)  # hex digest, optional
+    status = Column(String(20), default="pending")  # pending, complete, failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)  # presigned intents only
+    completed_at = Column(DateTime, nullable=True)
+    asset = Column(JSON, nullable=True)  # image derivatives: width, height, variants
+
+class MediaObject(Base):
+    """Content-addressed object index; ref_count counts the MediaUploads using it"""
+    __tablename__ = "media_objects"
+    
+    sha256 = Column(String(64), primary_key=True)
+    key = Column(String(500), unique=True, nullable=False)
+    content_type = Column(String(100), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    asset = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    referenced_at = Column(DateTime, default=datetime.utcnow)  # last acquire/register
+    released_at = Column(DateTime, nullable=True)  # when ref_count last dropped to 0
+
+class ImageDerivativeJob(Base):
+    """Variants for a directly uploaded image, built by a worker reading from storage"""
+    __tablename__ = "image_derivative_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_key = Column(String(500), unique=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    status = Column(String(20), default="queued")  # queued, processing, complete, failed
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+class TranscodeJob(Base):
+    __tablename__ = "transcode_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    reel_id = Column(UUID(as_uuid=True), ForeignKey("reels.id", ondelete="SET NULL"), nullable=True)
+    source_key = Column(String(500), unique=True, nullable=False)
+    status = Column(String(20), default="queued")  # queued, processing, complete, failed
+    attempts = Column(Integer, default=0)
+    output = Column(JSON, nullable=True)  # master playlist, poster, duration, renditions
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
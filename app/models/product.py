@@ -34,7 +34,10 @@ class Product(Base):
     rating = Column(Float, default=0)
     review_count = Column(Integer, default=0)
     trending = Column(Boolean, default=False)
+    trending_score = Column(Float, nullable=False, default=0)  # Maintained by the trending job
     is_active = Column(Boolean, default=True)
+    makeup_type = Column(String(50), nullable=True)  # lipstick, blush, eyeliner, eyeshadow
+    shade_hex = Column(String(7), nullable=True)  # Product shade for AR matching
     embedding = Column(VECTOR(384), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
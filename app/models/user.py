@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, UUID
+from sqlalchemy import Column, String, Boolean, DateTime, Text, UUID, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON
 from datetime import datetime
@@ -53,3 +53,14 @@ class UserProfile(Base):
     
     # Relationships
     user = relationship("User", back_populates="profile")
+
+class Follow(Base):
+    __tablename__ = "follows"
+    __table_args__ = (
+        # Primary key serves "who do I follow"; this serves "who follows me"
+        Index("idx_follows_followee", "followee_id", "follower_id"),
+    )
+    
+    follower_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    followee_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,8 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
+from app.schemas.media import ImageAsset, image_urls, image_assets
+
+class AuthorSummary(BaseModel):
+    id: UUID
+    username: Optional[str] = None
+    avatar_url: Optional[str] = None
+    is_verified: bool = False
+    is_artist: bool = False
+
 class FeedPostCreate(BaseModel):
     caption: Optional[str] = None
     images: List[str] = []
@@ -18,17 +27,34 @@ class FeedPostResponse(BaseModel):
     user_id: UUID
     caption: Optional[str] = None
     images: List[str]
+    image_assets: List[ImageAsset] = Field(default=[], validation_alias="images")
     tags: List[str]
     like_count: int
     comment_count: int
     share_count: int
     is_published: bool
+    liked_by_me: bool = False
+    author: Optional[AuthorSummary] = None
     created_at: datetime
     updated_at: datetime
     
+    @field_validator("images", mode="before")
+    @classmethod
+    def flatten_images(cls, v):
+        return image_urls(v)
+    
+    @field_validator("image_assets", mode="before")
+    @classmethod
+    def expand_image_assets(cls, v):
+        return image_assets(v)
+    
     class Config:
         from_attributes = True
 
+class TagCountResponse(BaseModel):
+    tag: str
+    count: int
+
 class ReelCreate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -50,6 +76,8 @@ class ReelResponse(BaseModel):
     description: Optional[str] = None
     video_url: str
     thumbnail_url: Optional[str] = None
+    thumbnail_blurhash: Optional[str] = None
+    thumbnail_color: Optional[str] = None
     duration: Optional[int] = None
     view_count: int
     like_count: int
@@ -57,12 +85,26 @@ class ReelResponse(BaseModel):
     share_count: int
     filters_applied: dict
     trending: bool
+    liked_by_me: bool = False
+    author: Optional[AuthorSummary] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class ReelPrefetch(BaseModel):
+    """What the player needs to start loading a reel before it is on screen"""
+    id: UUID
+    video_url: str
+    poster_url: Optional[str] = None
+    poster_blurhash: Optional[str] = None
+    duration: Optional[int] = None
+
+class ReelManifest(BaseModel):
+    items: List[ReelResponse]
+    prefetch: List[ReelPrefetch]
+
 class CommentCreate(BaseModel):
     content: str = Field(..., min_length=1, max_length=500)
     parent_comment_id: Optional[UUID] = None
@@ -74,12 +116,28 @@ class CommentResponse(BaseModel):
     reel_id: Optional[UUID] = None
     content: str
     parent_comment_id: Optional[UUID] = None
+    author: Optional[AuthorSummary] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class CommentReplyResponse(CommentResponse):
+    reply_count: int = 0
+
+class CommentThreadResponse(CommentReplyResponse):
+    replies: List[CommentReplyResponse] = []
+    next_reply_cursor: Optional[str] = None
+
+class CommentThreadPage(BaseModel):
+    items: List[CommentThreadResponse]
+    next_cursor: Optional[str] = None
+
+class CommentReplyPage(BaseModel):
+    items: List[CommentReplyResponse]
+    next_cursor: Optional[str] = None
+
 class LikeResponse(BaseModel):
     id: UUID
     user_id: UUID
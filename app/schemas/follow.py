@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from uuid import UUID
+
+class FollowUserResponse(BaseModel):
+    id: UUID
+    username: Optional[str] = None
+    avatar_url: Optional[str] = None
+    is_verified: bool
+    is_artist: bool
+    followed_at: datetime
+
+class FollowStatsResponse(BaseModel):
+    followers: int
+    following: int
+    is_following: bool = False
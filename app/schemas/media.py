@@ -0,0 +1,50 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from uuid import UUID
+from typing import Optional, Dict, List, Any
+
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: str
+    size: Optional[int] = None
+
+class ImageAsset(BaseModel):
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
+    variants: List[ImageVariant] = []
+
+def image_urls(images: Optional[List[Any]]) -> List[str]:
+    """`images` JSON entries are plain URLs or ImageAsset dicts"""
+    return [i["url"] if isinstance(i, dict) else i for i in (images or [])]
+
+def image_assets(images: Optional[List[Any]]) -> List[dict]:
+    return [i if isinstance(i, dict) else {"url": i} for i in (images or [])]
+
+class UploadIntentRequest(BaseModel):
+    kind: str  # "image" or "video"
+    content_type: str
+    size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")  # hex digest of the file
+
+class UploadIntentResponse(BaseModel):
+    upload_id: UUID
+    key: str
+    method: Optional[str] = None  # "PUT" or "POST"; None when duplicate
+    url: Optional[str] = None
+    fields: Dict[str, str] = {}
+    headers: Dict[str, str] = {}
+    expires_at: datetime
+    duplicate: bool = False  # content already stored: skip the upload, just finalize
+
+class UploadFinalizeResponse(BaseModel):
+    upload_id: UUID
+    url: str
+    key: str
+    size: int
+    type: str
+    asset: Optional[ImageAsset] = None
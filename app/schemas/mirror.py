@@ -6,6 +6,19 @@ class FaceAnalysisRequest(BaseModel):
     skin_tone: Optional[str] = None
     face_shape: Optional[str] = None
     blemishes: Optional[List[Dict]] = None
+    undertone: Optional[str] = None  # warm, cool, neutral
+    skin_lab: Optional[List[float]] = None  # [L*, a*, b*]
+    skin_hex: Optional[str] = None
+
+class SelfieAnalysisResponse(BaseModel):
+    skin_tone: str
+    undertone: str
+    skin_lab: List[float]
+    skin_hex: str
+    cluster_share: float
+    sampled_pixels: int
+    image_size: List[int]
+    timings_ms: Dict[str, float]
     
 class StyleRecommendationRequest(BaseModel):
     style_mode: str  # Office/College, Party, Bridal, Professional
@@ -17,6 +30,7 @@ class AROverlayData(BaseModel):
     color_code: str
     product_id: Optional[str] = None
     intensity: int = 100
+    matched_shades: Optional[List[Dict[str, Any]]] = None  # nearest in-stock shades
 
 class MirrorStyleResponse(BaseModel):
     id: str
@@ -32,6 +46,12 @@ class MirrorStyleResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MirrorStyleSummary(BaseModel):
+    id: str
+    style_mode: str
+    is_saved: str
+    created_at: datetime
+
 class SaveLookRequest(BaseModel):
     mirror_style_id: str
     name: Optional[str] = None
@@ -1,9 +1,11 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 from decimal import Decimal
 
+from app.schemas.media import ImageAsset, image_urls, image_assets
+
 class ProductCategoryResponse(BaseModel):
     id: UUID
     name: str
@@ -23,6 +25,8 @@ class ProductCreate(BaseModel):
     stock_quantity: int = Field(..., ge=0)
     images: List[str] = []
     sku: Optional[str] = None
+    makeup_type: Optional[str] = None
+    shade_hex: Optional[str] = Field(None, pattern=r"^#[0-9A-Fa-f]{6}$")
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
@@ -33,6 +37,8 @@ class ProductUpdate(BaseModel):
     images: Optional[List[str]] = None
     sku: Optional[str] = None
     trending: Optional[bool] = None
+    makeup_type: Optional[str] = None
+    shade_hex: Optional[str] = Field(None, pattern=r"^#[0-9A-Fa-f]{6}$")
 
 class ProductResponse(BaseModel):
     id: UUID
@@ -44,13 +50,26 @@ class ProductResponse(BaseModel):
     discount_price: Optional[Decimal] = None
     stock_quantity: int
     images: List[str]
+    image_assets: List[ImageAsset] = Field(default=[], validation_alias="images")
     sku: Optional[str] = None
     rating: float
     review_count: int
     trending: bool
+    makeup_type: Optional[str] = None
+    shade_hex: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
+    @field_validator("images", mode="before")
+    @classmethod
+    def flatten_images(cls, v):
+        return image_urls(v)
+    
+    @field_validator("image_assets", mode="before")
+    @classmethod
+    def expand_image_assets(cls, v):
+        return image_assets(v)
+    
     class Config:
         from_attributes = True
 
@@ -117,9 +136,20 @@ class ProductReviewResponse(BaseModel):
     rating: int
     comment: Optional[str] = None
     images: List[str]
+    image_assets: List[ImageAsset] = Field(default=[], validation_alias="images")
     helpful_count: int
     created_at: datetime
     
+    @field_validator("images", mode="before")
+    @classmethod
+    def flatten_images(cls, v):
+        return image_urls(v)
+    
+    @field_validator("image_assets", mode="before")
+    @classmethod
+    def expand_image_assets(cls, v):
+        return image_assets(v)
+    
     class Config:
         from_attributes = True
 
@@ -1,11 +1,30 @@
 import json
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import logging
+import numpy as np
+
+from app.config import get_settings
+from app.services.shade_index import get_shade_index
+from app.services.look_snapshot_service import build_look_snapshot, publish_look_snapshot
+from app.services.style_similarity_service import (
+    StyleSimilarityService,
+    compute_style_embedding,
+    to_pgvector
+)
 
 logger = logging.getLogger(__name__)
 
+# Overlay target relative to the measured skin colour: (dL*, da*, db*)
+SKIN_TARGET_SHIFTS = {
+    "lipstick": (-15.0, 28.0, 6.0),
+    "blush": (-5.0, 16.0, 4.0),
+    "eyeliner": (-45.0, -2.0, -4.0),
+    "eyeshadow": (-20.0, 6.0, 8.0),
+}
+
 class AIMirrorService:
     """AI-powered styling recommendation engine using pgVector embeddings"""
     
@@ -37,12 +56,17 @@ class AIMirrorService:
             # Build face analysis context
             face_context = {
                 "skin_tone": face_analysis.get("skin_tone") or (profile[0] if profile else "medium"),
-                "face_shape": face_analysis.get("face_shape", "oval"),
-                "blemishes": face_analysis.get("blemishes", []),
+                "face_shape": face_analysis.get("face_shape") or "oval",
+                "blemishes": face_analysis.get("blemishes") or [],
                 "style_mode": style_mode,
                 "user_preferences": user_preferences or {}
             }
             
+            # Server-side selfie analysis adds measured colour data
+            for key in ("undertone", "skin_lab", "skin_hex"):
+                if face_analysis.get(key) is not None:
+                    face_context[key] = face_analysis[key]
+            
             # Get product recommendations based on skin tone + style + user history
             recommended_products = await self._get_product_recommendations(
                 user_id=user_id,
@@ -62,7 +86,8 @@ class AIMirrorService:
             ar_overlays = await self._create_ar_overlays(
                 style_mode=style_mode,
                 skin_tone=face_context["skin_tone"],
-                recommended_products=recommended_products
+                recommended_products=recommended_products,
+                skin_lab=face_context.get("skin_lab")
             )
             
             return {
@@ -105,7 +130,7 @@ class AIMirrorService:
                 AND p.stock_quantity > 0
                 -- Makeup products for style
                 AND c.name IN ('Makeup', 'Skincare', 'Accessories')
-                ORDER BY p.trending DESC, p.rating DESC
+                ORDER BY p.trending_score DESC, p.rating DESC
                 LIMIT :limit
             """)
             
@@ -258,10 +283,13 @@ class AIMirrorService:
         self,
         style_mode: str,
         skin_tone: str,
-        recommended_products: List[Dict]
+        recommended_products: List[Dict],
+        skin_lab: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Create AR overlay data with colors matched to skin tone
+        Create AR overlay data with colors matched to skin tone. With a
+        measured skin_lab (server-side analysis) shades are matched to targets
+        derived from it; otherwise to the tone bucket's palette colour.
         """
         # Color recommendations based on skin tone
         color_palette = {
@@ -283,37 +311,50 @@ class AIMirrorService:
         
         palette = color_palette.get(tone_map.get(skin_tone.lower(), "medium"), color_palette["medium"])
         
-        overlays = [
-            {
-                "overlay_type": "lipstick",
-                "color_code": palette[0],
-                "product_id": recommended_products[0]["id"] if recommended_products else None,
-                "intensity": 100,
-                "coordinates": {"face_region": "lips"}
-            },
-            {
-                "overlay_type": "blush",
-                "color_code": palette[1],
-                "product_id": recommended_products[1]["id"] if len(recommended_products) > 1 else None,
-                "intensity": 60,
-                "coordinates": {"face_region": "cheeks"}
-            },
-            {
-                "overlay_type": "eyeliner",
-                "color_code": palette[2],
-                "product_id": recommended_products[2]["id"] if len(recommended_products) > 2 else None,
-                "intensity": 80,
-                "coordinates": {"face_region": "eyes"}
-            },
-            {
-                "overlay_type": "eyeshadow",
-                "color_code": palette[3],
-                "product_id": recommended_products[3]["id"] if len(recommended_products) > 3 else None,
-                "intensity": 70,
-                "coordinates": {"face_region": "eyelids"}
-            }
+        overlay_specs = [
+            ("lipstick", palette[0], 100, "lips"),
+            ("blush", palette[1], 60, "cheeks"),
+            ("eyeliner", palette[2], 80, "eyes"),
+            ("eyeshadow", palette[3], 70, "eyelids"),
         ]
         
+        measured = np.asarray(skin_lab, dtype=np.float64) if skin_lab and len(skin_lab) == 3 else None
+        
+        # Match the target colour to real in-stock product shades
+        shade_index = get_shade_index()
+        try:
+            await shade_index.ensure_loaded(self.db)
+        except Exception as e:
+            logger.error(f"Error loading shade index: {str(e)}")
+        
+        overlays = []
+        for position, (overlay_type, target_color, intensity, face_region) in enumerate(overlay_specs):
+            if measured is not None:
+                target_lab = measured + np.array(SKIN_TARGET_SHIFTS[overlay_type])
+                target_lab[0] = np.clip(target_lab[0], 0.0, 100.0)
+                matches = shade_index.nearest_lab(overlay_type, target_lab, k=3)
+            else:
+                matches = shade_index.nearest(overlay_type, target_color, k=3)
+            if matches:
+                color_code = matches[0]["color_code"]
+                product_id = matches[0]["product_id"]
+            else:
+                # No indexed shades yet: fall back to palette + ranked recommendation
+                color_code = target_color
+                product_id = (
+                    recommended_products[position]["id"]
+                    if len(recommended_products) > position else None
+                )
+            
+            overlays.append({
+                "overlay_type": overlay_type,
+                "color_code": color_code,
+                "product_id": product_id,
+                "intensity": intensity,
+                "coordinates": {"face_region": face_region},
+                "matched_shades": matches
+            })
+        
         return overlays
     
     async def save_look(
@@ -324,16 +365,42 @@ class AIMirrorService:
         description: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Save a look as encrypted JSON profile link
+        Save a look and publish it as an immutable JSON snapshot on object storage
         """
-        # Generate encrypted JSON URL
-        encrypted_url = f"https://glow.app/looks/{mirror_style_id}"
+        style_result = await self.db.execute(
+            text("""
+                SELECT style_mode, face_analysis, recommended_products, makeup_guide, ar_overlay_data
+                FROM mirror_styles
+                WHERE id = :mirror_style_id AND user_id = :user_id
+            """),
+            {"mirror_style_id": mirror_style_id, "user_id": user_id}
+        )
+        style = style_result.fetchone()
+        if style is None:
+            raise ValueError("Mirror style not found")
+        
+        # Style embedding powers "find similar looks" for other users
+        embedding = to_pgvector(compute_style_embedding(style[0], style[1], style[2]))
+        
+        # Viewers load the snapshot straight from storage/CDN
+        snapshot = build_look_snapshot(
+            mirror_style_id=mirror_style_id,
+            style_mode=style[0],
+            makeup_guide=style[3],
+            ar_overlay_data=style[4],
+            recommended_products=style[2],
+            name=name,
+            description=description
+        )
+        published = await publish_look_snapshot(snapshot)
+        encrypted_url = published["url"]
         
         # Update mirror style to saved
         update_query = text("""
             UPDATE mirror_styles
             SET is_saved = 'saved',
                 encrypted_json_url = :encrypted_url,
+                embedding = CAST(:embedding AS vector),
                 updated_at = NOW()
             WHERE id = :mirror_style_id AND user_id = :user_id
             RETURNING *
@@ -344,9 +411,73 @@ class AIMirrorService:
             {
                 "mirror_style_id": mirror_style_id,
                 "user_id": user_id,
-                "encrypted_url": encrypted_url
+                "encrypted_url": encrypted_url,
+                "embedding": embedding
             }
         )
         
         await self.db.commit()
-        return {"status": "saved", "look_url": encrypted_url}
+        await StyleSimilarityService(self.db).invalidate(mirror_style_id)
+        return {
+            "status": "saved",
+            "look_url": encrypted_url,
+            "snapshot_key": published["key"],
+            "snapshot_sha256": published["sha256"]
+        }
+    
+    async def purge_stale_drafts(
+        self,
+        max_age_days: int,
+        keep_per_user: int,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Delete draft styles older than max_age_days, and compact each user's
+        remaining drafts down to the newest keep_per_user.
+        Saved and shared looks are never touched.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+        delete_batch = text("""
+            WITH ranked AS (
+                SELECT id, created_at,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC) AS rn
+                FROM mirror_styles
+                WHERE is_saved = 'draft'
+            ),
+            doomed AS (
+                SELECT id FROM ranked
+                WHERE created_at < :cutoff OR rn > :keep_per_user
+                LIMIT :batch_size
+            ),
+            overlays AS (
+                DELETE FROM ar_overlays WHERE mirror_style_id IN (SELECT id FROM doomed)
+            )
+            DELETE FROM mirror_styles WHERE id IN (SELECT id FROM doomed)
+        """)
+        
+        total = 0
+        while True:
+            result = await self.db.execute(
+                delete_batch,
+                {"cutoff": cutoff, "keep_per_user": keep_per_user, "batch_size": batch_size}
+            )
+            # Short transactions so /style inserts never wait on the purge
+            await self.db.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        
+        if total:
+            logger.info(f"Purged {total} stale mirror style drafts")
+        return total
+
+async def run_draft_retention():
+    """Periodic job: purge stale mirror style drafts"""
+    from app.database import AsyncSessionLocal
+    
+    settings = get_settings()
+    async with AsyncSessionLocal() as db:
+        await AIMirrorService(db).purge_stale_drafts(
+            max_age_days=settings.MIRROR_DRAFT_RETENTION_DAYS,
+            keep_per_user=settings.MIRROR_DRAFTS_PER_USER
+        )
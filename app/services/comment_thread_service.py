@@ -0,0 +1,132 @@
+"""
+Comment threads
+Top-level comments with their first replies and reply counts in a single
+query (LATERAL join per thread), plus cursor-paged replies. Cursors are
+opaque (created_at, id) keysets, so pages stay stable while new comments
+arrive.
+"""
+
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Thread target -> comments column
+TARGET_COLUMNS = {
+    "post": "post_id",
+    "reel": "reel_id",
+}
+COMMENT_COLUMNS = ("id", "user_id", "post_id", "reel_id", "content", "parent_comment_id", "created_at", "updated_at")
+
+
+def encode_cursor(comment: Dict[str, Any]) -> str:
+    raw = f"{comment['created_at'].isoformat()}|{comment['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Raises ValueError on a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, comment_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(comment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _keyset(cursor: Optional[str], op: str, params: dict, prefix: str = "") -> str:
+    if not cursor:
+        return ""
+    params["cursor_at"], params["cursor_id"] = decode_cursor(cursor)
+    return f"AND ({prefix}created_at, {prefix}id) {op} (:cursor_at, :cursor_id)"
+
+
+async def load_threads(
+    db: AsyncSession,
+    target: str,
+    target_id: UUID,
+    cursor: Optional[str],
+    limit: int,
+    replies: int
+) -> Dict[str, Any]:
+    """
+    Newest top-level comments, each with its `replies` oldest replies and
+    reply_count. Returns {"items": [...], "next_cursor": ...}.
+    """
+    column = TARGET_COLUMNS[target]
+    params = {"target_id": target_id, "limit": limit, "replies": replies}
+    after = _keyset(cursor, "<", params)
+    columns = ", ".join(COMMENT_COLUMNS)
+    reply_columns = ", ".join(f"r.{c} AS reply_{c}" for c in COMMENT_COLUMNS)
+
+    result = await db.execute(
+        text(f"""
+            WITH top AS (
+                SELECT {columns}
+                FROM comments
+                WHERE {column} = :target_id AND parent_comment_id IS NULL {after}
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            )
+            SELECT t.*,
+                   (SELECT COUNT(*) FROM comments c WHERE c.parent_comment_id = t.id) AS reply_count,
+                   {reply_columns}, r.reply_count AS reply_reply_count
+            FROM top t
+            LEFT JOIN LATERAL (
+                SELECT c.*,
+                       (SELECT COUNT(*) FROM comments cc WHERE cc.parent_comment_id = c.id) AS reply_count
+                FROM comments c
+                WHERE c.parent_comment_id = t.id
+                ORDER BY c.created_at, c.id
+                LIMIT :replies
+            ) r ON TRUE
+            ORDER BY t.created_at DESC, t.id DESC, r.created_at, r.id
+        """),
+        params
+    )
+
+    threads: Dict[Any, Dict[str, Any]] = {}
+    for row in result.mappings().all():
+        thread = threads.get(row["id"])
+        if thread is None:
+            thread = {c: row[c] for c in COMMENT_COLUMNS}
+            thread["reply_count"] = row["reply_count"]
+            thread["replies"] = []
+            threads[row["id"]] = thread
+        if row["reply_id"] is not None:
+            reply = {c: row[f"reply_{c}"] for c in COMMENT_COLUMNS}
+            reply["reply_count"] = row["reply_reply_count"]
+            thread["replies"].append(reply)
+
+    items = list(threads.values())
+    for thread in items:
+        shown = thread["replies"]
+        thread["next_reply_cursor"] = encode_cursor(shown[-1]) if shown and thread["reply_count"] > len(shown) else None
+    next_cursor = encode_cursor(items[-1]) if len(items) == limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def load_replies(db: AsyncSession, comment_id: UUID, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    """Direct replies to a comment, oldest first, after the cursor"""
+    params = {"comment_id": comment_id, "limit": limit}
+    after = _keyset(cursor, ">", params, prefix="c.")
+    result = await db.execute(
+        text(f"""
+            SELECT {', '.join(f'c.{col}' for col in COMMENT_COLUMNS)},
+                   (SELECT COUNT(*) FROM comments cc WHERE cc.parent_comment_id = c.id) AS reply_count
+            FROM comments c
+            WHERE c.parent_comment_id = :comment_id {after}
+            ORDER BY c.created_at, c.id
+            LIMIT :limit
+        """),
+        params
+    )
+    items = [dict(row) for row in result.mappings().all()]
+    next_cursor = encode_cursor(items[-1]) if len(items) == limit else None
+    return {"items": items, "next_cursor": next_cursor}
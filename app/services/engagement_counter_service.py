@@ -0,0 +1,193 @@
+"""
+Engagement counters
+Write-behind like/comment counts for posts and reels. Requests add deltas
+to a Redis hash; a periodic job folds the aggregated deltas into the rows
+with one UPDATE ... FROM (VALUES ...) per table, so a viral post's row is
+written every few seconds instead of once per like. Reads overlay the
+pending deltas. Each snapshot carries a flush id recorded in the same
+transaction as its UPDATE, so a snapshot is applied at most once.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.redis_service import get_redis, acquire_lock, extend_lock, release_lock
+
+logger = logging.getLogger(__name__)
+
+# Table -> counter columns that go through the write-behind path
+COUNTER_COLUMNS = {
+    "feed_posts": ("like_count", "comment_count"),
+    "reels": ("like_count", "comment_count"),
+}
+FLUSH_BATCH_SIZE = 500
+FLUSH_LOCK_KEY = "counters:flush:lock"
+FLUSH_LOCK_SECONDS = 60
+# Snapshot hash field holding its flush id (never an "<id>:<column>" field)
+FLUSH_ID_FIELD = "flush_id"
+# Applied flush ids are kept far longer than a snapshot can linger in Redis
+FLUSH_ID_RETENTION_DAYS = 7
+
+
+def _pending_key(table: str) -> str:
+    return f"counters:pending:{table}"
+
+
+def _flushing_key(table: str) -> str:
+    return f"counters:flushing:{table}"
+
+
+class EngagementCounterService:
+    async def incr(self, db: AsyncSession, table: str, entity_id: UUID, column: str, delta: int = 1):
+        """
+        Record a counter change. Call after the like/comment row itself is
+        committed. If Redis is unavailable the row is updated directly.
+        """
+        if column not in COUNTER_COLUMNS[table]:
+            raise ValueError(f"{table}.{column} is not a write-behind counter")
+        try:
+            await get_redis().hincrby(_pending_key(table), f"{entity_id}:{column}", delta)
+        except Exception as e:
+            logger.error(f"Counter buffer unavailable, updating {table} directly: {e}")
+            await db.execute(
+                text(f"UPDATE {table} SET {column} = GREATEST({column} + :delta, 0) WHERE id = :id"),
+                {"delta": delta, "id": entity_id}
+            )
+            await db.commit()
+
+    async def pending(self, table: str, entity_ids: List[UUID]) -> Dict[str, Dict[str, int]]:
+        """Unflushed deltas per entity id (including a flush in progress)"""
+        if not entity_ids:
+            return {}
+        columns = COUNTER_COLUMNS[table]
+        fields = [f"{entity_id}:{column}" for entity_id in entity_ids for column in columns]
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.hmget(_pending_key(table), fields)
+            pipe.hmget(_flushing_key(table), fields)
+            pending, flushing = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Reading pending counters failed: {e}")
+            return {}
+
+        deltas: Dict[str, Dict[str, int]] = {}
+        for field, a, b in zip(fields, pending, flushing):
+            delta = int(a or 0) + int(b or 0)
+            if delta:
+                entity_id, column = field.rsplit(":", 1)
+                deltas.setdefault(entity_id, {})[column] = delta
+        return deltas
+
+    async def overlay(self, table: str, items: Iterable):
+        """Add pending deltas to response objects carrying `id` and counter fields"""
+        items = list(items)
+        deltas = await self.pending(table, [item.id for item in items])
+        for item in items:
+            for column, delta in deltas.get(str(item.id), {}).items():
+                setattr(item, column, max(getattr(item, column) + delta, 0))
+        return items
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Apply buffered deltas to the database; returns rows updated"""
+        redis = get_redis()
+        token = await acquire_lock(FLUSH_LOCK_KEY, FLUSH_LOCK_SECONDS)
+        if token is None:
+            return 0
+        total = 0
+        try:
+            for table in COUNTER_COLUMNS:
+                if not await extend_lock(FLUSH_LOCK_KEY, token, FLUSH_LOCK_SECONDS):
+                    logger.error("Counter flush lock lost; stopping this flush")
+                    break
+                pending, flushing = _pending_key(table), _flushing_key(table)
+                # A flushing hash left behind is a snapshot whose flush died
+                # somewhere; it is finished (or skipped, if its flush id was
+                # already applied) before a new snapshot is taken
+                if not await redis.exists(flushing):
+                    if not await redis.exists(pending):
+                        continue
+                    await redis.renamenx(pending, flushing)
+                await redis.hsetnx(flushing, FLUSH_ID_FIELD, uuid4().hex)
+                total += await self._apply(db, table, await redis.hgetall(flushing))
+                await redis.delete(flushing)
+        finally:
+            await release_lock(FLUSH_LOCK_KEY, token)
+        return total
+
+    async def _apply(self, db: AsyncSession, table: str, snapshot: Dict[str, str]) -> int:
+        columns = COUNTER_COLUMNS[table]
+        flush_id = snapshot.pop(FLUSH_ID_FIELD)
+        rows: Dict[str, Dict[str, int]] = {}
+        for field, value in snapshot.items():
+            entity_id, column = field.rsplit(":", 1)
+            if column in columns and int(value):
+                rows.setdefault(entity_id, dict.fromkeys(columns, 0))[column] = int(value)
+
+        # Committed together with the UPDATEs below; a concurrent or repeated
+        # apply of the same snapshot waits on / conflicts with this row
+        result = await db.execute(
+            text("""
+                INSERT INTO counter_flushes (flush_id, table_name)
+                VALUES (:flush_id, :table)
+                ON CONFLICT (flush_id) DO NOTHING
+                RETURNING flush_id
+            """),
+            {"flush_id": flush_id, "table": table}
+        )
+        if result.first() is None:
+            await db.rollback()
+            logger.info(f"Counter snapshot {flush_id} for {table} was already applied")
+            return 0
+
+        ids = list(rows)
+        assignments = ", ".join(f"{c} = GREATEST(t.{c} + v.{c}, 0)" for c in columns)
+        for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+            chunk = ids[start:start + FLUSH_BATCH_SIZE]
+            params = {}
+            values = []
+            for i, entity_id in enumerate(chunk):
+                params[f"id{i}"] = entity_id
+                placeholders = [f"CAST(:id{i} AS UUID)"]
+                for c in columns:
+                    params[f"{c}{i}"] = rows[entity_id][c]
+                    placeholders.append(f"CAST(:{c}{i} AS INTEGER)")
+                values.append(f"({', '.join(placeholders)})")
+            await db.execute(
+                text(f"""
+                    UPDATE {table} AS t SET {assignments}
+                    FROM (VALUES {', '.join(values)}) AS v(id, {', '.join(columns)})
+                    WHERE t.id = v.id
+                """),
+                params
+            )
+        await db.execute(
+            text("DELETE FROM counter_flushes WHERE applied_at < NOW() - make_interval(days => :days)"),
+            {"days": FLUSH_ID_RETENTION_DAYS}
+        )
+        await db.commit()
+        if ids:
+            logger.info(f"Flushed counters for {len(ids)} {table} row(s)")
+        return len(ids)
+
+
+# Singleton instance
+_engagement_counter_service: Optional[EngagementCounterService] = None
+
+def get_engagement_counter_service() -> EngagementCounterService:
+    """Get or create engagement counter service instance"""
+    global _engagement_counter_service
+    if _engagement_counter_service is None:
+        _engagement_counter_service = EngagementCounterService()
+    return _engagement_counter_service
+
+
+async def run_counter_flush():
+    """Periodic job: fold buffered like/comment deltas into posts and reels"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await get_engagement_counter_service().flush(db)
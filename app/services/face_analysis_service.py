@@ -0,0 +1,272 @@
+"""
+Server-side selfie analysis
+CPU-only skin tone / undertone classification for devices without the AR stack
+"""
+
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# D65 reference white for sRGB -> XYZ -> LAB
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+# Individual Typology Angle thresholds (degrees) -> tone buckets understood by
+# AIMirrorService._create_ar_overlays
+_ITA_TONES = [
+    (55.0, "fair"),
+    (41.0, "light"),
+    (28.0, "medium"),
+    (10.0, "tan"),
+    (-30.0, "dark"),
+]
+
+
+class AnalysisQueueFullError(Exception):
+    """Raised when the bounded analysis queue cannot accept another selfie"""
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) uint8/float sRGB array to CIE LAB (D65)"""
+    c = rgb.astype(np.float32) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (c @ _RGB_TO_XYZ.T) / _D65_WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    lab = np.empty_like(f)
+    lab[:, 0] = 116.0 * f[:, 1] - 16.0
+    lab[:, 1] = 500.0 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200.0 * (f[:, 1] - f[:, 2])
+    return lab
+
+
+def _decode_and_downscale(data: bytes, max_dim: int) -> np.ndarray:
+    """Decode once, let the JPEG decoder drop DCT scales, then thumbnail"""
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (max_dim, max_dim))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((max_dim, max_dim), Image.BILINEAR)
+    return np.asarray(image)
+
+
+def _sample_skin_region(pixels: np.ndarray, max_samples: int = 4096) -> np.ndarray:
+    """
+    Sample likely skin pixels from the central face ellipse of a selfie.
+    Uses a YCbCr chroma box so hair, background and lips are dropped.
+    """
+    h, w, _ = pixels.shape
+    yy, xx = np.ogrid[:h, :w]
+    # Selfies are framed with the face centred and slightly above the middle
+    ellipse = ((xx - w / 2) / (w * 0.32)) ** 2 + ((yy - h * 0.45) / (h * 0.38)) ** 2 <= 1.0
+
+    rgb = pixels.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = 128.0 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 128.0 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    skin = (cb >= 77) & (cb <= 127) & (cr >= 133) & (cr <= 173) & (y > 40)
+
+    mask = ellipse & skin
+    if mask.sum() < 64:
+        # Poor lighting or unusual framing: fall back to the ellipse alone
+        mask = ellipse
+
+    samples = pixels[mask]
+    if len(samples) > max_samples:
+        step = len(samples) // max_samples
+        samples = samples[::step][:max_samples]
+    return samples
+
+
+def _kmeans(points: np.ndarray, k: int = 3, iterations: int = 12) -> tuple:
+    """Vectorized k-means; returns (centroids, counts) sorted by cluster size"""
+    # Deterministic init spread along lightness so results are reproducible
+    order = np.argsort(points[:, 0])
+    seeds = order[np.linspace(0, len(points) - 1, k).astype(int)]
+    centroids = points[seeds].copy()
+
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        nonempty = counts > 0
+        updated = centroids.copy()
+        updated[nonempty] = sums[nonempty] / counts[nonempty, None]
+        if np.allclose(updated, centroids, atol=0.05):
+            centroids = updated
+            break
+        centroids = updated
+
+    by_size = np.argsort(-counts)
+    return centroids[by_size], counts[by_size]
+
+
+def classify_skin_tone(lab: np.ndarray) -> str:
+    """Map a LAB colour to a tone bucket via the Individual Typology Angle"""
+    ita = np.degrees(np.arctan2(lab[0] - 50.0, max(float(lab[2]), 1e-6)))
+    for threshold, tone in _ITA_TONES:
+        if ita > threshold:
+            return tone
+    return "deep"
+
+
+def classify_undertone(lab: np.ndarray) -> str:
+    """Warm skin leans yellow (high hue angle), cool skin leans pink/red"""
+    hue = np.degrees(np.arctan2(lab[2], lab[1]))
+    if hue >= 60.0:
+        return "warm"
+    if hue <= 45.0:
+        return "cool"
+    return "neutral"
+
+
+def _lab_to_hex(lab: np.ndarray) -> str:
+    """Inverse of srgb_to_lab for a single colour, used for display swatches"""
+    l, a, b = (float(v) for v in lab)
+    fy = (l + 16.0) / 116.0
+    f = np.array([fy + a / 500.0, fy, fy - b / 200.0], dtype=np.float32)
+    xyz = np.where(f ** 3 > 0.008856, f ** 3, (f - 16.0 / 116.0) / 7.787) * _D65_WHITE
+    c = np.linalg.solve(_RGB_TO_XYZ, xyz)
+    c = np.where(c > 0.0031308, 1.055 * np.power(np.clip(c, 0, None), 1 / 2.4) - 0.055, 12.92 * c)
+    rgb = np.clip(np.round(c * 255.0), 0, 255).astype(int)
+    return "#{:02X}{:02X}{:02X}".format(*rgb)
+
+
+def analyze_selfie_bytes(data: bytes, max_dim: int = 256, clusters: int = 3) -> Dict[str, Any]:
+    """
+    Full CPU pipeline for one selfie. Module-level so it can be pickled into
+    a process pool worker.
+    """
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    pixels = _decode_and_downscale(data, max_dim)
+    timings["decode_ms"] = (time.perf_counter() - started) * 1000
+
+    step = time.perf_counter()
+    samples = _sample_skin_region(pixels)
+    timings["sample_ms"] = (time.perf_counter() - step) * 1000
+
+    step = time.perf_counter()
+    lab = srgb_to_lab(samples)
+    centroids, counts = _kmeans(lab, k=min(clusters, len(lab)))
+    timings["cluster_ms"] = (time.perf_counter() - step) * 1000
+
+    dominant = centroids[0]
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+    return {
+        "skin_tone": classify_skin_tone(dominant),
+        "undertone": classify_undertone(dominant),
+        "skin_lab": [round(float(v), 2) for v in dominant],
+        "skin_hex": _lab_to_hex(dominant),
+        "cluster_share": round(float(counts[0]) / float(counts.sum()), 3),
+        "sampled_pixels": int(len(samples)),
+        "image_size": [int(pixels.shape[1]), int(pixels.shape[0])],
+        "timings_ms": {k: round(v, 2) for k, v in timings.items()},
+    }
+
+
+class FaceAnalysisService:
+    """Runs selfie analysis in a process pool behind a bounded queue"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.max_dim = self.settings.FACE_ANALYSIS_MAX_DIM
+        self.max_queue = self.settings.FACE_ANALYSIS_MAX_QUEUE
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.settings.FACE_ANALYSIS_WORKERS)
+        self._pending = 0
+        self._timings: List[float] = []
+        self._processed = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.settings.FACE_ANALYSIS_WORKERS)
+        return self._pool
+
+    async def analyze(self, data: bytes) -> Dict[str, Any]:
+        """Analyze a selfie; raises AnalysisQueueFullError when saturated"""
+        if self._pending >= self.max_queue:
+            self._rejected += 1
+            raise AnalysisQueueFullError("Face analysis queue is full")
+
+        self._pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots:
+                wait_ms = (time.perf_counter() - queued_at) * 1000
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._get_pool(), analyze_selfie_bytes, data, self.max_dim
+                )
+        except AnalysisQueueFullError:
+            raise
+        except Exception as e:
+            self._failed += 1
+            logger.error(f"Face analysis failed: {e}")
+            raise
+        finally:
+            self._pending -= 1
+
+        result["timings_ms"]["queue_wait_ms"] = round(wait_ms, 2)
+        self._record(result["timings_ms"]["total_ms"])
+        logger.info(
+            f"Face analysis: tone={result['skin_tone']} undertone={result['undertone']} "
+            f"total={result['timings_ms']['total_ms']}ms wait={result['timings_ms']['queue_wait_ms']}ms"
+        )
+        return result
+
+    def _record(self, total_ms: float):
+        self._processed += 1
+        self._timings.append(total_ms)
+        # Keep a rolling window for percentile metrics
+        if len(self._timings) > 1000:
+            self._timings = self._timings[-1000:]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and per-image timing percentiles"""
+        timings = np.array(self._timings) if self._timings else np.zeros(1)
+        return {
+            "processed": self._processed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            "p50_ms": round(float(np.percentile(timings, 50)), 2),
+            "p95_ms": round(float(np.percentile(timings, 95)), 2),
+            "max_ms": round(float(timings.max()), 2),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Singleton instance
+_face_analysis_service: Optional[FaceAnalysisService] = None
+
+def get_face_analysis_service() -> FaceAnalysisService:
+    """Get or create face analysis service instance"""
+    global _face_analysis_service
+    if _face_analysis_service is None:
+        _face_analysis_service = FaceAnalysisService()
+    return _face_analysis_service
@@ -0,0 +1,183 @@
+"""
+Home feed ranking
+Builds a per-user ranked list of posts from three candidate sources
+(recent, trending, nearest to the user's liked content), scores the batch
+with a time-decayed engagement model in numpy and caches the ordered ids
+in Redis, so paging is a list slice plus one hydrate query.
+"""
+
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import FeedPost
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Engagement weights: a comment or share says more than a tap on like
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+SHARE_WEIGHT = 3.0
+
+
+def _ranked_key(user_id) -> str:
+    return f"feed:ranked:{user_id}"
+
+
+class FeedRankingService:
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def taste_vector(self, db: AsyncSession, user_id: UUID) -> Optional[np.ndarray]:
+        """Normalised mean embedding of the user's most recently liked posts and reels"""
+        result = await db.execute(
+            text("""
+                SELECT embedding::text FROM (
+                    SELECT COALESCE(fp.embedding, r.embedding) AS embedding, l.created_at
+                    FROM likes l
+                    LEFT JOIN feed_posts fp ON fp.id = l.post_id
+                    LEFT JOIN reels r ON r.id = l.reel_id
+                    WHERE l.user_id = :user_id
+                ) liked
+                WHERE embedding IS NOT NULL
+                ORDER BY created_at DESC
+                LIMIT :limit
+            """),
+            {"user_id": user_id, "limit": self.settings.FEED_RANK_TASTE_LIKES}
+        )
+        rows = result.all()
+        if not rows:
+            return None
+        vector = np.array([json.loads(row[0]) for row in rows], dtype=np.float32).mean(axis=0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    async def candidates(self, db: AsyncSession, taste: Optional[np.ndarray]) -> List[Tuple]:
+        """
+        Union of the candidate sources with the features the scorer needs:
+        (id, likes, comments, shares, created epoch, similarity)
+        """
+        settings = self.settings
+        params = {
+            "recent": settings.FEED_RANK_RECENT_CANDIDATES,
+            "trending": settings.FEED_RANK_TRENDING_CANDIDATES,
+        }
+        sources = [
+            """(SELECT id FROM feed_posts
+                WHERE is_published = TRUE
+                ORDER BY created_at DESC
+                LIMIT :recent)""",
+            # Served by idx_feed_posts_trending_score (kept by the trending job)
+            """(SELECT id FROM feed_posts
+                WHERE is_published = TRUE AND trending_score > 0
+                ORDER BY trending_score DESC
+                LIMIT :trending)""",
+        ]
+        similarity = "0.0"
+        if taste is not None:
+            params["taste"] = "[" + ",".join(str(round(float(v), 6)) for v in taste) + "]"
+            params["similar"] = settings.FEED_RANK_SIMILAR_CANDIDATES
+            # Served by idx_feed_posts_embedding (ivfflat, cosine)
+            sources.append(
+                """(SELECT id FROM feed_posts
+                    WHERE is_published = TRUE AND embedding IS NOT NULL
+                    ORDER BY embedding <=> CAST(:taste AS vector)
+                    LIMIT :similar)"""
+            )
+            similarity = "COALESCE(1 - (fp.embedding <=> CAST(:taste AS vector)), 0.0)"
+
+        result = await db.execute(
+            text(f"""
+                WITH candidates AS (
+                    {' UNION '.join(sources)}
+                )
+                SELECT fp.id, fp.like_count, fp.comment_count, fp.share_count,
+                       EXTRACT(EPOCH FROM fp.created_at), {similarity}
+                FROM feed_posts fp
+                JOIN candidates c ON c.id = fp.id
+            """),
+            params
+        )
+        return result.all()
+
+    def score(self, rows: List[Tuple], now: float) -> np.ndarray:
+        """Time-decayed engagement, boosted by similarity to the user's taste"""
+        features = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 5)
+        likes, comments, shares, created, similarity = features.T
+        engagement = np.log1p(
+            LIKE_WEIGHT * np.maximum(likes, 0)
+            + COMMENT_WEIGHT * np.maximum(comments, 0)
+            + SHARE_WEIGHT * np.maximum(shares, 0)
+        )
+        age_hours = np.maximum(now - created, 0) / 3600.0
+        decay = np.exp2(-age_hours / self.settings.FEED_RANK_HALF_LIFE_HOURS)
+        boost = 1.0 + self.settings.FEED_RANK_SIMILARITY_WEIGHT * np.clip(similarity, 0.0, 1.0)
+        # +1 so fresh posts with no engagement yet still rank by recency
+        return (1.0 + engagement) * decay * boost
+
+    async def rank(self, db: AsyncSession, user_id: UUID) -> List[str]:
+        """Compute the user's ranked post ids, best first"""
+        taste = await self.taste_vector(db, user_id)
+        rows = await self.candidates(db, taste)
+        if not rows:
+            return []
+        scores = self.score(rows, time.time())
+        order = np.argsort(-scores, kind="stable")
+        return [str(rows[i][0]) for i in order]
+
+    async def ranked_ids(self, db: AsyncSession, user_id: UUID, skip: int, limit: int, refresh: bool = False) -> List[str]:
+        """A page of the cached ranked list, building it on a miss or refresh"""
+        redis = get_redis()
+        key = _ranked_key(user_id)
+        try:
+            if not refresh and await redis.exists(key):
+                return await redis.lrange(key, skip, skip + limit - 1)
+        except Exception as e:
+            logger.error(f"Ranked feed cache read failed: {e}")
+            redis = None
+
+        ids = await self.rank(db, user_id)
+        if redis is not None:
+            try:
+                pipe = redis.pipeline(transaction=True)
+                pipe.delete(key)
+                if ids:
+                    pipe.rpush(key, *ids)
+                    pipe.expire(key, self.settings.FEED_RANK_CACHE_TTL_SECONDS)
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Ranked feed cache write failed: {e}")
+        return ids[skip:skip + limit]
+
+    async def page(self, db: AsyncSession, user_id: UUID, skip: int, limit: int, refresh: bool = False) -> List[FeedPost]:
+        """Hydrate a page of the ranked feed in one query, keeping rank order"""
+        ids = await self.ranked_ids(db, user_id, skip, limit, refresh)
+        if not ids:
+            return []
+        result = await db.execute(
+            select(FeedPost).where(
+                FeedPost.id.in_([UUID(i) for i in ids]) & (FeedPost.is_published == True)
+            )
+        )
+        posts = {str(post.id): post for post in result.scalars().all()}
+        # Posts deleted or unpublished since ranking simply drop out of the page
+        return [posts[i] for i in ids if i in posts]
+
+
+# Singleton instance
+_feed_ranking_service: Optional[FeedRankingService] = None
+
+def get_feed_ranking_service() -> FeedRankingService:
+    """Get or create feed ranking service instance"""
+    global _feed_ranking_service
+    if _feed_ranking_service is None:
+        _feed_ranking_service = FeedRankingService()
+    return _feed_ranking_service
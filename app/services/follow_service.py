@@ -0,0 +1,376 @@
+"""
+Follow graph and timelines
+Follows live in Postgres with Redis set adjacency (followers/following per
+user) for membership checks and counts. New posts and reels are fanned out
+on write into each follower's capped sorted-set timeline; authors above
+the celebrity threshold only write to their own outbox, which followers
+merge in on read.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+# A key holding the sentinel was loaded in full from Postgres; without it the
+# key only has the writes seen since it expired and is reloaded on read.
+# Timeline/outbox sentinels score 0, below every real timestamp. Loaded keys
+# expire after FOLLOW_CACHE_TTL_SECONDS without a read; partial keys created
+# by writes get the same TTL once (EXPIRE NX) so writes never keep them alive.
+SENTINEL = "_"
+CELEBRITIES_KEY = "follow:celebrities"
+FANOUT_CHUNK = 1000
+
+# Timeline kind -> (model name in app.models, table, extra filter)
+KINDS = {
+    "posts": ("FeedPost", "feed_posts", "AND is_published = TRUE"),
+    "reels": ("Reel", "reels", ""),
+}
+
+
+class FollowTargetNotFoundError(Exception):
+    """The user being followed does not exist"""
+
+
+def _following_key(user_id) -> str:
+    return f"follow:following:{user_id}"
+
+
+def _followers_key(user_id) -> str:
+    return f"follow:followers:{user_id}"
+
+
+def _timeline_key(kind: str, user_id) -> str:
+    return f"timeline:{kind}:{user_id}"
+
+
+def _outbox_key(kind: str, user_id) -> str:
+    return f"outbox:{kind}:{user_id}"
+
+
+def to_score(value: datetime) -> float:
+    """Timeline score for a (naive UTC) created_at"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class FollowService:
+    def __init__(self):
+        self.settings = get_settings()
+
+    # Adjacency sets
+
+    async def _load_set(self, db: AsyncSession, key: str, query: str, params: dict) -> Set[str]:
+        redis = get_redis()
+        ttl = self.settings.FOLLOW_CACHE_TTL_SECONDS
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.smembers(key)
+            pipe.expire(key, ttl)
+            members, _ = await pipe.execute()
+            if SENTINEL in members:
+                members.discard(SENTINEL)
+                return members
+        except Exception as e:
+            logger.error(f"Follow cache read failed for {key}: {e}")
+            redis = None
+
+        result = await db.execute(text(query), params)
+        members = {str(row[0]) for row in result.all()}
+        if redis is not None:
+            try:
+                pipe = redis.pipeline(transaction=True)
+                pipe.sadd(key, SENTINEL, *members)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Follow cache fill failed for {key}: {e}")
+        return members
+
+    async def followers(self, db: AsyncSession, user_id: UUID) -> Set[str]:
+        return await self._load_set(
+            db, _followers_key(user_id),
+            "SELECT follower_id FROM follows WHERE followee_id = :user_id", {"user_id": user_id}
+        )
+
+    async def following(self, db: AsyncSession, user_id: UUID) -> Set[str]:
+        return await self._load_set(
+            db, _following_key(user_id),
+            "SELECT followee_id FROM follows WHERE follower_id = :user_id", {"user_id": user_id}
+        )
+
+    async def celebrities(self, db: AsyncSession) -> Set[str]:
+        """Authors fanned out on read"""
+        return await self._load_set(
+            db, CELEBRITIES_KEY,
+            """
+                SELECT followee_id FROM follows
+                GROUP BY followee_id
+                HAVING COUNT(*) > :threshold
+            """,
+            {"threshold": self.settings.FOLLOW_CELEBRITY_THRESHOLD}
+        )
+
+    async def counts(self, db: AsyncSession, user_id: UUID) -> Tuple[int, int]:
+        """(followers, following)"""
+        redis = get_redis()
+        pairs = []
+        for key, load in ((_followers_key(user_id), self.followers), (_following_key(user_id), self.following)):
+            try:
+                if await redis.sismember(key, SENTINEL):
+                    pairs.append(await redis.scard(key) - 1)
+                    continue
+            except Exception as e:
+                logger.error(f"Follow count read failed for {key}: {e}")
+            pairs.append(len(await load(db, user_id)))
+        return pairs[0], pairs[1]
+
+    async def is_following(self, db: AsyncSession, follower_id: UUID, followee_id: UUID) -> bool:
+        return str(followee_id) in await self.following(db, follower_id)
+
+    # Follow / unfollow
+
+    async def follow(self, db: AsyncSession, follower_id: UUID, followee_id: UUID) -> bool:
+        """Returns True if a follow was created, False if it already existed. Commits."""
+        try:
+            result = await db.execute(
+                text("""
+                    INSERT INTO follows (follower_id, followee_id, created_at)
+                    VALUES (:follower_id, :followee_id, NOW())
+                    ON CONFLICT (follower_id, followee_id) DO NOTHING
+                    RETURNING follower_id
+                """),
+                {"follower_id": follower_id, "followee_id": followee_id}
+            )
+            created = result.first() is not None
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise FollowTargetNotFoundError(f"user {followee_id} not found")
+        if not created:
+            return False
+
+        ttl = self.settings.FOLLOW_CACHE_TTL_SECONDS
+        try:
+            redis = get_redis()
+            pipe = redis.pipeline(transaction=False)
+            for key, member in ((_following_key(follower_id), followee_id), (_followers_key(followee_id), follower_id)):
+                pipe.sadd(key, str(member))
+                pipe.expire(key, ttl, nx=True)
+            await pipe.execute()
+
+            followers, _ = await self.counts(db, followee_id)
+            if followers > self.settings.FOLLOW_CELEBRITY_THRESHOLD:
+                # Sticky: demoting would strand posts made while fanned out on read
+                pipe = redis.pipeline(transaction=False)
+                pipe.sadd(CELEBRITIES_KEY, str(followee_id))
+                pipe.expire(CELEBRITIES_KEY, ttl, nx=True)
+                await pipe.execute()
+            elif str(followee_id) not in await self.celebrities(db):
+                await self._backfill(db, follower_id, followee_id)
+        except Exception as e:
+            logger.error(f"Follow fan-out update failed: {e}")
+        return True
+
+    async def unfollow(self, db: AsyncSession, follower_id: UUID, followee_id: UUID) -> bool:
+        """Returns True if a follow was removed. Commits."""
+        result = await db.execute(
+            text("""
+                DELETE FROM follows
+                WHERE follower_id = :follower_id AND followee_id = :followee_id
+                RETURNING follower_id
+            """),
+            {"follower_id": follower_id, "followee_id": followee_id}
+        )
+        removed = result.first() is not None
+        await db.commit()
+        if not removed:
+            return False
+
+        try:
+            redis = get_redis()
+            pipe = redis.pipeline(transaction=False)
+            pipe.srem(_following_key(follower_id), str(followee_id))
+            pipe.srem(_followers_key(followee_id), str(follower_id))
+            await pipe.execute()
+            # The outbox may have expired and only hold recent items, so
+            # drop the timelines and let the next read reload them without
+            # the followee
+            await redis.delete(*[_timeline_key(kind, follower_id) for kind in KINDS])
+        except Exception as e:
+            logger.error(f"Unfollow fan-out update failed: {e}")
+        return True
+
+    async def _backfill(self, db: AsyncSession, follower_id: UUID, followee_id: UUID):
+        """Copy a new followee's recent items into the follower's timelines"""
+        redis = get_redis()
+        for kind in KINDS:
+            items = await self._outbox(db, kind, followee_id)
+            if items:
+                timeline = _timeline_key(kind, follower_id)
+                pipe = redis.pipeline(transaction=False)
+                pipe.zadd(timeline, dict(items))
+                pipe.zremrangebyrank(timeline, 1, -(self.settings.TIMELINE_MAX_LENGTH + 1))
+                pipe.expire(timeline, self.settings.FOLLOW_CACHE_TTL_SECONDS, nx=True)
+                await pipe.execute()
+
+    # Sorted-set timelines
+
+    async def _load_zset(self, db: AsyncSession, key: str, query: str, params: dict):
+        """Fill a timeline/outbox from Postgres unless it is already complete; refreshes its TTL"""
+        redis = get_redis()
+        ttl = self.settings.FOLLOW_CACHE_TTL_SECONDS
+        pipe = redis.pipeline(transaction=False)
+        pipe.zscore(key, SENTINEL)
+        pipe.expire(key, ttl)
+        loaded, _ = await pipe.execute()
+        if loaded is not None:
+            return
+        result = await db.execute(text(query), {**params, "limit": self.settings.TIMELINE_MAX_LENGTH})
+        entries = {str(row[0]): float(row[1]) for row in result.all()}
+        entries[SENTINEL] = 0
+        pipe = redis.pipeline(transaction=True)
+        pipe.zadd(key, entries)
+        pipe.expire(key, ttl)
+        await pipe.execute()
+
+    async def _outbox(self, db: AsyncSession, kind: str, author_id) -> List[Tuple[str, float]]:
+        _, table, extra = KINDS[kind]
+        key = _outbox_key(kind, author_id)
+        await self._load_zset(
+            db, key,
+            f"""
+                SELECT id, EXTRACT(EPOCH FROM created_at) FROM {table}
+                WHERE user_id = :author_id {extra}
+                ORDER BY created_at DESC
+                LIMIT :limit
+            """,
+            {"author_id": author_id}
+        )
+        return await get_redis().zrangebyscore(key, "(0", "+inf", withscores=True)
+
+    async def publish(self, kind: str, author_id: UUID, item_id: UUID, created_at: datetime):
+        """Fan a new post/reel out to followers (run after the row is committed)"""
+        from app.database import AsyncSessionLocal
+
+        redis = get_redis()
+        cap = self.settings.TIMELINE_MAX_LENGTH
+        ttl = self.settings.FOLLOW_CACHE_TTL_SECONDS
+        member = {str(item_id): to_score(created_at)}
+        try:
+            outbox = _outbox_key(kind, author_id)
+            pipe = redis.pipeline(transaction=False)
+            pipe.zadd(outbox, member)
+            pipe.zremrangebyrank(outbox, 1, -(cap + 1))
+            pipe.expire(outbox, ttl, nx=True)
+            await pipe.execute()
+
+            async with AsyncSessionLocal() as db:
+                if str(author_id) in await self.celebrities(db):
+                    return
+                followers = list(await self.followers(db, author_id))
+
+            for start in range(0, len(followers), FANOUT_CHUNK):
+                pipe = redis.pipeline(transaction=False)
+                for follower_id in followers[start:start + FANOUT_CHUNK]:
+                    timeline = _timeline_key(kind, follower_id)
+                    pipe.zadd(timeline, member)
+                    pipe.zremrangebyrank(timeline, 1, -(cap + 1))
+                    pipe.expire(timeline, ttl, nx=True)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Timeline fan-out of {kind} {item_id} failed: {e}")
+
+    async def retract(self, kind: str, author_id: UUID, item_id: UUID):
+        """Drop a deleted item from the author's outbox; timelines skip it on hydrate"""
+        try:
+            await get_redis().zrem(_outbox_key(kind, author_id), str(item_id))
+        except Exception as e:
+            logger.error(f"Timeline retract of {kind} {item_id} failed: {e}")
+
+    async def timeline_ids(self, db: AsyncSession, kind: str, user_id: UUID, before: Optional[float], limit: int) -> List[str]:
+        """Newest-first item ids older than `before` from followed authors"""
+        _, table, extra = KINDS[kind]
+        redis = get_redis()
+        timeline = _timeline_key(kind, user_id)
+        await self._load_zset(
+            db, timeline,
+            f"""
+                SELECT id, EXTRACT(EPOCH FROM created_at) FROM {table}
+                WHERE user_id IN (SELECT followee_id FROM follows WHERE follower_id = :user_id) {extra}
+                ORDER BY created_at DESC
+                LIMIT :limit
+            """,
+            {"user_id": user_id}
+        )
+
+        followed_celebrities = (await self.following(db, user_id)) & (await self.celebrities(db))
+        for author_id in followed_celebrities:
+            await self._outbox(db, kind, author_id)
+
+        upper = f"({before}" if before is not None else "+inf"
+        pipe = redis.pipeline(transaction=False)
+        for key in [timeline] + [_outbox_key(kind, a) for a in followed_celebrities]:
+            pipe.zrevrangebyscore(key, upper, "(0", start=0, num=limit, withscores=True)
+        merged: Dict[str, float] = {}
+        for entries in await pipe.execute():
+            merged.update(entries)
+        return [item_id for item_id, _ in sorted(merged.items(), key=lambda e: -e[1])[:limit]]
+
+    async def _timeline_ids_from_db(self, db: AsyncSession, kind: str, user_id: UUID, before: Optional[float], limit: int) -> List[str]:
+        """Fan-out-on-read straight from Postgres, for when Redis is unavailable"""
+        _, table, extra = KINDS[kind]
+        params = {"user_id": user_id, "limit": limit}
+        if before is not None:
+            extra += " AND created_at < to_timestamp(:before) AT TIME ZONE 'UTC'"
+            params["before"] = before
+        result = await db.execute(
+            text(f"""
+                SELECT id FROM {table}
+                WHERE user_id IN (SELECT followee_id FROM follows WHERE follower_id = :user_id) {extra}
+                ORDER BY created_at DESC
+                LIMIT :limit
+            """),
+            params
+        )
+        return [str(row[0]) for row in result.all()]
+
+    async def timeline(self, db: AsyncSession, kind: str, user_id: UUID, before: Optional[float], limit: int) -> list:
+        """A timeline page hydrated in one query, newest first"""
+        from app import models
+
+        model = getattr(models, KINDS[kind][0])
+        try:
+            ids = await self.timeline_ids(db, kind, user_id, before, limit)
+        except Exception as e:
+            logger.error(f"Timeline read failed, reading from the database: {e}")
+            ids = await self._timeline_ids_from_db(db, kind, user_id, before, limit)
+        if not ids:
+            return []
+        query = select(model).where(model.id.in_([UUID(i) for i in ids]))
+        if kind == "posts":
+            query = query.where(model.is_published == True)
+        result = await db.execute(query)
+        rows = {str(row.id): row for row in result.scalars().all()}
+        return [rows[i] for i in ids if i in rows]
+
+
+# Singleton instance
+_follow_service: Optional[FollowService] = None
+
+def get_follow_service() -> FollowService:
+    """Get or create follow service instance"""
+    global _follow_service
+    if _follow_service is None:
+        _follow_service = FollowService()
+    return _follow_service
@@ -0,0 +1,388 @@
+"""
+Image derivatives
+Decodes each uploaded image once in a process pool, auto-orients it, drops
+EXIF/XMP metadata and publishes responsive WebP (and AVIF when the codec is
+available) variants next to the original. Images uploaded straight to the
+bucket are queued in Postgres and processed by workers that read them back
+from storage, so API requests never carry their bytes.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from PIL import Image, ImageOps, features
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.media import MediaUpload
+from app.services.image_placeholder import compute_placeholder
+from app.services.look_snapshot_service import IMMUTABLE_CACHE_CONTROL
+from app.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def avif_supported() -> bool:
+    """Pillow gained native AVIF in 11.3; older builds need the pillow-avif plugin"""
+    try:
+        if "avif" in features.get_supported_codecs() and features.check("avif"):
+            return True
+    except Exception:
+        pass
+    try:
+        import pillow_avif  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _encode(image: Image.Image, fmt: str, quality: int, icc_profile: Optional[bytes]) -> bytes:
+    buffer = io.BytesIO()
+    # Only the ICC profile is carried over; EXIF/XMP are never passed to save()
+    params = {"quality": quality}
+    if icc_profile:
+        params["icc_profile"] = icc_profile
+    if fmt == "webp":
+        image.save(buffer, format="WEBP", method=4, **params)
+    else:
+        # Registers the AVIF codec in pool workers that were not forked from a
+        # process that already imported it
+        avif_supported()
+        image.save(buffer, format="AVIF", speed=8, **params)
+    return buffer.getvalue()
+
+
+def build_derivatives(
+    data: bytes,
+    widths: List[int],
+    quality: int = 80,
+    formats: tuple = ("webp",)
+) -> Dict[str, Any]:
+    """
+    Decode once, encode every width/format pair and derive the blurhash and
+    dominant colour. Module-level so it can be pickled into a process pool
+    worker.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    icc_profile = image.info.get("icc_profile")
+
+    targets = sorted({min(w, width) for w in widths}, reverse=True)
+    # JPEG can decode at 1/2, 1/4, 1/8 scale; a square box keeps the hint
+    # valid whichever way the image is rotated
+    image.draft("RGB", (targets[0], targets[0]))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    timings["decode_ms"] = (time.perf_counter() - started) * 1000
+
+    step = time.perf_counter()
+    variants = []
+    current = image
+    # Largest first, each smaller width resampled from the previous one
+    for target in targets:
+        if current.width != target:
+            current = current.resize(
+                (target, max(1, round(current.height * target / current.width))),
+                Image.LANCZOS
+            )
+        for fmt in formats:
+            variants.append({
+                "width": current.width,
+                "height": current.height,
+                "format": fmt,
+                "data": _encode(current, fmt, quality, icc_profile),
+            })
+    timings["encode_ms"] = (time.perf_counter() - step) * 1000
+
+    # The smallest variant is already in memory; placeholders come from it
+    step = time.perf_counter()
+    placeholder = compute_placeholder(current)
+    timings["placeholder_ms"] = (time.perf_counter() - step) * 1000
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+    return {
+        "width": width,
+        "height": height,
+        "variants": variants,
+        **placeholder,
+        "timings_ms": {k: round(v, 2) for k, v in timings.items()},
+    }
+
+
+class ImageDerivativeService:
+    """Generates and stores image variants off the event loop"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.widths = list(self.settings.IMAGE_VARIANT_WIDTHS)
+        self.formats = ("webp", "avif") if avif_supported() else ("webp",)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.settings.IMAGE_DERIVATIVE_WORKERS)
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        for i in range(self.settings.IMAGE_DERIVATIVE_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    async def enqueue(self, db: AsyncSession, key: str, size: int):
+        """
+        Queue variants for a stored original in the caller's transaction.
+        A key whose earlier job finished (or failed) is queued again, since
+        its variants may have been purged with the object. Caller commits,
+        then calls notify().
+        """
+        await db.execute(
+            text("""
+                INSERT INTO image_derivative_jobs (source_key, size)
+                VALUES (:key, :size)
+                ON CONFLICT (source_key) DO UPDATE
+                SET status = 'queued', attempts = 0, error = NULL, size = EXCLUDED.size, created_at = NOW()
+                WHERE image_derivative_jobs.status IN ('complete', 'failed')
+            """),
+            {"key": key, "size": size}
+        )
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued on this node"""
+        self._wakeup.set()
+
+    async def _worker(self, index: int):
+        from app.database import AsyncSessionLocal
+
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    job = await self._claim(db)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.settings.IMAGE_DERIVATIVE_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Image derivative worker {index} error: {e}")
+                await asyncio.sleep(self.settings.IMAGE_DERIVATIVE_POLL_SECONDS)
+
+    async def _claim(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """Oldest queued job or one whose worker died; same scheme as transcode jobs"""
+        params = {
+            "timeout": self.settings.IMAGE_DERIVATIVE_JOB_TIMEOUT_SECONDS,
+            "max_attempts": self.settings.IMAGE_DERIVATIVE_MAX_ATTEMPTS,
+        }
+        await db.execute(
+            text("""
+                UPDATE image_derivative_jobs
+                SET status = 'failed',
+                    error = 'Worker stopped responding on the final attempt'
+                WHERE status = 'processing'
+                  AND started_at < NOW() - make_interval(secs => :timeout)
+                  AND attempts >= :max_attempts
+            """),
+            params
+        )
+        result = await db.execute(
+            text("""
+                UPDATE image_derivative_jobs
+                SET status = 'processing', started_at = NOW(), attempts = attempts + 1
+                WHERE id = (
+                    SELECT id FROM image_derivative_jobs
+                    WHERE (status = 'queued'
+                           OR (status = 'processing'
+                               AND started_at < NOW() - make_interval(secs => :timeout)))
+                      AND attempts < :max_attempts
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, source_key, size, attempts
+            """),
+            params
+        )
+        row = result.fetchone()
+        await db.commit()
+        if row is None:
+            return None
+        return {"id": row[0], "source_key": row[1], "size": row[2], "attempts": row[3]}
+
+    async def _process_job(self, job: Dict[str, Any]):
+        from app.database import AsyncSessionLocal
+
+        storage = get_storage_service()
+        bucket = self.settings.AWS_S3_BUCKET
+        key = job["source_key"]
+        try:
+            data = await storage.read_range(bucket, key, job["size"])
+            asset = await self.process(bucket, key, storage.public_url(bucket, key), data)
+            error = None if asset else "Image could not be processed"
+        except Exception as e:
+            asset, error = None, str(e)
+
+        async with AsyncSessionLocal() as db:
+            if asset is None:
+                retry = job["attempts"] < self.settings.IMAGE_DERIVATIVE_MAX_ATTEMPTS
+                await db.execute(
+                    text("UPDATE image_derivative_jobs SET status = :status, error = :error WHERE id = :id"),
+                    {"status": "queued" if retry else "failed", "error": error[-2000:], "id": job["id"]}
+                )
+            else:
+                # Every upload of this key (dedup shares keys) picks the asset up
+                params = {"key": key, "asset": json.dumps(asset), "id": job["id"]}
+                await db.execute(
+                    text("UPDATE media_uploads SET asset = CAST(:asset AS JSONB) WHERE key = :key AND asset IS NULL"),
+                    params
+                )
+                await db.execute(
+                    text("UPDATE media_objects SET asset = CAST(:asset AS JSONB) WHERE key = :key AND asset IS NULL"),
+                    params
+                )
+                await db.execute(
+                    text("""
+                        UPDATE image_derivative_jobs
+                        SET status = 'complete', error = NULL, completed_at = NOW()
+                        WHERE id = :id
+                    """),
+                    params
+                )
+            await db.commit()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.settings.IMAGE_DERIVATIVE_WORKERS)
+        return self._pool
+
+    async def process(self, bucket: str, key: str, url: str, data: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Build and upload variants for a stored original. Returns the image
+        asset recorded in `images` JSON columns, or None when the image
+        cannot be processed (the original is still usable as-is).
+        """
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._get_pool(),
+                    build_derivatives,
+                    data,
+                    self.widths,
+                    self.settings.IMAGE_VARIANT_QUALITY,
+                    self.formats
+                )
+
+            storage = get_storage_service()
+            base = key.rsplit(".", 1)[0]
+
+            async def store(variant: dict) -> dict:
+                variant_key = f"{base}_w{variant['width']}.{variant['format']}"
+                stored = await storage.upload_file(
+                    io.BytesIO(variant["data"]),
+                    bucket,
+                    variant_key,
+                    content_type=f"image/{variant['format']}",
+                    cache_control=IMMUTABLE_CACHE_CONTROL
+                )
+                return {
+                    "url": stored["url"],
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "format": variant["format"],
+                    "size": len(variant["data"]),
+                }
+
+            variants = await asyncio.gather(*(store(v) for v in result["variants"]))
+        except Exception as e:
+            logger.error(f"Image derivatives failed for {key}: {e}")
+            return None
+
+        logger.info(
+            f"Image derivatives for {key}: {len(variants)} variant(s) in {result['timings_ms']['total_ms']}ms"
+        )
+        return {
+            "url": url,
+            "width": result["width"],
+            "height": result["height"],
+            "blurhash": result["blurhash"],
+            "dominant_color": result["dominant_color"],
+            "variants": list(variants),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+async def resolve_image_assets(db: AsyncSession, images: List[Any]) -> List[Any]:
+    """
+    Swap image URLs for their recorded derivative assets. URLs that were not
+    ingested through /api/upload (or are still processing) stay plain strings.
+    """
+    if not images:
+        return []
+    urls = [i for i in images if isinstance(i, str)]
+    if not urls:
+        return list(images)
+
+    storage = get_storage_service()
+    bucket = get_settings().AWS_S3_BUCKET
+    keys = {storage.key_for_url(bucket, url): url for url in urls}
+    keys.pop(None, None)
+    if not keys:
+        return list(images)
+
+    result = await db.execute(
+        select(MediaUpload.key, MediaUpload.asset).where(
+            MediaUpload.key.in_(list(keys)),
+            MediaUpload.asset.isnot(None)
+        )
+    )
+    assets = {keys[key]: asset for key, asset in result.all()}
+    return [assets.get(i, i) if isinstance(i, str) else i for i in images]
+
+
+async def resolve_image_asset(db: AsyncSession, url: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Recorded asset for a single image URL, if it was ingested"""
+    if not url:
+        return None
+    resolved = (await resolve_image_assets(db, [url]))[0]
+    return resolved if isinstance(resolved, dict) else None
+
+
+# Singleton instance
+_image_derivative_service: Optional[ImageDerivativeService] = None
+
+def get_image_derivative_service() -> ImageDerivativeService:
+    """Get or create image derivative service instance"""
+    global _image_derivative_service
+    if _image_derivative_service is None:
+        _image_derivative_service = ImageDerivativeService()
+    return _image_derivative_service
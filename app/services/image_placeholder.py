@@ -0,0 +1,96 @@
+"""
+Image placeholders
+Blurhash strings and dominant colours computed with vectorized NumPy on a
+downscaled copy, so clients can paint a tile before the image arrives
+"""
+
+from typing import Dict, Any
+
+import numpy as np
+from PIL import Image
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+# Blurhash only needs a handful of cosine terms; 32px is plenty of signal
+PLACEHOLDER_SIZE = 32
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(c: np.ndarray) -> np.ndarray:
+    c = c.astype(np.float64) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(v: np.ndarray) -> np.ndarray:
+    v = np.clip(v, 0.0, 1.0)
+    srgb = np.where(v <= 0.0031308, v * 12.92, 1.055 * np.power(v, 1 / 2.4) - 0.055)
+    return np.floor(srgb * 255 + 0.5).astype(int)
+
+
+def encode_blurhash(pixels: np.ndarray, x_components: int = 4, y_components: int = 3) -> str:
+    """Blurhash of an (H, W, 3) uint8 sRGB array"""
+    height, width, _ = pixels.shape
+    linear = _srgb_to_linear(pixels[..., :3])
+
+    # Separable DCT-style basis: factors[j, i] = sum_yx cos_y[j, y] cos_x[i, x] rgb[y, x]
+    cos_x = np.cos(np.pi * np.arange(x_components)[:, None] * np.arange(width)[None, :] / width)
+    cos_y = np.cos(np.pi * np.arange(y_components)[:, None] * np.arange(height)[None, :] / height)
+    factors = np.einsum("jy,ix,yxc->jic", cos_y, cos_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if len(ac):
+        actual_max = float(np.abs(ac).max())
+        quantised_max = int(max(0, min(82, np.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        result += _encode83(0, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    result += _encode83((int(r) << 16) + (int(g) << 8) + int(b), 4)
+
+    scaled = ac / max_value
+    quantised = np.clip(np.floor(np.sign(scaled) * np.sqrt(np.abs(scaled)) * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        result += _encode83(int(qr) * 19 * 19 + int(qg) * 19 + int(qb), 2)
+    return result
+
+
+def dominant_color(pixels: np.ndarray, alpha: np.ndarray = None) -> str:
+    """
+    Most populated 4-bit-per-channel colour bin, reported as the mean of its
+    pixels. Fully transparent pixels are ignored.
+    """
+    rgb = pixels[..., :3].reshape(-1, 3)
+    if alpha is not None:
+        opaque = alpha.reshape(-1) > 0
+        if opaque.any():
+            rgb = rgb[opaque]
+    bins = (rgb >> 4).astype(np.int32)
+    index = (bins[:, 0] << 8) | (bins[:, 1] << 4) | bins[:, 2]
+    top = np.bincount(index, minlength=4096).argmax()
+    r, g, b = np.round(rgb[index == top].mean(axis=0)).astype(int)
+    return "#{:02X}{:02X}{:02X}".format(r, g, b)
+
+
+def compute_placeholder(image: Image.Image) -> Dict[str, Any]:
+    """Blurhash + dominant colour for a decoded (ideally already small) image"""
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BOX)
+    pixels = np.asarray(small.convert("RGBA"))
+    alpha = pixels[..., 3] if image.mode in ("RGBA", "LA") else None
+    # Keep the hash's component grid roughly in the image's aspect ratio
+    x_components, y_components = (4, 3) if small.width >= small.height else (3, 4)
+    return {
+        "blurhash": encode_blurhash(pixels[..., :3], x_components, y_components),
+        "dominant_color": dominant_color(pixels, alpha),
+    }
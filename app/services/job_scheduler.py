@@ -0,0 +1,100 @@
+"""
+In-process periodic job runner
+Background maintenance tasks started and stopped with the app lifespan
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], Awaitable]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.task: Optional[asyncio.Task] = None
+        self.last_run_at: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def run_once(self):
+        started = time.perf_counter()
+        try:
+            await self.func()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Job {self.name} failed: {e}")
+        finally:
+            self.last_run_at = time.time()
+            self.last_duration_ms = (time.perf_counter() - started) * 1000
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.run_once()
+
+
+class JobScheduler:
+    """Registry of periodic jobs, one asyncio task per job"""
+
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self.running = False
+
+    def register(self, name: str, interval_seconds: float, func: Callable[[], Awaitable]):
+        job = PeriodicJob(name, interval_seconds, func)
+        self.jobs[name] = job
+        if self.running:
+            job.task = asyncio.create_task(job._loop())
+        return job
+
+    def start(self):
+        self.running = True
+        for job in self.jobs.values():
+            if job.task is None:
+                job.task = asyncio.create_task(job._loop())
+                logger.info(f"Started job {job.name} every {job.interval_seconds}s")
+
+    async def stop(self):
+        self.running = False
+        for job in self.jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+        for job in self.jobs.values():
+            if job.task is not None:
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    pass
+                job.task = None
+
+    async def run_now(self, name: str):
+        """Trigger a job immediately (admin endpoints, scripts)"""
+        await self.jobs[name].run_once()
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "interval_seconds": job.interval_seconds,
+                "last_run_at": job.last_run_at,
+                "last_duration_ms": job.last_duration_ms,
+                "last_error": job.last_error,
+            }
+            for name, job in self.jobs.items()
+        }
+
+
+# Singleton instance
+_job_scheduler: Optional[JobScheduler] = None
+
+def get_job_scheduler() -> JobScheduler:
+    """Get or create job scheduler instance"""
+    global _job_scheduler
+    if _job_scheduler is None:
+        _job_scheduler = JobScheduler()
+    return _job_scheduler
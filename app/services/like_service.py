@@ -0,0 +1,88 @@
+"""
+Likes
+Idempotent like/unlike for posts and reels. The unique (user_id, post_id)
+and (user_id, reel_id) constraints make a like a single
+INSERT ... ON CONFLICT DO NOTHING, so double taps and retries neither race
+into duplicate rows nor count twice. List pages resolve "liked by me" for
+the whole page in one query.
+"""
+
+import logging
+from typing import Iterable, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Like, User
+
+logger = logging.getLogger(__name__)
+
+# Target kind -> Like column
+TARGET_COLUMNS = {
+    "post": Like.post_id,
+    "reel": Like.reel_id,
+}
+
+
+class LikeTargetNotFoundError(Exception):
+    """The post or reel being liked does not exist"""
+
+
+async def add_like(db: AsyncSession, user_id: UUID, target: str, target_id: UUID) -> bool:
+    """
+    Like a post or reel. Returns True if a like was created, False if the
+    user had already liked it. Commits.
+    """
+    column = TARGET_COLUMNS[target]
+    try:
+        result = await db.execute(
+            insert(Like)
+            .values({Like.user_id: user_id, column: target_id})
+            .on_conflict_do_nothing(index_elements=[Like.user_id, column])
+            .returning(Like.id)
+        )
+        created = result.first() is not None
+        await db.commit()
+    except IntegrityError:
+        # Foreign key violation: the target is gone (or never existed)
+        await db.rollback()
+        raise LikeTargetNotFoundError(f"{target} {target_id} not found")
+    return created
+
+
+async def remove_like(db: AsyncSession, user_id: UUID, target: str, target_id: UUID) -> bool:
+    """Unlike a post or reel. Returns True if a like was removed. Commits."""
+    column = TARGET_COLUMNS[target]
+    result = await db.execute(
+        delete(Like)
+        .where((Like.user_id == user_id) & (column == target_id))
+        .returning(Like.id)
+    )
+    removed = result.first() is not None
+    await db.commit()
+    return removed
+
+
+async def liked_ids(db: AsyncSession, user_id: UUID, target: str, target_ids: Iterable[UUID]) -> Set[UUID]:
+    """Which of target_ids the user has liked, in one query"""
+    target_ids = list(target_ids)
+    if not target_ids:
+        return set()
+    column = TARGET_COLUMNS[target]
+    result = await db.execute(
+        select(column).where((Like.user_id == user_id) & column.in_(target_ids))
+    )
+    return set(result.scalars().all())
+
+
+async def mark_liked(db: AsyncSession, user: Optional[User], target: str, items: list) -> list:
+    """Set `liked_by_me` on response objects carrying `id`; anonymous viewers see False"""
+    if user is None:
+        return items
+    liked = await liked_ids(db, user.id, target, [item.id for item in items])
+    for item in items:
+        item.liked_by_me = item.id in liked
+    return items
@@ -0,0 +1,153 @@
+"""
+Local media serving
+HTTP semantics (Range/If-Range, ETag, Cache-Control) for files written by
+LocalStorageService. Small hot files are served from memory-mapped pages,
+large ones are streamed with pread, and behind nginx the body is handed off
+with X-Accel-Redirect so the kernel sendfile()s it.
+"""
+
+import asyncio
+import logging
+import mmap
+import json
+import os
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Range header does not overlap the file"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single-range `bytes=` header. Returns None
+    when the full body should be sent (no header, malformed, or multi-range,
+    which RFC 9110 lets servers ignore).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    specs = header[6:].split(",")
+    if len(specs) != 1:
+        return None
+    start_s, _, end_s = specs[0].strip().partition("-")
+    try:
+        if start_s == "":
+            suffix = int(end_s)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(start_s)
+        end = min(int(end_s), size - 1) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class _MmapCache:
+    """LRU of memory-mapped small files, keyed by path + mtime + size"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, mmap.mmap]" = OrderedDict()
+
+    def get(self, path: str, stat: os.stat_result) -> mmap.mmap:
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        mapped = self.entries.get(cache_key)
+        if mapped is not None:
+            self.entries.move_to_end(cache_key)
+            return mapped
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.entries[cache_key] = mapped
+        while len(self.entries) > self.max_entries:
+            _, evicted = self.entries.popitem(last=False)
+            evicted.close()
+        return mapped
+
+    def clear(self):
+        for mapped in self.entries.values():
+            mapped.close()
+        self.entries.clear()
+
+
+class LocalMediaService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.mmap_max_bytes = self.settings.LOCAL_MEDIA_MMAP_MAX_BYTES
+        self.cache = _MmapCache(self.settings.LOCAL_MEDIA_MMAP_ENTRIES)
+
+    def describe(self, path: str) -> Optional[Dict[str, Any]]:
+        """Validators and stored headers for a file, or None if missing"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        meta = {}
+        try:
+            with open(f"{path}.meta") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        return {
+            "stat": stat,
+            "size": stat.st_size,
+            "etag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            "last_modified": formatdate(stat.st_mtime, usegmt=True),
+            "content_type": meta.get("content_type") or "application/octet-stream",
+            "cache_control": meta.get("cache_control") or DEFAULT_CACHE_CONTROL,
+            "content_encoding": meta.get("content_encoding"),
+        }
+
+    def accel_redirect(self, key: str) -> Optional[str]:
+        """Internal nginx location for a key when sendfile offload is enabled"""
+        prefix = self.settings.STORAGE_LOCAL_ACCEL_REDIRECT
+        if not prefix:
+            return None
+        return f"{prefix.rstrip('/')}/{key}"
+
+    def read_small(self, path: str, stat: os.stat_result, start: int, end: int) -> Optional[bytes]:
+        """Slice of a small file from the mmap cache; None for large files"""
+        if stat.st_size > self.mmap_max_bytes or stat.st_size == 0:
+            return None
+        return self.cache.get(path, stat)[start:end + 1]
+
+    async def stream(self, path: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """pread the range in chunks off the event loop, one fd per response"""
+        loop = asyncio.get_running_loop()
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            offset = start
+            while offset <= end:
+                length = min(STREAM_CHUNK_SIZE, end - offset + 1)
+                chunk = await loop.run_in_executor(None, os.pread, fd, length, offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+    def shutdown(self):
+        self.cache.clear()
+
+
+# Singleton instance
+_local_media_service: Optional[LocalMediaService] = None
+
+def get_local_media_service() -> LocalMediaService:
+    """Get or create local media service instance"""
+    global _local_media_service
+    if _local_media_service is None:
+        _local_media_service = LocalMediaService()
+    return _local_media_service
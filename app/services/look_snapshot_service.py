@@ -0,0 +1,101 @@
+"""
+Shared look snapshots
+Immutable, gzip-compressed JSON published to object storage so shared looks
+are served from the CDN without touching the API or Postgres
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from app.config import get_settings
+from app.schemas.media import image_urls
+from app.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _product_card(product: Dict[str, Any]) -> Dict[str, Any]:
+    images = product.get("images") or []
+    return {
+        "id": product.get("id"),
+        "name": product.get("name"),
+        "price": product.get("price"),
+        "discount_price": product.get("discount_price"),
+        "image": image_urls(images[:1])[0] if images else None,
+        "rating": product.get("rating"),
+        "seller": product.get("seller"),
+    }
+
+
+def build_look_snapshot(
+    mirror_style_id: str,
+    style_mode: str,
+    makeup_guide: Optional[Dict[str, Any]],
+    ar_overlay_data: Optional[List[Dict[str, Any]]],
+    recommended_products: Optional[List[Dict[str, Any]]],
+    name: Optional[str] = None,
+    description: Optional[str] = None
+) -> Dict[str, Any]:
+    """Everything a viewer needs to render a shared look, and nothing private"""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "look_id": mirror_style_id,
+        "name": name,
+        "description": description,
+        "style_mode": style_mode,
+        "makeup_guide": makeup_guide or {},
+        "ar_overlays": [
+            {
+                "overlay_type": o.get("overlay_type"),
+                "color_code": o.get("color_code"),
+                "product_id": o.get("product_id"),
+                "intensity": o.get("intensity"),
+                "coordinates": o.get("coordinates"),
+            }
+            for o in (ar_overlay_data or [])
+        ],
+        "products": [_product_card(p) for p in (recommended_products or [])],
+    }
+
+
+def encode_snapshot(snapshot: Dict[str, Any]) -> tuple:
+    """Canonical JSON -> (gzip bytes, sha256 of the JSON)"""
+    body = json.dumps(snapshot, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()
+    # mtime=0 keeps the compressed bytes identical for identical content
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    return compressed, digest
+
+
+async def publish_look_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Upload a snapshot under a content-hashed key with long-lived cache headers"""
+    settings = get_settings()
+    storage = get_storage_service()
+
+    compressed, digest = encode_snapshot(snapshot)
+    key = f"looks/{digest[:2]}/{digest}.json"
+
+    result = await storage.upload_file(
+        io.BytesIO(compressed),
+        settings.AWS_S3_BUCKET,
+        key,
+        content_type="application/json",
+        cache_control=IMMUTABLE_CACHE_CONTROL,
+        content_encoding="gzip"
+    )
+    logger.info(f"Published look snapshot {key} ({len(compressed)} bytes)")
+    return {
+        "key": key,
+        "url": result["url"],
+        "sha256": digest,
+        "size": len(compressed),
+        "published_at": datetime.utcnow().isoformat(),
+    }
@@ -0,0 +1,194 @@
+"""
+Media deduplication
+Content-addressed storage for uploaded images: objects live under
+media/{sha256} keys with a hash -> object index in Postgres, so a repeated
+upload takes a reference on the existing object instead of writing it
+again. Released objects are purged after a grace period.
+"""
+
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.storage_service import get_storage_service
+from app.services.media_ingest_service import EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_PREFIX = "media/"
+# Rows stay locked while their objects are deleted, so keep batches small
+PURGE_BATCH_SIZE = 100
+
+
+def content_key(sha256: str, content_type: str) -> str:
+    """Storage key for a payload; fanned out on the first byte of the hash"""
+    return f"{CONTENT_PREFIX}{sha256[:2]}/{sha256}.{EXTENSIONS[content_type]}"
+
+
+async def acquire_object(db: AsyncSession, sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Take a reference on an indexed object; None if the content is new. Waits
+    while the purge holds the row, and then misses.
+    """
+    result = await db.execute(
+        text("""
+            UPDATE media_objects
+            SET ref_count = ref_count + 1, referenced_at = NOW(), released_at = NULL
+            WHERE sha256 = :sha256
+            RETURNING key, content_type, size, asset
+        """),
+        {"sha256": sha256}
+    )
+    row = result.mappings().first()
+    return dict(row) if row else None
+
+
+async def register_object(
+    db: AsyncSession,
+    sha256: str,
+    key: str,
+    content_type: str,
+    size: int,
+    asset: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Index a newly written object with one reference. Two first uploads of
+    the same bytes racing each other both land here; the loser just adds
+    its reference. Callers write the object only after acquire_object()
+    missed, which cannot happen while a purge of the same hash is underway.
+    """
+    result = await db.execute(
+        text("""
+            INSERT INTO media_objects (sha256, key, content_type, size, ref_count, asset, created_at, referenced_at)
+            VALUES (:sha256, :key, :content_type, :size, 1, CAST(:asset AS JSONB), NOW(), NOW())
+            ON CONFLICT (sha256) DO UPDATE
+            SET ref_count = media_objects.ref_count + 1,
+                referenced_at = NOW(),
+                released_at = NULL,
+                asset = COALESCE(media_objects.asset, EXCLUDED.asset)
+            RETURNING key, content_type, size, asset
+        """),
+        {
+            "sha256": sha256,
+            "key": key,
+            "content_type": content_type,
+            "size": size,
+            "asset": json.dumps(asset) if asset is not None else None,
+        }
+    )
+    return dict(result.mappings().first())
+
+
+async def release_object(db: AsyncSession, key: str) -> Optional[int]:
+    """
+    Drop one reference. The object is kept until purge_released_objects() runs, so
+    a re-upload within the grace period revives it without a write.
+    Returns the remaining count, or None if the key is not indexed.
+    """
+    result = await db.execute(
+        text("""
+            UPDATE media_objects
+            SET ref_count = ref_count - 1,
+                released_at = CASE WHEN ref_count = 1 THEN NOW() ELSE released_at END
+            WHERE key = :key AND ref_count > 0
+            RETURNING ref_count
+        """),
+        {"key": key}
+    )
+    row = result.first()
+    return row[0] if row else None
+
+
+async def purge_released_objects(db: AsyncSession, grace_seconds: int) -> int:
+    """Delete objects (and their image variants) unreferenced for the grace period"""
+    storage = get_storage_service()
+    bucket = get_settings().AWS_S3_BUCKET
+    total = 0
+    failed: List[str] = []
+
+    while True:
+        # The locked row is the tombstone: acquire_object() and
+        # register_object() for the same hash wait on it until the objects
+        # are gone and the row is deleted, then miss and write afresh, so a
+        # re-upload can never land on a key that is about to be deleted
+        result = await db.execute(
+            text("""
+                SELECT sha256, key, asset FROM media_objects
+                WHERE ref_count = 0
+                  AND released_at < NOW() - make_interval(secs => :grace)
+                  AND sha256 <> ALL(:failed)
+                ORDER BY released_at
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            """),
+            {"grace": grace_seconds, "failed": failed, "batch_size": PURGE_BATCH_SIZE}
+        )
+        rows = result.all()
+
+        purged = []
+        for sha256, key, asset in rows:
+            keys = [key]
+            for variant in (asset or {}).get("variants", []):
+                variant_key = storage.key_for_url(bucket, variant["url"])
+                if variant_key:
+                    keys.append(variant_key)
+            try:
+                for object_key in keys:
+                    await storage.delete_file(bucket, object_key)
+            except Exception as e:
+                # Row kept (still unreferenced); the next run retries
+                logger.error(f"Purging media object {key} failed: {e}")
+                failed.append(sha256)
+                continue
+            purged.append(sha256)
+
+        if purged:
+            await db.execute(
+                text("DELETE FROM media_objects WHERE sha256 = ANY(:purged)"),
+                {"purged": purged}
+            )
+        await db.commit()
+
+        total += len(purged)
+        if len(rows) < PURGE_BATCH_SIZE:
+            break
+
+    if total:
+        logger.info(f"Purged {total} unreferenced media objects")
+    return total
+
+
+async def release_unused_objects(db: AsyncSession, keys: List[str], grace_seconds: int) -> List[str]:
+    """
+    Zero the count of indexed objects that no post, product or reel points
+    at and nobody has re-uploaded within the grace period. They then go
+    through the normal purge, so a re-upload meanwhile still revives them.
+    Returns the keys released.
+    """
+    result = await db.execute(
+        text("""
+            UPDATE media_objects
+            SET ref_count = 0, released_at = NOW()
+            WHERE key = ANY(:keys)
+              AND ref_count > 0
+              AND referenced_at < NOW() - make_interval(secs => :grace)
+            RETURNING key
+        """),
+        {"keys": keys, "grace": grace_seconds}
+    )
+    released = [row[0] for row in result.all()]
+    await db.commit()
+    return released
+
+
+async def run_media_purge():
+    """Periodic job: delete content-addressed objects nobody references"""
+    from app.database import AsyncSessionLocal
+
+    settings = get_settings()
+    async with AsyncSessionLocal() as db:
+        await purge_released_objects(db, settings.MEDIA_DEDUP_PURGE_GRACE_SECONDS)
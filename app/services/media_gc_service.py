@@ -0,0 +1,226 @@
+"""
+Orphan media collection
+Streams the bucket listing under the upload prefixes and deletes objects
+that no product, review, post, reel, avatar or chat message references
+once they are past a grace period. Deletes go out in DeleteObjects-sized
+batches at a bounded rate; dry-run mode only reports.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import get_redis
+from app.services.storage_service import get_storage_service
+from app.services.media_dedup_service import release_unused_objects
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 1000  # DeleteObjects limit
+LOCK_KEY = "media_gc:lock"
+DRY_RUN_SAMPLE = 20
+
+# JSON arrays of image URLs or ImageAsset dicts
+IMAGE_LIST_QUERIES = [
+    "SELECT images FROM products",
+    "SELECT images FROM product_reviews",
+    "SELECT images FROM feed_posts",
+]
+URL_QUERIES = [
+    "SELECT video_url FROM reels",
+    "SELECT thumbnail_url FROM reels",
+    "SELECT avatar_url FROM users",
+    "SELECT media_url FROM chat_messages",
+    "SELECT icon_url FROM product_categories",
+]
+# Objects referenced by key while they are still in flight
+KEY_QUERIES = [
+    "SELECT source_key FROM transcode_jobs WHERE reel_id IS NOT NULL OR status IN ('queued', 'processing')",
+    "SELECT key FROM media_uploads WHERE status = 'pending'",
+]
+
+_VARIANT_SUFFIX = re.compile(r"_w\d+$")
+
+
+def _base(key: str) -> str:
+    """Key without extension or _w{width} variant suffix, shared by an original and its variants"""
+    slash = key.rfind("/")
+    dot = key.rfind(".")
+    stem = key[:dot] if dot > slash else key
+    return _VARIANT_SUFFIX.sub("", stem)
+
+
+def _hls_root(key: str) -> Optional[str]:
+    """Job directory of an HLS playlist or segment"""
+    root, sep, _ = key.partition("/hls/")
+    return root if sep else None
+
+
+class ReferenceIndex:
+    """Bases and HLS directories of every object still in use"""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.storage = get_storage_service()
+        self.bases: Set[str] = set()
+        self.hls_roots: Set[str] = set()
+
+    def add_key(self, key: Optional[str]):
+        if not key:
+            return
+        self.bases.add(_base(key))
+        root = _hls_root(key)
+        if root:
+            self.hls_roots.add(root)
+
+    def add_url(self, url: Optional[str]):
+        if url:
+            self.add_key(self.storage.key_for_url(self.bucket, url))
+
+    def add_images(self, images: Optional[List[Any]]):
+        for entry in images or []:
+            if isinstance(entry, dict):
+                self.add_url(entry.get("url"))
+                for variant in entry.get("variants", []):
+                    self.add_url(variant.get("url"))
+            else:
+                self.add_url(entry)
+
+    def __contains__(self, key: str) -> bool:
+        if _base(key) in self.bases:
+            return True
+        root = _hls_root(key)
+        return root is not None and root in self.hls_roots
+
+
+async def build_reference_index(db: AsyncSession, bucket: str) -> ReferenceIndex:
+    """Collect referenced keys, streaming each table instead of loading it whole"""
+    index = ReferenceIndex(bucket)
+    for query, add in (
+        [(q, index.add_images) for q in IMAGE_LIST_QUERIES]
+        + [(q, index.add_url) for q in URL_QUERIES]
+        + [(q, index.add_key) for q in KEY_QUERIES]
+    ):
+        result = await db.stream(text(query).execution_options(yield_per=1000))
+        async for (value,) in result:
+            add(value)
+    return index
+
+
+async def _indexed_objects(db: AsyncSession) -> Dict[str, str]:
+    """Base -> key of content-addressed objects; their lifecycle is refcounted"""
+    result = await db.stream(text("SELECT key FROM media_objects").execution_options(yield_per=1000))
+    return {_base(key): key async for (key,) in result}
+
+
+async def collect_orphans(
+    db: AsyncSession,
+    dry_run: bool,
+    grace_seconds: int,
+    max_deletes: int,
+    deletes_per_second: float,
+    prefixes: List[str]
+) -> Dict[str, Any]:
+    """
+    Diff the listing against the reference index and delete what is left.
+    Indexed content-addressed objects are released instead of deleted, so
+    the dedup purge removes them (and their variants) race-free.
+    """
+    storage = get_storage_service()
+    bucket = get_settings().AWS_S3_BUCKET
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+
+    index = await build_reference_index(db, bucket)
+    indexed = await _indexed_objects(db)
+    stats = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "referenced": 0,
+        "recent": 0,
+        "orphaned": 0,
+        "orphaned_bytes": 0,
+        "deleted": 0,
+        "released": 0,
+        "errors": 0,
+    }
+    batch: List[str] = []
+    to_release: Set[str] = set()
+
+    async def flush():
+        result = await storage.delete_files(bucket, batch)
+        stats["deleted"] += result["deleted"]
+        stats["errors"] += len(result["errors"])
+        for error in result["errors"][:5]:
+            logger.error(f"Orphan delete of {error['key']} failed: {error['error']}")
+        # Spread deletes out so the bucket (and the CDN purge behind it) keep up
+        await asyncio.sleep(len(batch) / deletes_per_second)
+        batch.clear()
+
+    async def listing():
+        for prefix in prefixes:
+            async for obj in storage.iter_files(bucket, prefix):
+                yield obj
+
+    async for obj in listing():
+        stats["scanned"] += 1
+        key = obj["key"]
+        if key in index:
+            stats["referenced"] += 1
+            continue
+        if datetime.fromisoformat(obj["modified"]) > cutoff:
+            stats["recent"] += 1
+            continue
+
+        stats["orphaned"] += 1
+        stats["orphaned_bytes"] += obj["size"]
+        original = indexed.get(_base(key))
+        if original:
+            to_release.add(original)
+            continue
+        if dry_run:
+            if stats["orphaned"] <= DRY_RUN_SAMPLE:
+                logger.info(f"Orphan media (dry run): {key}")
+            continue
+
+        batch.append(key)
+        if len(batch) >= DELETE_BATCH_SIZE:
+            await flush()
+        if stats["deleted"] + len(batch) >= max_deletes:
+            break
+
+    if batch:
+        await flush()
+
+    if to_release and not dry_run:
+        keys = sorted(to_release)
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            released = await release_unused_objects(db, keys[i:i + DELETE_BATCH_SIZE], grace_seconds)
+            stats["released"] += len(released)
+
+    logger.info(f"Orphan media collection: {stats}")
+    return stats
+
+
+async def run_orphan_media_gc():
+    """Periodic job: collect orphaned uploads"""
+    from app.database import AsyncSessionLocal
+
+    settings = get_settings()
+    # Held for the whole interval so each cycle runs on a single node
+    if not await get_redis().set(LOCK_KEY, "1", nx=True, ex=settings.MEDIA_GC_INTERVAL_SECONDS):
+        return
+    async with AsyncSessionLocal() as db:
+        await collect_orphans(
+            db,
+            dry_run=settings.MEDIA_GC_DRY_RUN,
+            grace_seconds=settings.MEDIA_GC_GRACE_SECONDS,
+            max_deletes=settings.MEDIA_GC_MAX_DELETES,
+            deletes_per_second=settings.MEDIA_GC_DELETES_PER_SECOND,
+            prefixes=settings.MEDIA_GC_PREFIXES
+        )
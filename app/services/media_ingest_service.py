@@ -0,0 +1,266 @@
+"""
+Media ingest
+Streams client uploads into storage in fixed-size chunks with incremental
+size limits, SHA-256 hashing and magic-byte content type sniffing. Large
+uploads are parsed straight off the request body, so an oversized transfer
+is cut off mid-body instead of being spooled to disk first.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Set
+
+from fastapi import Request, UploadFile
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import get_settings
+from app.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "video/mp4": "mp4",
+    "video/webm": "webm",
+    "video/quicktime": "mov",
+}
+SNIFF_BYTES = 16
+
+
+class UploadTooLargeError(Exception):
+    """Upload exceeded its size limit while streaming"""
+
+
+class UnsupportedMediaTypeError(Exception):
+    """Sniffed content type is not in the allowed set"""
+
+
+class MalformedUploadError(Exception):
+    """Request body is not multipart/form-data with the expected file field"""
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Identify media from its leading bytes instead of trusting the client header"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand == b"qt  ":
+            return "video/quicktime"
+        return "video/mp4"
+    return None
+
+
+async def file_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """An UploadFile read in UPLOAD_CHUNK_SIZE pieces"""
+    chunk_size = get_settings().UPLOAD_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def multipart_file_chunks(request: Request, field: str) -> AsyncIterator[bytes]:
+    """
+    The bytes of one file field, parsed incrementally from a multipart
+    request body as it arrives. Other fields are skipped.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise MalformedUploadError("Expected a multipart/form-data body")
+
+    headers: Dict[bytes, bytes] = {}
+    header = {"field": b"", "value": b""}
+    part = {"wanted": False, "found": False}
+    received: List[bytes] = []
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        headers[header["field"].lower()] = header["value"]
+        header["field"] = header["value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        # Only the first part with this name is the upload
+        part["wanted"] = (
+            not part["found"]
+            and options.get(b"name") == field.encode()
+            and b"filename" in options
+        )
+        part["found"] = part["found"] or part["wanted"]
+
+    def on_part_data(data, start, end):
+        if part["wanted"]:
+            received.append(data[start:end])
+
+    def on_part_end():
+        part["wanted"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+        if received:
+            data = b"".join(received)
+            received.clear()
+            yield data
+    parser.finalize()
+    if not part["found"]:
+        raise MalformedUploadError(f"Missing file field: {field}")
+
+
+async def stream_upload(
+    chunks: AsyncIterator[bytes],
+    key_prefix: str,
+    allowed_types: Set[str],
+    max_size: int,
+    cache_control: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Copy an upload (file_chunks or multipart_file_chunks) into storage
+    chunk by chunk, aborting as soon as it passes max_size. Memory per
+    request is bounded by one chunk plus one multipart part, regardless of
+    file size.
+    """
+    settings = get_settings()
+    storage = get_storage_service()
+    stream = chunks.__aiter__()
+
+    # The key's extension comes from the sniffed type, so hold back bytes
+    # until there is enough to sniff
+    first_chunk = b""
+    async for chunk in stream:
+        first_chunk += chunk
+        if len(first_chunk) >= SNIFF_BYTES:
+            break
+    content_type = sniff_content_type(first_chunk[:SNIFF_BYTES])
+    if content_type not in allowed_types:
+        raise UnsupportedMediaTypeError(f"Unsupported media type: {content_type or 'unknown'}")
+
+    key = f"{key_prefix}.{EXTENSIONS[content_type]}"
+    writer = storage.open_writer(
+        settings.AWS_S3_BUCKET,
+        key,
+        content_type=content_type,
+        cache_control=cache_control
+    )
+
+    size = 0
+    digest = hashlib.sha256()
+
+    async def write(chunk: bytes):
+        nonlocal size
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+        digest.update(chunk)
+        await writer.write(chunk)
+
+    try:
+        await write(first_chunk)
+        async for chunk in stream:
+            await write(chunk)
+        result = await writer.complete()
+    except Exception:
+        await writer.abort()
+        raise
+
+    return {
+        "url": result["url"],
+        "key": key,
+        "size": size,
+        "type": content_type,
+        "sha256": digest.hexdigest(),
+    }
+
+
+async def read_upload(file: UploadFile, allowed_types: Set[str], max_size: int) -> Dict[str, Any]:
+    """
+    Read a small upload into memory with the same limits, sniffing and
+    hashing as stream_upload, without writing it anywhere. Lets callers
+    pick a content-addressed key (or skip the write) once the hash is known.
+    """
+    chunk_size = get_settings().UPLOAD_CHUNK_SIZE
+    data = bytearray()
+    digest = hashlib.sha256()
+    content_type = None
+
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if content_type is None:
+            content_type = sniff_content_type(chunk[:16])
+            if content_type not in allowed_types:
+                raise UnsupportedMediaTypeError(f"Unsupported media type: {content_type or 'unknown'}")
+        if len(data) + len(chunk) > max_size:
+            raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+        digest.update(chunk)
+        data.extend(chunk)
+
+    if content_type is None:
+        raise UnsupportedMediaTypeError("Unsupported media type: unknown")
+    return {
+        "data": bytes(data),
+        "size": len(data),
+        "type": content_type,
+        "sha256": digest.hexdigest(),
+    }
+
+
+async def stream_uploads(
+    files: List[UploadFile],
+    upload: Callable[[UploadFile], Awaitable[Dict[str, Any]]],
+    concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run `upload` over a batch concurrently, at most `concurrency` files in
+    flight for this request (the storage IO pool caps the process as a
+    whole). Returns one result per file, in input order, with either the
+    upload or an error.
+    """
+    semaphore = asyncio.Semaphore(concurrency or get_settings().UPLOAD_BATCH_CONCURRENCY)
+
+    async def upload_one(file: UploadFile) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await upload(file)
+                return {"filename": file.filename, "success": True, **result}
+            except UnsupportedMediaTypeError as e:
+                error = str(e)
+            except UploadTooLargeError as e:
+                error = str(e)
+            except Exception as e:
+                logger.error(f"Batch upload of {file.filename} failed: {e}")
+                error = "Upload failed"
+            return {"filename": file.filename, "success": False, "error": error}
+
+    return await asyncio.gather(*(upload_one(file) for file in files))
@@ -0,0 +1,67 @@
+"""
+Redis client
+Shared async connection pool for caches, counters and queues, plus
+owner-token locks
+"""
+
+import logging
+import uuid
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+
+# Release/extend only while the lock still holds the caller's token, so an
+# owner whose lock expired cannot drop or prolong a successor's lock
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+def get_redis() -> redis.Redis:
+    """Get or create the shared async Redis client"""
+    global _redis_client
+    if _redis_client is None:
+        settings = get_settings()
+        _redis_client = redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            health_check_interval=30,
+        )
+        logger.info("Redis client initialized")
+    return _redis_client
+
+async def close_redis():
+    """Close the shared Redis connection pool"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.close()
+        _redis_client = None
+
+async def acquire_lock(key: str, ttl_seconds: int) -> Optional[str]:
+    """Take a lock; returns the owner token, or None if someone else holds it"""
+    token = uuid.uuid4().hex
+    if await get_redis().set(key, token, nx=True, ex=ttl_seconds):
+        return token
+    return None
+
+async def extend_lock(key: str, token: str, ttl_seconds: int) -> bool:
+    """Reset the lock's TTL; False if it expired or changed hands"""
+    return bool(await get_redis().eval(_EXTEND_LOCK_SCRIPT, 1, key, token, ttl_seconds))
+
+async def release_lock(key: str, token: str) -> bool:
+    """Release the lock if the token still owns it"""
+    return bool(await get_redis().eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
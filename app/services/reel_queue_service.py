@@ -0,0 +1,228 @@
+"""
+Reel prefetch queue
+Each viewer has a precomputed ready queue of reel ids (a Redis list), so
+serving the next N reels is one LPOP. Reels already served are recorded in
+a per-user Bloom filter (plain SETBIT/GETBIT, k hashes over m bits) and
+skipped when the queue is refilled. Filters rotate per window: lookups
+check the current and previous generation, so "seen" fades after one to
+two windows and a filter never saturates. If Redis is unavailable, reels
+are read straight from Postgres (trending, then newest) without the filter.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import acquire_lock, get_redis, release_lock
+
+logger = logging.getLogger(__name__)
+
+REFILL_LOCK_SECONDS = 30
+
+
+def _queue_key(user_id) -> str:
+    return f"reels:queue:{user_id}"
+
+
+def _refill_lock_key(user_id) -> str:
+    return f"reels:queue:lock:{user_id}"
+
+
+def _seen_key(user_id, generation: int) -> str:
+    return f"reels:seen:{user_id}:{generation}"
+
+
+class ReelQueueService:
+    def __init__(self):
+        self.settings = get_settings()
+        self._refills: Set[asyncio.Task] = set()
+
+    def _generation(self) -> int:
+        return int(time.time() // self.settings.REEL_SEEN_WINDOW_SECONDS)
+
+    def _bits(self, reel_id) -> List[int]:
+        """k bit offsets by double hashing one 128-bit digest"""
+        digest = hashlib.blake2b(str(reel_id).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        m = self.settings.REEL_SEEN_BLOOM_BITS
+        return [(h1 + i * h2) % m for i in range(self.settings.REEL_SEEN_BLOOM_HASHES)]
+
+    async def mark_seen(self, user_id: UUID, reel_ids: List):
+        if not reel_ids:
+            return
+        key = _seen_key(user_id, self._generation())
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for reel_id in reel_ids:
+                for bit in self._bits(reel_id):
+                    pipe.setbit(key, bit, 1)
+            pipe.expire(key, 2 * self.settings.REEL_SEEN_WINDOW_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Marking reels seen failed: {e}")
+
+    async def seen(self, user_id: UUID, reel_ids: List) -> List[bool]:
+        """Bloom membership per id (false positives possible, no false negatives)"""
+        if not reel_ids:
+            return []
+        generation = self._generation()
+        keys = [_seen_key(user_id, generation), _seen_key(user_id, generation - 1)]
+        k = self.settings.REEL_SEEN_BLOOM_HASHES
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for reel_id in reel_ids:
+                bits = self._bits(reel_id)
+                for key in keys:
+                    for bit in bits:
+                        pipe.getbit(key, bit)
+            flags = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Reading seen reels failed: {e}")
+            return [False] * len(reel_ids)
+        per_reel = len(keys) * k
+        return [
+            any(all(flags[i * per_reel + g * k:i * per_reel + (g + 1) * k]) for g in range(len(keys)))
+            for i in range(len(reel_ids))
+        ]
+
+    async def refill(self, db: AsyncSession, user_id: UUID) -> int:
+        """
+        Top the queue up to REEL_QUEUE_LENGTH with unseen reels, highest
+        trending_score first, then newest. Returns ids appended.
+        """
+        settings = self.settings
+        redis = get_redis()
+        lock_key = _refill_lock_key(user_id)
+        token = await acquire_lock(lock_key, REFILL_LOCK_SECONDS)
+        if token is None:
+            return 0
+        try:
+            queue_key = _queue_key(user_id)
+            queued = set(await redis.lrange(queue_key, 0, -1))
+            wanted = settings.REEL_QUEUE_LENGTH - len(queued)
+            if wanted <= 0:
+                return 0
+
+            # Served by idx_reels_trending_score and idx_reels_created
+            result = await db.execute(
+                text("""
+                    WITH candidates AS (
+                        (SELECT id FROM reels WHERE trending_score > 0
+                         ORDER BY trending_score DESC LIMIT :limit)
+                        UNION
+                        (SELECT id FROM reels ORDER BY created_at DESC LIMIT :limit)
+                    )
+                    SELECT r.id FROM reels r
+                    JOIN candidates c ON c.id = r.id
+                    WHERE r.user_id <> :user_id
+                    ORDER BY r.trending_score DESC, r.created_at DESC
+                """),
+                {"limit": settings.REEL_QUEUE_CANDIDATES, "user_id": user_id}
+            )
+            ids = [str(row[0]) for row in result.all()]
+            ids = [reel_id for reel_id in ids if reel_id not in queued]
+            flags = await self.seen(user_id, ids)
+            fresh = [reel_id for reel_id, seen in zip(ids, flags) if not seen][:wanted]
+            if fresh:
+                pipe = redis.pipeline(transaction=True)
+                pipe.rpush(queue_key, *fresh)
+                pipe.expire(queue_key, settings.REEL_QUEUE_TTL_SECONDS)
+                await pipe.execute()
+            return len(fresh)
+        finally:
+            await release_lock(lock_key, token)
+
+    async def _refill_in_background(self, user_id: UUID):
+        from app.database import AsyncSessionLocal
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.refill(db, user_id)
+        except Exception as e:
+            logger.error(f"Reel queue refill failed: {e}")
+
+    async def _ids_from_db(self, db: AsyncSession, user_id: UUID, count: int) -> List[str]:
+        """Trending, then newest, straight from Postgres, for when Redis is unavailable"""
+        result = await db.execute(
+            text("""
+                SELECT id FROM reels
+                WHERE user_id <> :user_id
+                ORDER BY trending_score DESC, created_at DESC
+                LIMIT :limit
+            """),
+            {"user_id": user_id, "limit": count}
+        )
+        return [str(row[0]) for row in result.all()]
+
+    async def next_ids(self, db: AsyncSession, user_id: UUID, count: int) -> List[str]:
+        """
+        Pop up to `count` unseen reel ids and mark them seen. Refills inline
+        only when the queue cannot cover the request; a low queue is topped
+        up in the background.
+        """
+        queue_key = _queue_key(user_id)
+        ids: List[str] = []
+        try:
+            redis = get_redis()
+            for attempt in range(2):
+                pipe = redis.pipeline(transaction=True)
+                pipe.lpop(queue_key, count - len(ids))
+                pipe.llen(queue_key)
+                popped, remaining = await pipe.execute()
+                popped = popped or []
+                # Seen elsewhere since it was queued (another device, an earlier pop)
+                flags = await self.seen(user_id, popped)
+                fresh = [reel_id for reel_id, seen in zip(popped, flags) if not seen and reel_id not in ids]
+                # Marked before any refill so it cannot queue them again
+                await self.mark_seen(user_id, fresh)
+                ids.extend(fresh)
+                if len(ids) >= count or attempt:
+                    break
+                await self.refill(db, user_id)
+        except Exception as e:
+            logger.error(f"Reel queue read failed, reading from the database: {e}")
+            fallback = await self._ids_from_db(db, user_id, count)
+            return (ids + [reel_id for reel_id in fallback if reel_id not in ids])[:count]
+
+        if remaining < self.settings.REEL_QUEUE_LOW_WATER:
+            task = asyncio.create_task(self._refill_in_background(user_id))
+            self._refills.add(task)
+            task.add_done_callback(self._refills.discard)
+        return ids
+
+    async def next_reels(self, db: AsyncSession, user_id: UUID, count: int) -> list:
+        """next_ids hydrated in queue order; deleted reels are dropped"""
+        from app.models import Reel
+
+        ids = await self.next_ids(db, user_id, count)
+        if not ids:
+            return []
+        result = await db.execute(select(Reel).where(Reel.id.in_([UUID(reel_id) for reel_id in ids])))
+        by_id = {str(reel.id): reel for reel in result.scalars().all()}
+        return [by_id[reel_id] for reel_id in ids if reel_id in by_id]
+
+    async def reset(self, user_id: UUID):
+        """Drop the ready queue (e.g. after a pull-to-refresh)"""
+        try:
+            await get_redis().delete(_queue_key(user_id))
+        except Exception as e:
+            logger.error(f"Reel queue reset failed: {e}")
+
+
+# Singleton instance
+_reel_queue_service: Optional[ReelQueueService] = None
+
+def get_reel_queue_service() -> ReelQueueService:
+    """Get or create reel queue service instance"""
+    global _reel_queue_service
+    if _reel_queue_service is None:
+        _reel_queue_service = ReelQueueService()
+    return _reel_queue_service
@@ -0,0 +1,137 @@
+"""
+Reel view counting
+Views are buffered in process memory (deduplicated per viewer within a
+flush window) and written with one UPDATE ... FROM (VALUES ...) per
+flush, so watching a reel never takes its row lock. Unique viewers are
+estimated with a Redis HyperLogLog per reel.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+def _viewers_key(reel_id) -> str:
+    return f"reel:viewers:{reel_id}"
+
+
+class ReelViewService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.buffer: Dict[UUID, Set[str]] = {}
+        self.buffered = 0
+        self._flush_lock = asyncio.Lock()
+        self._early_flush: Optional[asyncio.Task] = None
+
+    def record(self, reel_id: UUID, viewer_id: UUID):
+        """Count a view; memory only, flushed by the periodic job"""
+        viewers = self.buffer.setdefault(reel_id, set())
+        if str(viewer_id) in viewers:
+            return
+        viewers.add(str(viewer_id))
+        self.buffered += 1
+        if self.buffered >= self.settings.REEL_VIEW_BUFFER_MAX and \
+                (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self._flush_early())
+
+    async def _flush_early(self):
+        try:
+            await run_reel_view_flush()
+        except Exception as e:
+            logger.error(f"Early reel view flush failed: {e}")
+
+    async def unique_viewers(self, reel_id: UUID) -> Optional[int]:
+        """HyperLogLog estimate (~0.8% error); None if Redis is unavailable"""
+        try:
+            return await get_redis().pfcount(_viewers_key(reel_id))
+        except Exception as e:
+            logger.error(f"Reading unique viewers failed: {e}")
+            return None
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write buffered views; returns reels updated"""
+        async with self._flush_lock:
+            buffer, self.buffer, self.buffered = self.buffer, {}, 0
+            if not buffer:
+                return 0
+            try:
+                await self._apply(db, buffer)
+            except Exception:
+                # Put the views back for the next attempt
+                for reel_id, viewers in buffer.items():
+                    self.buffer.setdefault(reel_id, set()).update(viewers)
+                self.buffered = sum(len(v) for v in self.buffer.values())
+                raise
+
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for reel_id, viewers in buffer.items():
+                    pipe.pfadd(_viewers_key(reel_id), *viewers)
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Recording unique viewers failed: {e}")
+            return len(buffer)
+
+    async def _apply(self, db: AsyncSession, buffer: Dict[UUID, Set[str]]):
+        items = list(buffer.items())
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            chunk = items[start:start + FLUSH_BATCH_SIZE]
+            params = {}
+            values = []
+            for i, (reel_id, viewers) in enumerate(chunk):
+                params[f"id{i}"] = reel_id
+                params[f"views{i}"] = len(viewers)
+                values.append(f"(CAST(:id{i} AS UUID), CAST(:views{i} AS INTEGER))")
+            await db.execute(
+                text(f"""
+                    UPDATE reels AS r SET view_count = r.view_count + v.views
+                    FROM (VALUES {', '.join(values)}) AS v(id, views)
+                    WHERE r.id = v.id
+                """),
+                params
+            )
+            # Hourly buckets give the trending job a views-over-time window
+            await db.execute(
+                text(f"""
+                    INSERT INTO reel_view_hourly (reel_id, hour, views)
+                    SELECT v.id, CAST(:hour AS TIMESTAMP), v.views
+                    FROM (VALUES {', '.join(values)}) AS v(id, views)
+                    JOIN reels r ON r.id = v.id
+                    ON CONFLICT (reel_id, hour) DO UPDATE
+                    SET views = reel_view_hourly.views + EXCLUDED.views
+                """),
+                {**params, "hour": hour}
+            )
+        await db.commit()
+
+
+# Singleton instance
+_reel_view_service: Optional[ReelViewService] = None
+
+def get_reel_view_service() -> ReelViewService:
+    """Get or create reel view service instance"""
+    global _reel_view_service
+    if _reel_view_service is None:
+        _reel_view_service = ReelViewService()
+    return _reel_view_service
+
+
+async def run_reel_view_flush():
+    """Periodic job (and shutdown hook): write buffered reel views"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await get_reel_view_service().flush(db)
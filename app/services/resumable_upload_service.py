@@ -0,0 +1,254 @@
+"""
+Resumable uploads
+tus 1.0-style sessions for large videos. Session state (declared length,
+committed offset, storage writer checkpoint) lives in Redis; each PATCH
+appends its bytes to the S3 multipart upload or local part file, so a
+dropped connection only costs the bytes that never arrived.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Optional, Set
+from uuid import UUID, uuid4
+
+from app.config import get_settings
+from app.services.redis_service import get_redis, acquire_lock, extend_lock, release_lock
+from app.services.storage_service import get_storage_service
+from app.services.media_ingest_service import (
+    sniff_content_type,
+    EXTENSIONS,
+    UploadTooLargeError,
+    UnsupportedMediaTypeError
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFIX = "upload:resumable:"
+# Held for the duration of one PATCH and extended as chunks arrive; expires
+# on its own if the node dies or the client stalls
+LOCK_SECONDS = 60
+LOCK_REFRESH_SECONDS = 10
+SNIFF_BYTES = 16
+
+
+class UploadSessionNotFoundError(Exception):
+    """No live session with this id for this user"""
+
+
+class UploadOffsetMismatchError(Exception):
+    """PATCH offset differs from the committed offset"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected offset {offset}")
+        self.offset = offset
+
+
+class UploadLockedError(Exception):
+    """Another request is appending to this upload"""
+
+
+class ResumableUploadService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.ttl = self.settings.RESUMABLE_UPLOAD_TTL_SECONDS
+
+    def _key(self, upload_id: UUID) -> str:
+        return f"{SESSION_PREFIX}{upload_id}"
+
+    async def _save(self, session: Dict[str, Any]):
+        session["expires_at"] = (datetime.utcnow() + timedelta(seconds=self.ttl)).isoformat()
+        await get_redis().set(self._key(session["id"]), json.dumps(session), ex=self.ttl)
+
+    async def create(self, user_id: UUID, length: int, metadata: Dict[str, str], key_prefix: str) -> Dict[str, Any]:
+        """Open a session; storage is not touched until the first bytes arrive"""
+        upload_id = uuid4()
+        session = {
+            "id": str(upload_id),
+            "user_id": str(user_id),
+            "key_prefix": f"{key_prefix}/{upload_id}",
+            "length": length,
+            "offset": 0,
+            "metadata": metadata,
+            "key": None,
+            "content_type": None,
+            "writer": None,
+            "result": None,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        await self._save(session)
+        return session
+
+    async def get(self, upload_id: UUID, user_id: UUID) -> Dict[str, Any]:
+        raw = await get_redis().get(self._key(upload_id))
+        if raw is None:
+            raise UploadSessionNotFoundError()
+        session = json.loads(raw)
+        if session["user_id"] != str(user_id):
+            raise UploadSessionNotFoundError()
+        return session
+
+    async def save(self, session: Dict[str, Any]):
+        """Persist fields set by the caller (e.g. the transcode job id)"""
+        await self._save(session)
+
+    async def append(
+        self,
+        session: Dict[str, Any],
+        offset: int,
+        chunks: AsyncIterator[bytes],
+        allowed_types: Set[str]
+    ) -> Dict[str, Any]:
+        """
+        Append a request body at `offset`. If the body is cut short, whatever
+        was received is checkpointed so the client can resume from there.
+        Completes the object once `length` bytes have been written.
+        """
+        lock_key = f"{self._key(session['id'])}:lock"
+        token = await acquire_lock(lock_key, LOCK_SECONDS)
+        if token is None:
+            raise UploadLockedError()
+        refreshed = time.monotonic()
+
+        async def keep_lock():
+            nonlocal refreshed
+            if time.monotonic() - refreshed < LOCK_REFRESH_SECONDS:
+                return
+            if not await extend_lock(lock_key, token, LOCK_SECONDS):
+                # Another request may be appending from our offset now
+                raise UploadLockedError()
+            refreshed = time.monotonic()
+
+        try:
+            # Re-read under the lock so a request racing ours sees its offset
+            raw = await get_redis().get(self._key(session["id"]))
+            if raw is None:
+                raise UploadSessionNotFoundError()
+            session.update(json.loads(raw))
+            if offset != session["offset"]:
+                raise UploadOffsetMismatchError(session["offset"])
+            if session["result"] is not None:
+                return session
+            return await self._append(session, chunks, allowed_types, keep_lock)
+        finally:
+            await release_lock(lock_key, token)
+
+    async def _append(
+        self,
+        session: Dict[str, Any],
+        chunks: AsyncIterator[bytes],
+        allowed_types: Set[str],
+        keep_lock: Callable[[], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        storage = get_storage_service()
+        bucket = self.settings.AWS_S3_BUCKET
+        length = session["length"]
+        writer = None
+        head = bytearray()
+
+        if session["key"] is not None:
+            writer = storage.open_writer(
+                bucket, session["key"], content_type=session["content_type"], state=session["writer"]
+            )
+
+        async def feed(data: bytes):
+            nonlocal writer
+            if session["offset"] + len(head) + len(data) > length:
+                raise UploadTooLargeError(f"Upload exceeds declared length {length}")
+            if writer is None:
+                # The storage key's extension comes from the sniffed type,
+                # so hold back bytes until there is enough to sniff
+                head.extend(data)
+                if len(head) < SNIFF_BYTES and len(head) < length:
+                    return
+                content_type = sniff_content_type(bytes(head[:SNIFF_BYTES]))
+                if content_type not in allowed_types:
+                    raise UnsupportedMediaTypeError(f"Unsupported media type: {content_type or 'unknown'}")
+                session["content_type"] = content_type
+                session["key"] = f"{session['key_prefix']}.{EXTENSIONS[content_type]}"
+                writer = storage.open_writer(bucket, session["key"], content_type=content_type)
+                data = bytes(head)
+                head.clear()
+            await writer.write(data)
+            session["offset"] += len(data)
+
+        # Storage errors propagate without a checkpoint: the last saved one
+        # is still consistent and the client re-sends from its offset
+        stream = chunks.__aiter__()
+        while True:
+            try:
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                # Client went away mid-body: keep what made it to storage
+                logger.info(f"Resumable upload {session['id']} interrupted at {session['offset']}: {e}")
+                await self._checkpoint(session, writer)
+                raise
+            # Lost lock: stop before writing anything, and leave the
+            # session to the request that holds it now
+            await keep_lock()
+            try:
+                await feed(chunk)
+            except UploadTooLargeError:
+                await self._checkpoint(session, writer)
+                raise
+
+        if head:
+            raise UnsupportedMediaTypeError("Not enough data to identify the media type")
+        if writer is None:
+            return session
+
+        if session["offset"] == length:
+            result = await writer.complete()
+            session["writer"] = None
+            session["result"] = {
+                "url": result["url"],
+                "key": session["key"],
+                "size": length,
+                "type": session["content_type"],
+            }
+            await self._save(session)
+            return session
+
+        await self._checkpoint(session, writer)
+        return session
+
+    async def _checkpoint(self, session: Dict[str, Any], writer):
+        if writer is None:
+            return
+        try:
+            session["writer"] = await writer.checkpoint()
+            session["offset"] = session["writer"]["size"]
+            await self._save(session)
+        except Exception as e:
+            # The previous checkpoint is still consistent; the client will
+            # simply re-send from the last committed offset
+            logger.error(f"Checkpointing resumable upload {session['id']} failed: {e}")
+
+    async def terminate(self, session: Dict[str, Any]):
+        """Drop a session and whatever it had written so far"""
+        if session["key"] is not None and session["result"] is None:
+            try:
+                writer = get_storage_service().open_writer(
+                    self.settings.AWS_S3_BUCKET,
+                    session["key"],
+                    content_type=session["content_type"],
+                    state=session["writer"]
+                )
+                await writer.abort()
+            except Exception as e:
+                logger.error(f"Aborting resumable upload {session['id']} failed: {e}")
+        await get_redis().delete(self._key(session["id"]))
+
+
+# Singleton instance
+_resumable_upload_service: Optional[ResumableUploadService] = None
+
+def get_resumable_upload_service() -> ResumableUploadService:
+    """Get or create resumable upload service instance"""
+    global _resumable_upload_service
+    if _resumable_upload_service is None:
+        _resumable_upload_service = ResumableUploadService()
+    return _resumable_upload_service
@@ -0,0 +1,255 @@
+"""
+In-memory product shade index
+Vectorized CIEDE2000 nearest-shade lookup for AR overlays
+"""
+
+import time
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.face_analysis_service import srgb_to_lab
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_TYPES = ("lipstick", "blush", "eyeliner", "eyeshadow")
+
+
+def hex_to_rgb(color: str) -> np.ndarray:
+    color = color.lstrip("#")
+    return np.array([int(color[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.float32)
+
+
+@lru_cache(maxsize=1024)
+def hex_to_lab(color: str) -> np.ndarray:
+    """Cached LAB conversion for palette target colours"""
+    return srgb_to_lab(hex_to_rgb(color)[None, :])[0]
+
+
+def ciede2000(reference: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    CIEDE2000 colour difference between one LAB colour and an (N, 3) array.
+    Follows Sharma, Wu & Dalal (2005) with kL = kC = kH = 1.
+    """
+    L1, a1, b1 = (float(v) for v in reference)
+    L2, a2, b2 = candidates[:, 0], candidates[:, 1], candidates[:, 2]
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_bar7 = ((C1 + C2) / 2.0) ** 7
+    G = 0.5 * (1.0 - np.sqrt(C_bar7 / (C_bar7 + 25.0 ** 7)))
+
+    a1p = (1.0 + G) * a1
+    a2p = (1.0 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360.0
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360.0
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180.0, dhp - 360.0, dhp)
+    dhp = np.where(dhp < -180.0, dhp + 360.0, dhp)
+    dhp = np.where(C1p * C2p == 0, 0.0, dhp)
+    dHp = 2.0 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp) / 2.0)
+
+    Lp_bar = (L1 + L2) / 2.0
+    Cp_bar = (C1p + C2p) / 2.0
+    hp_sum = h1p + h2p
+    hp_bar = np.where(
+        C1p * C2p == 0,
+        hp_sum,
+        np.where(
+            np.abs(h1p - h2p) <= 180.0,
+            hp_sum / 2.0,
+            np.where(hp_sum < 360.0, (hp_sum + 360.0) / 2.0, (hp_sum - 360.0) / 2.0),
+        ),
+    )
+
+    T = (
+        1.0
+        - 0.17 * np.cos(np.radians(hp_bar - 30.0))
+        + 0.24 * np.cos(np.radians(2.0 * hp_bar))
+        + 0.32 * np.cos(np.radians(3.0 * hp_bar + 6.0))
+        - 0.20 * np.cos(np.radians(4.0 * hp_bar - 63.0))
+    )
+    d_theta = 30.0 * np.exp(-(((hp_bar - 275.0) / 25.0) ** 2))
+    Cp_bar7 = Cp_bar ** 7
+    R_C = 2.0 * np.sqrt(Cp_bar7 / (Cp_bar7 + 25.0 ** 7))
+    S_L = 1.0 + (0.015 * (Lp_bar - 50.0) ** 2) / np.sqrt(20.0 + (Lp_bar - 50.0) ** 2)
+    S_C = 1.0 + 0.045 * Cp_bar
+    S_H = 1.0 + 0.015 * Cp_bar * T
+    R_T = -np.sin(np.radians(2.0 * d_theta)) * R_C
+
+    return np.sqrt(
+        (dLp / S_L) ** 2
+        + (dCp / S_C) ** 2
+        + (dHp / S_H) ** 2
+        + R_T * (dCp / S_C) * (dHp / S_H)
+    )
+
+
+class _ShadeTable:
+    """Dense LAB array for one overlay type with O(1) upsert/remove"""
+
+    def __init__(self, capacity: int = 64):
+        self.lab = np.zeros((capacity, 3), dtype=np.float64)
+        self.in_stock = np.zeros(capacity, dtype=bool)
+        self.ids: List[str] = []
+        self.hexes: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, product_id: str, lab: np.ndarray, shade_hex: str, in_stock: bool):
+        row = self.rows.get(product_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.lab):
+                self.lab = np.resize(self.lab, (row * 2, 3))
+                self.in_stock = np.resize(self.in_stock, row * 2)
+            self.ids.append(product_id)
+            self.hexes.append(shade_hex)
+            self.rows[product_id] = row
+        else:
+            self.hexes[row] = shade_hex
+        self.lab[row] = lab
+        self.in_stock[row] = in_stock
+
+    def remove(self, product_id: str):
+        row = self.rows.pop(product_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            # Swap the last row into the hole to keep the array dense
+            self.lab[row] = self.lab[last]
+            self.in_stock[row] = self.in_stock[last]
+            self.ids[row] = self.ids[last]
+            self.hexes[row] = self.hexes[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.hexes.pop()
+
+    def nearest(self, target_lab: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        n = len(self.ids)
+        if n == 0:
+            return []
+        available = np.flatnonzero(self.in_stock[:n])
+        if len(available) == 0:
+            return []
+        distances = ciede2000(target_lab, self.lab[available])
+        k = min(k, len(available))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return [
+            {
+                "product_id": self.ids[available[i]],
+                "color_code": self.hexes[available[i]],
+                "delta_e": round(float(distances[i]), 2),
+            }
+            for i in best
+        ]
+
+
+class ShadeIndex:
+    """Per-overlay-type shade tables, kept current by product writes"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.tables: Dict[str, _ShadeTable] = {t: _ShadeTable() for t in OVERLAY_TYPES}
+        self._product_types: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+
+    def is_stale(self) -> bool:
+        # Other workers update their own copy; a periodic full rebuild keeps them converged
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self.settings.SHADE_INDEX_REFRESH_SECONDS
+        )
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if self.is_stale():
+            await self.rebuild(db)
+
+    async def rebuild(self, db: AsyncSession):
+        """Full rebuild from the products table"""
+        from app.models import Product
+
+        result = await db.execute(
+            select(Product.id, Product.makeup_type, Product.shade_hex, Product.stock_quantity)
+            .where(
+                (Product.is_active == True)
+                & (Product.shade_hex != None)
+                & (Product.makeup_type.in_(OVERLAY_TYPES))
+            )
+        )
+        rows = result.all()
+
+        tables = {t: _ShadeTable(max(64, len(rows))) for t in OVERLAY_TYPES}
+        product_types = {}
+        if rows:
+            labs = srgb_to_lab(np.stack([hex_to_rgb(r[2]) for r in rows]))
+            for (product_id, makeup_type, shade_hex, stock), lab in zip(rows, labs):
+                tables[makeup_type].upsert(str(product_id), lab, shade_hex, (stock or 0) > 0)
+                product_types[str(product_id)] = makeup_type
+
+        self.tables = tables
+        self._product_types = product_types
+        self._loaded_at = time.monotonic()
+        logger.info(f"Shade index rebuilt with {len(rows)} shades")
+
+    def upsert_product(self, product) -> None:
+        """Incrementally apply a product create/update"""
+        product_id = str(product.id)
+        previous_type = self._product_types.get(product_id)
+        indexable = (
+            product.is_active
+            and product.shade_hex
+            and product.makeup_type in OVERLAY_TYPES
+        )
+
+        if previous_type and (not indexable or previous_type != product.makeup_type):
+            self.tables[previous_type].remove(product_id)
+            self._product_types.pop(product_id, None)
+
+        if indexable:
+            lab = hex_to_lab(product.shade_hex)
+            self.tables[product.makeup_type].upsert(
+                product_id, lab, product.shade_hex, (product.stock_quantity or 0) > 0
+            )
+            self._product_types[product_id] = product.makeup_type
+
+    def remove_product(self, product_id: str) -> None:
+        makeup_type = self._product_types.pop(str(product_id), None)
+        if makeup_type:
+            self.tables[makeup_type].remove(str(product_id))
+
+    def nearest(self, overlay_type: str, target_hex: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Nearest in-stock shades to a target colour for one overlay type"""
+        return self.nearest_lab(overlay_type, hex_to_lab(target_hex), k)
+
+    def nearest_lab(self, overlay_type: str, target_lab: np.ndarray, k: int = 3) -> List[Dict[str, Any]]:
+        """Nearest in-stock shades to a LAB target for one overlay type"""
+        table = self.tables.get(overlay_type)
+        if table is None:
+            return []
+        return table.nearest(np.asarray(target_lab, dtype=np.float64), k)
+
+
+# Singleton instance
+_shade_index: Optional[ShadeIndex] = None
+
+def get_shade_index() -> ShadeIndex:
+    """Get or create shade index instance"""
+    global _shade_index
+    if _shade_index is None:
+        _shade_index = ShadeIndex()
+    return _shade_index
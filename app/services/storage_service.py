@@ -3,17 +3,228 @@ AWS S3 / Cloudflare R2 Storage Service
 Handles file uploads, downloads, and management
 """
 
+import asyncio
 import boto3
-from typing import Optional, BinaryIO
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, BinaryIO
 from app.config import get_settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+class S3MultipartWriter:
+    """
+    Streams bytes into an S3 multipart upload holding at most one part in memory.
+    Objects smaller than one part are sent with a single PutObject instead.
+    """
+    
+    def __init__(self, service, bucket: str, key: str, content_type: str, extra_args: dict, state: Optional[dict] = None):
+        self.service = service
+        self.client = service.s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.extra_args = extra_args
+        self.part_size = service.settings.STORAGE_MULTIPART_PART_SIZE
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+        self.size = 0
+        # Bytes short of a full part are parked in a side object between
+        # resumable requests, since S3 parts (except the last) must be >= 5MB
+        self.tail_key = f"{key}.tail"
+        self.tail_size = 0
+        if state:
+            self.upload_id = state["upload_id"]
+            self.parts = state["parts"]
+            self.size = state["size"]
+            self.tail_size = state["tail_size"]
+        self._tail_loaded = self.tail_size == 0
+    
+    async def _load_tail(self):
+        if not self._tail_loaded:
+            response = await self.service.run(self.client.get_object, Bucket=self.bucket, Key=self.tail_key)
+            self.buffer = bytearray(await self.service.run(response['Body'].read))
+            self._tail_loaded = True
+    
+    async def _delete_tail(self):
+        if self.tail_size:
+            try:
+                await self.service.run(self.client.delete_object, Bucket=self.bucket, Key=self.tail_key)
+            except Exception as e:
+                logger.error(f"Deleting upload tail {self.tail_key} failed: {e}")
+            self.tail_size = 0
+    
+    async def write(self, data: bytes):
+        await self._load_tail()
+        self.buffer.extend(data)
+        self.size += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            await self._upload_part(part)
+    
+    async def _upload_part(self, part: bytes):
+        if self.upload_id is None:
+            response = await self.service.run(
+                self.client.create_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                **self.extra_args
+            )
+            self.upload_id = response['UploadId']
+        
+        part_number = len(self.parts) + 1
+        response = await self.service.run(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=part
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+    
+    async def checkpoint(self) -> dict:
+        """Persist progress for open_writer(state=...) in a later request"""
+        await self._load_tail()
+        if self.buffer:
+            await self.service.run(
+                self.client.put_object,
+                Bucket=self.bucket,
+                Key=self.tail_key,
+                Body=bytes(self.buffer)
+            )
+            self.tail_size = len(self.buffer)
+        else:
+            await self._delete_tail()
+        self.buffer = bytearray()
+        self._tail_loaded = self.tail_size == 0
+        return {
+            "upload_id": self.upload_id,
+            "parts": self.parts,
+            "size": self.size,
+            "tail_size": self.tail_size,
+        }
+    
+    async def complete(self) -> dict:
+        await self._load_tail()
+        if self.upload_id is None:
+            await self.service.run(
+                self.client.put_object,
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self.buffer),
+                ContentType=self.content_type,
+                **self.extra_args
+            )
+        else:
+            if self.buffer:
+                await self._upload_part(bytes(self.buffer))
+            await self.service.run(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': self.parts}
+            )
+        self.buffer = bytearray()
+        await self._delete_tail()
+        logger.info(f"File uploaded: {self.key} ({self.size} bytes, {max(len(self.parts), 1)} part(s))")
+        return {
+            "success": True,
+            "key": self.key,
+            "url": self.service.public_url(self.bucket, self.key),
+            "bucket": self.bucket,
+            "size": self.size
+        }
+    
+    async def abort(self):
+        self.buffer = bytearray()
+        await self._delete_tail()
+        if self.upload_id is not None:
+            try:
+                await self.service.run(
+                    self.client.abort_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id
+                )
+            except Exception as e:
+                logger.error(f"Abort multipart upload failed for {self.key}: {e}")
+            self.upload_id = None
+
+class LocalFileWriter:
+    """Streams bytes to a temp file that is renamed into place on completion"""
+    
+    def __init__(self, service, bucket: str, key: str, content_type: str, cache_control: Optional[str], state: Optional[dict] = None):
+        self.service = service
+        self.bucket = bucket
+        self.key = key
+        self.path = service.local_path(key)
+        self.meta = {"content_type": content_type, "cache_control": cache_control, "content_encoding": None}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if state:
+            self.tmp_path = state["tmp_path"]
+            self.size = state["size"]
+            # Drop anything written after the last checkpoint
+            self.file = open(self.tmp_path, 'r+b')
+            self.file.truncate(self.size)
+            self.file.seek(self.size)
+        else:
+            self.tmp_path = f"{self.path}.{uuid.uuid4().hex}.part"
+            self.file = open(self.tmp_path, 'wb')
+            self.size = 0
+    
+    async def write(self, data: bytes):
+        self.file.write(data)
+        self.size += len(data)
+    
+    async def checkpoint(self) -> dict:
+        """Persist progress for open_writer(state=...) in a later request"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        return {"tmp_path": self.tmp_path, "size": self.size}
+    
+    async def complete(self) -> dict:
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        with open(f"{self.path}.meta", 'w') as f:
+            json.dump(self.meta, f)
+        logger.info(f"File stored locally: {self.key} ({self.size} bytes)")
+        return {
+            "success": True,
+            "key": self.key,
+            "url": self.service.public_url(self.bucket, self.key),
+            "bucket": self.bucket,
+            "size": self.size
+        }
+    
+    async def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
 class StorageService:
     def __init__(self):
         self.settings = get_settings()
         self.s3_client = None
+        # boto3 is blocking; every S3 call runs on this pool so uploads never
+        # stall the event loop, and its size is the global concurrency cap
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.settings.STORAGE_IO_THREADS,
+            thread_name_prefix="storage-io"
+        )
         self._initialize_s3()
     
     def _initialize_s3(self):
@@ -24,32 +235,53 @@ class StorageService:
                 aws_access_key_id=self.settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=self.settings.AWS_SECRET_ACCESS_KEY,
                 region_name=self.settings.AWS_REGION,
+                # MinIO / moto server / R2 endpoints for S3-compatible storage
+                endpoint_url=self.settings.AWS_S3_ENDPOINT_URL,
+                # One pooled connection per IO thread; the client is thread-safe
+                config=Config(max_pool_connections=self.settings.STORAGE_IO_THREADS),
             )
             logger.info("S3 client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {e}")
             raise
     
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking boto3 call on the storage IO pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
     async def upload_file(
         self,
         file: BinaryIO,
         bucket: str,
         key: str,
-        content_type: str = 'application/octet-stream'
+        content_type: str = 'application/octet-stream',
+        cache_control: Optional[str] = None,
+        content_encoding: Optional[str] = None
     ) -> dict:
         """Upload file to S3"""
         try:
-            self.s3_client.upload_fileobj(
+            extra_args = {
+                'ContentType': content_type,
+                'ACL': 'public-read'
+            }
+            if cache_control:
+                extra_args['CacheControl'] = cache_control
+            if content_encoding:
+                extra_args['ContentEncoding'] = content_encoding
+            
+            await self.run(
+                self.s3_client.upload_fileobj,
                 file,
                 bucket,
                 key,
-                ExtraArgs={
-                    'ContentType': content_type,
-                    'ACL': 'public-read'
-                }
+                ExtraArgs=extra_args
             )
             
-            url = f"https://{bucket}.s3.{self.settings.AWS_REGION}.amazonaws.com/{key}"
+            url = self.public_url(bucket, key)
             logger.info(f"File uploaded: {key}")
             return {
                 "success": True,
@@ -61,10 +293,42 @@ class StorageService:
             logger.error(f"Upload failed: {e}")
             raise
     
+    def public_url(self, bucket: str, key: str) -> str:
+        """Public URL for a key, via the CDN when one is configured"""
+        if self.settings.STORAGE_PUBLIC_BASE_URL:
+            return f"{self.settings.STORAGE_PUBLIC_BASE_URL.rstrip('/')}/{key}"
+        if self.settings.AWS_S3_ENDPOINT_URL:
+            return f"{self.settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{bucket}/{key}"
+        return f"https://{bucket}.s3.{self.settings.AWS_REGION}.amazonaws.com/{key}"
+    
+    def key_for_url(self, bucket: str, url: str) -> Optional[str]:
+        """Inverse of public_url; None for URLs this backend did not issue"""
+        prefix = self.public_url(bucket, "")
+        if url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):]
+        return None
+    
+    def open_writer(
+        self,
+        bucket: str,
+        key: str,
+        content_type: str = 'application/octet-stream',
+        cache_control: Optional[str] = None,
+        state: Optional[dict] = None
+    ) -> S3MultipartWriter:
+        """
+        Start a streaming upload; call write() per chunk then complete() or
+        abort(). Pass a checkpoint() result as `state` to resume one.
+        """
+        extra_args = {'ACL': 'public-read'}
+        if cache_control:
+            extra_args['CacheControl'] = cache_control
+        return S3MultipartWriter(self, bucket, key, content_type, extra_args, state)
+    
     async def delete_file(self, bucket: str, key: str) -> dict:
         """Delete file from S3"""
         try:
-            self.s3_client.delete_object(Bucket=bucket, Key=key)
+            await self.run(self.s3_client.delete_object, Bucket=bucket, Key=key)
             logger.info(f"File deleted: {key}")
             return {"success": True, "key": key}
         except Exception as e:
@@ -79,7 +343,8 @@ class StorageService:
     ) -> str:
         """Get signed URL for private files"""
         try:
-            url = self.s3_client.generate_presigned_url(
+            url = await self.run(
+                self.s3_client.generate_presigned_url,
                 'get_object',
                 Params={'Bucket': bucket, 'Key': key},
                 ExpiresIn=expires_in
@@ -89,32 +354,301 @@ class StorageService:
             logger.error(f"Failed to generate URL: {e}")
             raise
     
-    async def list_files(self, bucket: str, prefix: str = '') -> list:
-        """List files in bucket"""
+    async def create_presigned_upload(
+        self,
+        bucket: str,
+        key: str,
+        content_type: str,
+        max_size: int,
+        size: Optional[int] = None,
+        checksum_sha256: Optional[str] = None,
+        expires_in: int = 900
+    ) -> dict:
+        """
+        Presigned upload for direct client-to-bucket transfers.
+        POST policies enforce the size range and content type server-side;
+        when the client declares a SHA-256 a PUT is signed instead so S3
+        verifies the checksum and exact length on receipt.
+        """
+        try:
+            if checksum_sha256 and size:
+                params = {
+                    'Bucket': bucket,
+                    'Key': key,
+                    'ContentType': content_type,
+                    'ContentLength': size,
+                    'ChecksumSHA256': checksum_sha256,
+                }
+                url = await self.run(
+                    self.s3_client.generate_presigned_url,
+                    'put_object',
+                    Params=params,
+                    ExpiresIn=expires_in
+                )
+                return {
+                    "method": "PUT",
+                    "url": url,
+                    "fields": {},
+                    "headers": {
+                        "Content-Type": content_type,
+                        "x-amz-checksum-sha256": checksum_sha256,
+                    },
+                }
+            
+            post = await self.run(
+                self.s3_client.generate_presigned_post,
+                bucket,
+                key,
+                Fields={'Content-Type': content_type},
+                Conditions=[
+                    {'Content-Type': content_type},
+                    ['content-length-range', 1, max_size],
+                ],
+                ExpiresIn=expires_in
+            )
+            return {"method": "POST", "url": post['url'], "fields": post['fields'], "headers": {}}
+        except Exception as e:
+            logger.error(f"Failed to presign upload: {e}")
+            raise
+    
+    async def head_object(self, bucket: str, key: str) -> Optional[dict]:
+        """Object size, type and checksum, or None if it does not exist"""
         try:
-            response = self.s3_client.list_objects_v2(
+            response = await self.run(
+                self.s3_client.head_object,
                 Bucket=bucket,
-                Prefix=prefix
+                Key=key,
+                ChecksumMode='ENABLED'
             )
-            files = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    files.append({
-                        'key': obj['Key'],
-                        'size': obj['Size'],
-                        'modified': obj['LastModified'].isoformat()
-                    })
-            return files
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {
+            "size": response['ContentLength'],
+            "content_type": response.get('ContentType'),
+            "etag": response.get('ETag', '').strip('"'),
+            "checksum_sha256": response.get('ChecksumSHA256'),
+        }
+    
+    async def read_range(self, bucket: str, key: str, length: int) -> bytes:
+        """First `length` bytes of an object (content sniffing)"""
+        response = await self.run(
+            self.s3_client.get_object,
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes=0-{length - 1}"
+        )
+        return await self.run(response['Body'].read)
+    
+    async def download_file(self, bucket: str, key: str, path: str):
+        """Copy an object to a local path (transcoding, batch jobs)"""
+        await self.run(self.s3_client.download_file, bucket, key, path)
+    
+    async def iter_files(self, bucket: str, prefix: str = '', page_size: int = 1000) -> AsyncIterator[dict]:
+        """Yield every object under a prefix, one ListObjectsV2 page at a time"""
+        kwargs = {'Bucket': bucket, 'Prefix': prefix, 'MaxKeys': page_size}
+        while True:
+            try:
+                response = await self.run(self.s3_client.list_objects_v2, **kwargs)
+            except Exception as e:
+                logger.error(f"List failed: {e}")
+                raise
+            for obj in response.get('Contents', []):
+                yield {
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'modified': obj['LastModified'].isoformat()
+                }
+            if not response.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+    
+    async def list_files(self, bucket: str, prefix: str = '') -> list:
+        """List files in bucket"""
+        return [f async for f in self.iter_files(bucket, prefix)]
+    
+    async def delete_files(self, bucket: str, keys: List[str]) -> dict:
+        """Delete up to 1000 keys in one DeleteObjects call"""
+        if len(keys) > 1000:
+            raise ValueError("DeleteObjects accepts at most 1000 keys")
+        if not keys:
+            return {"deleted": 0, "errors": []}
+        response = await self.run(
+            self.s3_client.delete_objects,
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+        errors = [{"key": e['Key'], "error": e.get('Message', e.get('Code'))} for e in response.get('Errors', [])]
+        logger.info(f"Files deleted: {len(keys) - len(errors)}")
+        return {"deleted": len(keys) - len(errors), "errors": errors}
+
+class LocalStorageService:
+    """
+    Filesystem storage backend with the same interface as StorageService.
+    Used for tests and single-node/dev deployments; files are served from /uploads.
+    """
+    
+    def __init__(self, root: Optional[str] = None):
+        self.settings = get_settings()
+        self.root = root or self.settings.STORAGE_LOCAL_ROOT
+        os.makedirs(self.root, exist_ok=True)
+    
+    def local_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+    
+    async def upload_file(
+        self,
+        file: BinaryIO,
+        bucket: str,
+        key: str,
+        content_type: str = 'application/octet-stream',
+        cache_control: Optional[str] = None,
+        content_encoding: Optional[str] = None
+    ) -> dict:
+        """Write file under the local storage root"""
+        try:
+            path = self.local_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                while True:
+                    chunk = file.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            
+            # Headers S3 would keep as object metadata live in a sidecar file
+            with open(f"{path}.meta", 'w') as f:
+                json.dump({
+                    "content_type": content_type,
+                    "cache_control": cache_control,
+                    "content_encoding": content_encoding
+                }, f)
+            
+            logger.info(f"File stored locally: {key}")
+            return {
+                "success": True,
+                "key": key,
+                "url": self.public_url(bucket, key),
+                "bucket": bucket
+            }
         except Exception as e:
-            logger.error(f"List failed: {e}")
+            logger.error(f"Local upload failed: {e}")
             raise
+    
+    def public_url(self, bucket: str, key: str) -> str:
+        if self.settings.STORAGE_PUBLIC_BASE_URL:
+            return f"{self.settings.STORAGE_PUBLIC_BASE_URL.rstrip('/')}/{key}"
+        return f"/uploads/{key}"
+    
+    def key_for_url(self, bucket: str, url: str) -> Optional[str]:
+        """Inverse of public_url; None for URLs this backend did not issue"""
+        prefix = self.public_url(bucket, "")
+        if url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):]
+        return None
+    
+    def open_writer(
+        self,
+        bucket: str,
+        key: str,
+        content_type: str = 'application/octet-stream',
+        cache_control: Optional[str] = None,
+        state: Optional[dict] = None
+    ) -> LocalFileWriter:
+        """Start or resume a streaming write; call write() per chunk then complete() or abort()"""
+        return LocalFileWriter(self, bucket, key, content_type, cache_control, state)
+    
+    async def delete_file(self, bucket: str, key: str) -> dict:
+        """Delete a locally stored file"""
+        path = self.local_path(key)
+        for target in (path, f"{path}.meta"):
+            if os.path.exists(target):
+                os.remove(target)
+        logger.info(f"File deleted: {key}")
+        return {"success": True, "key": key}
+    
+    async def get_file_url(self, bucket: str, key: str, expires_in: int = 3600) -> str:
+        return self.public_url(bucket, key)
+    
+    def shutdown(self):
+        pass
+    
+    async def create_presigned_upload(self, bucket: str, key: str, content_type: str, max_size: int, **kwargs) -> dict:
+        raise NotImplementedError("Direct uploads require object storage")
+    
+    async def head_object(self, bucket: str, key: str) -> Optional[dict]:
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            return None
+        meta = {}
+        if os.path.exists(f"{path}.meta"):
+            with open(f"{path}.meta") as f:
+                meta = json.load(f)
+        return {
+            "size": os.path.getsize(path),
+            "content_type": meta.get("content_type"),
+            "etag": None,
+            "checksum_sha256": None,
+        }
+    
+    async def read_range(self, bucket: str, key: str, length: int) -> bytes:
+        with open(self.local_path(key), 'rb') as f:
+            return f.read(length)
+    
+    async def download_file(self, bucket: str, key: str, path: str):
+        shutil.copyfile(self.local_path(key), path)
+    
+    async def iter_files(self, bucket: str, prefix: str = '', page_size: int = 1000) -> AsyncIterator[dict]:
+        """Yield locally stored files under a key prefix, one directory at a time"""
+        # Only walk the directory the prefix points into
+        start = os.path.join(self.root, os.path.dirname(prefix))
+        pending = [start] if os.path.isdir(start) else []
+        while pending:
+            directory = pending.pop()
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+            pending.extend(reversed([e.path for e in entries if e.is_dir()]))
+            for entry in entries:
+                if entry.is_dir() or entry.name.endswith(".meta"):
+                    continue
+                key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                if not key.startswith(prefix):
+                    continue
+                stat = entry.stat()
+                yield {
+                    'key': key,
+                    'size': stat.st_size,
+                    'modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()
+                }
+            # Let other tasks run between directories on large trees
+            await asyncio.sleep(0)
+    
+    async def list_files(self, bucket: str, prefix: str = '') -> list:
+        """List locally stored files under a key prefix"""
+        return sorted([f async for f in self.iter_files(bucket, prefix)], key=lambda f: f['key'])
+    
+    async def delete_files(self, bucket: str, keys: List[str]) -> dict:
+        """Delete a batch of locally stored files"""
+        errors = []
+        for key in keys:
+            try:
+                await self.delete_file(bucket, key)
+            except Exception as e:
+                errors.append({"key": key, "error": str(e)})
+        return {"deleted": len(keys) - len(errors), "errors": errors}
 
 # Singleton instance
-_storage_service: Optional[StorageService] = None
+_storage_service = None
 
-def get_storage_service() -> StorageService:
-    """Get or create storage service instance"""
+def get_storage_service():
+    """Get or create storage service instance for the configured backend"""
     global _storage_service
     if _storage_service is None:
-        _storage_service = StorageService()
+        if get_settings().STORAGE_BACKEND == "local":
+            _storage_service = LocalStorageService()
+        else:
+            _storage_service = StorageService()
     return _storage_service
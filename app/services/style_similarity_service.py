@@ -0,0 +1,167 @@
+"""
+"Find similar looks" for saved mirror styles
+Style embeddings + pgVector HNSW search over shareable looks
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 384
+# Slots 0-2 carry measured skin colour; the rest hold hashed categorical features
+_COLOR_SLOTS = 3
+SHAREABLE_STATES = ("saved", "shared")
+# Each style caches one result at this size; smaller limits are slices of it
+MAX_SIMILAR_LOOKS = 50
+
+
+def _bucket(feature: str) -> tuple:
+    """Stable (across processes) hash of a feature to a slot and sign"""
+    digest = hashlib.md5(feature.encode("utf-8")).digest()
+    slot = _COLOR_SLOTS + int.from_bytes(digest[:4], "little") % (EMBEDDING_DIM - _COLOR_SLOTS)
+    sign = 1.0 if digest[4] & 1 else -1.0
+    return slot, sign
+
+
+def compute_style_embedding(
+    style_mode: str,
+    face_analysis: Optional[Dict[str, Any]],
+    recommended_products: Optional[List[Dict[str, Any]]]
+) -> List[float]:
+    """
+    Feature-hashed, L2-normalised style vector from the look's mode,
+    face attributes and recommended product ids
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    face_analysis = face_analysis or {}
+
+    weighted_features = [(f"mode:{style_mode}", 1.0)]
+    for key, weight in (("skin_tone", 0.8), ("undertone", 0.5), ("face_shape", 0.3)):
+        if face_analysis.get(key):
+            weighted_features.append((f"{key}:{str(face_analysis[key]).lower()}", weight))
+
+    product_ids = [str(p["id"]) for p in (recommended_products or []) if p.get("id")]
+    if product_ids:
+        product_weight = 1.0 / np.sqrt(len(product_ids))
+        weighted_features.extend((f"product:{pid}", product_weight) for pid in product_ids)
+
+    for feature, weight in weighted_features:
+        slot, sign = _bucket(feature)
+        vector[slot] += sign * weight
+
+    skin_lab = face_analysis.get("skin_lab")
+    if skin_lab and len(skin_lab) == 3:
+        # Scale LAB into roughly unit range so colour competes with categories
+        vector[:_COLOR_SLOTS] = np.array(skin_lab, dtype=np.float32) / np.array([100.0, 60.0, 60.0])
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return [round(float(v), 6) for v in vector]
+
+
+def to_pgvector(embedding: List[float]) -> str:
+    return "[" + ",".join(str(v) for v in embedding) + "]"
+
+
+class StyleSimilarityService:
+    """kNN over shareable looks, cached per style"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.settings = get_settings()
+
+    @staticmethod
+    def _cache_key(style_id: str) -> str:
+        return f"mirror:similar:{style_id}"
+
+    async def find_similar(self, style_id: str, user_id: str, limit: int = 12) -> Optional[List[Dict[str, Any]]]:
+        """Looks saved by other users nearest to the given style; None if the style isn't the user's"""
+        limit = min(limit, MAX_SIMILAR_LOOKS)
+        redis = get_redis()
+        cache_key = self._cache_key(style_id)
+        try:
+            cached = await redis.get(cache_key)
+            if cached is not None:
+                cached = json.loads(cached)
+                # Only the owner may read a style's neighbours
+                if cached["user_id"] != user_id:
+                    return None
+                return cached["looks"][:limit]
+        except Exception as e:
+            logger.error(f"Similar looks cache read failed: {e}")
+
+        source = await self.db.execute(
+            text("""
+                SELECT style_mode, face_analysis, recommended_products, embedding::text
+                FROM mirror_styles
+                WHERE id = :style_id AND user_id = :user_id
+            """),
+            {"style_id": style_id, "user_id": user_id}
+        )
+        row = source.fetchone()
+        if row is None:
+            return None
+
+        embedding = row[3] or to_pgvector(compute_style_embedding(row[0], row[1], row[2]))
+
+        # ef_search trades recall for latency on the HNSW graph
+        await self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(self.settings.STYLE_SIMILARITY_EF_SEARCH)}"))
+        result = await self.db.execute(
+            text("""
+                SELECT ms.id, ms.user_id, ms.style_mode, ms.encrypted_json_url,
+                       ms.face_analysis->>'skin_tone' AS skin_tone,
+                       u.username, u.avatar_url,
+                       ms.embedding <=> CAST(:embedding AS vector) AS distance
+                FROM mirror_styles ms
+                JOIN users u ON u.id = ms.user_id
+                WHERE ms.is_saved IN ('saved', 'shared')
+                  AND ms.embedding IS NOT NULL
+                  AND ms.user_id <> :user_id
+                ORDER BY ms.embedding <=> CAST(:embedding AS vector)
+                LIMIT :limit
+            """),
+            {"embedding": embedding, "user_id": user_id, "limit": MAX_SIMILAR_LOOKS}
+        )
+        # SET LOCAL only lives until the end of this read transaction
+        await self.db.commit()
+
+        looks = [
+            {
+                "id": str(r[0]),
+                "user_id": str(r[1]),
+                "style_mode": r[2],
+                "look_url": r[3],
+                "skin_tone": r[4],
+                "username": r[5],
+                "avatar_url": r[6],
+                "similarity": round(1.0 - float(r[7]), 4),
+            }
+            for r in result.fetchall()
+        ]
+
+        try:
+            await redis.set(
+                cache_key,
+                json.dumps({"user_id": user_id, "looks": looks}),
+                ex=self.settings.STYLE_SIMILARITY_CACHE_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Similar looks cache write failed: {e}")
+        return looks[:limit]
+
+    async def invalidate(self, style_id: str):
+        try:
+            await get_redis().delete(self._cache_key(style_id))
+        except Exception as e:
+            logger.error(f"Similar looks cache invalidation failed: {e}")
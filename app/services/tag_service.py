@@ -0,0 +1,184 @@
+"""
+Post tags
+Tags are normalised into post_tags (tag, created_at, post_id) so a tag page
+is a keyset range scan instead of a JSON scan over every post. Tag usage
+is counted in 5-minute Redis buckets with a rolling 24h aggregate: writers
+bump both, a periodic job subtracts buckets as they leave the window, and
+"top tags" is a single ZREVRANGE.
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import FeedPost
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 100
+MAX_TAGS_PER_POST = 30
+TRENDING_KEY = "tags:trending"
+EXPIRED_THROUGH_KEY = "tags:trending:expired_through"
+ROLLOVER_LOCK_KEY = "tags:trending:lock"
+# Buckets outlive the window by this many bucket lengths so the rollover
+# job can still subtract them after a short stall
+BUCKET_GRACE = 4
+
+
+def _bucket_key(bucket: int) -> str:
+    return f"tags:bucket:{bucket}"
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+    """Lowercase, strip '#' and whitespace, drop empties and duplicates (order kept)"""
+    seen = []
+    for tag in tags or []:
+        tag = str(tag).strip().lstrip("#").strip().lower()[:MAX_TAG_LENGTH]
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen[:MAX_TAGS_PER_POST]
+
+
+async def sync_post_tags(db: AsyncSession, post: FeedPost) -> List[str]:
+    """
+    Make post_tags match post.tags inside the caller's transaction (post must
+    be flushed). Returns tags that were not on the post before.
+    """
+    tags = normalize_tags(post.tags)
+    result = await db.execute(
+        text("DELETE FROM post_tags WHERE post_id = :post_id RETURNING tag"),
+        {"post_id": post.id}
+    )
+    previous = {row[0] for row in result.all()}
+    if tags and post.is_published:
+        params = {"post_id": post.id, "created_at": post.created_at}
+        values = []
+        for i, tag in enumerate(tags):
+            params[f"tag{i}"] = tag
+            values.append(f"(:tag{i}, :post_id, :created_at)")
+        await db.execute(
+            text(f"INSERT INTO post_tags (tag, post_id, created_at) VALUES {', '.join(values)}"),
+            params
+        )
+    return [tag for tag in tags if tag not in previous]
+
+
+async def tag_page(db: AsyncSession, tag: str, before: Optional[datetime], before_id: Optional[UUID], limit: int) -> List[FeedPost]:
+    """Newest posts with a tag, keyset-paged on (created_at, post_id)"""
+    normalized = normalize_tags([tag])
+    if not normalized:
+        return []
+    params = {"tag": normalized[0], "limit": limit}
+    keyset = ""
+    if before is not None:
+        params["before"] = before
+        if before_id is not None:
+            params["before_id"] = before_id
+            keyset = "AND (created_at, post_id) < (:before, :before_id)"
+        else:
+            keyset = "AND created_at < :before"
+    result = await db.execute(
+        text(f"""
+            SELECT post_id FROM post_tags
+            WHERE tag = :tag {keyset}
+            ORDER BY created_at DESC, post_id DESC
+            LIMIT :limit
+        """),
+        params
+    )
+    ids = [row[0] for row in result.all()]
+    if not ids:
+        return []
+    posts = await db.execute(select(FeedPost).where(FeedPost.id.in_(ids)))
+    by_id = {post.id: post for post in posts.scalars().all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+class TrendingTagService:
+    def __init__(self):
+        self.settings = get_settings()
+
+    def _bucket(self, at: Optional[float] = None) -> int:
+        return int((at if at is not None else time.time()) // self.settings.TRENDING_TAGS_BUCKET_SECONDS)
+
+    @property
+    def _window_buckets(self) -> int:
+        return self.settings.TRENDING_TAGS_WINDOW_SECONDS // self.settings.TRENDING_TAGS_BUCKET_SECONDS
+
+    async def record(self, tags: List[str]):
+        """Count one use of each tag in the current bucket and the rolling total"""
+        if not tags:
+            return
+        bucket_key = _bucket_key(self._bucket())
+        ttl = self.settings.TRENDING_TAGS_WINDOW_SECONDS + BUCKET_GRACE * self.settings.TRENDING_TAGS_BUCKET_SECONDS
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            for tag in tags:
+                pipe.zincrby(bucket_key, 1, tag)
+                pipe.zincrby(TRENDING_KEY, 1, tag)
+            pipe.expire(bucket_key, ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Recording tag usage failed: {e}")
+
+    async def top(self, limit: int) -> List[Tuple[str, int]]:
+        """Most used tags over the window, O(log n + k)"""
+        try:
+            entries = await get_redis().zrevrange(TRENDING_KEY, 0, limit - 1, withscores=True)
+        except Exception as e:
+            logger.error(f"Reading trending tags failed: {e}")
+            return []
+        return [(tag, int(score)) for tag, score in entries]
+
+    async def rollover(self) -> int:
+        """Subtract buckets that have left the window; returns buckets expired"""
+        redis = get_redis()
+        if not await redis.set(ROLLOVER_LOCK_KEY, "1", nx=True, ex=self.settings.TRENDING_TAGS_BUCKET_SECONDS):
+            return 0
+        try:
+            oldest_live = self._bucket() - self._window_buckets + 1
+            expired_through = await redis.get(EXPIRED_THROUGH_KEY)
+            # No marker (fresh Redis) or a stall long enough for buckets to
+            # have expired unsubtracted: rebuild the total from live buckets
+            if expired_through is None or oldest_live - int(expired_through) > BUCKET_GRACE:
+                keys = [_bucket_key(b) for b in range(oldest_live, oldest_live + self._window_buckets)]
+                pipe = redis.pipeline(transaction=True)
+                pipe.zunionstore(TRENDING_KEY, keys)
+                pipe.set(EXPIRED_THROUGH_KEY, oldest_live - 1)
+                await pipe.execute()
+                return 0
+
+            expired = 0
+            for bucket in range(int(expired_through) + 1, oldest_live):
+                pipe = redis.pipeline(transaction=True)
+                pipe.zunionstore(TRENDING_KEY, {TRENDING_KEY: 1, _bucket_key(bucket): -1})
+                pipe.zremrangebyscore(TRENDING_KEY, "-inf", 0)
+                pipe.set(EXPIRED_THROUGH_KEY, bucket)
+                await pipe.execute()
+                expired += 1
+            return expired
+        finally:
+            await redis.delete(ROLLOVER_LOCK_KEY)
+
+
+# Singleton instance
+_trending_tag_service: Optional[TrendingTagService] = None
+
+def get_trending_tag_service() -> TrendingTagService:
+    """Get or create trending tag service instance"""
+    global _trending_tag_service
+    if _trending_tag_service is None:
+        _trending_tag_service = TrendingTagService()
+    return _trending_tag_service
+
+
+async def run_trending_tags_rollover():
+    """Periodic job: age tag counts out of the trending window"""
+    await get_trending_tag_service().rollover()
@@ -0,0 +1,403 @@
+"""
+Reel transcoding
+Turns raw video uploads into an adaptive HLS ladder plus a poster frame with
+a local ffmpeg binary. Jobs live in Postgres so any node can claim them; each
+node runs a fixed number of workers, which bounds concurrent encodes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.feed import Reel
+from app.models.media import TranscodeJob
+from app.services.image_derivative_service import get_image_derivative_service
+from app.services.look_snapshot_service import IMMUTABLE_CACHE_CONTROL
+from app.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+# (short side in px, video bitrate kbps); rungs above the source are dropped
+HLS_LADDER = [
+    (1080, 5000),
+    (720, 2800),
+    (480, 1400),
+    (360, 800),
+]
+AUDIO_BITRATE = "128k"
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+}
+
+
+class TranscodeError(Exception):
+    """ffmpeg/ffprobe failed or produced unusable output"""
+
+
+async def _run(args: List[str], timeout: float) -> bytes:
+    """Run a subprocess, killing it on timeout or cancellation"""
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise TranscodeError(stderr.decode(errors="replace")[-2000:])
+    return stdout
+
+
+def select_renditions(width: int, height: int) -> List[Dict[str, Any]]:
+    """Ladder rungs that do not upscale, sized along the short side"""
+    short_side = min(width, height)
+    rungs = [(size, kbps) for size, kbps in HLS_LADDER if size <= short_side]
+    if not rungs:
+        # Tiny source: one rendition at native size and the lowest bitrate
+        rungs = [(short_side - short_side % 2, HLS_LADDER[-1][1])]
+    portrait = height > width
+    renditions = []
+    for size, kbps in rungs:
+        renditions.append({
+            "name": f"{size}p",
+            "scale": f"{size}:-2" if portrait else f"-2:{size}",
+            "video_bitrate": kbps,
+        })
+    return renditions
+
+
+def build_hls_command(
+    ffmpeg: str,
+    source: str,
+    out_dir: str,
+    renditions: List[Dict[str, Any]],
+    has_audio: bool,
+    segment_seconds: int
+) -> List[str]:
+    """One decode, split into every rendition, keyframes aligned across rungs"""
+    count = len(renditions)
+    splits = "".join(f"[s{i}]" for i in range(count))
+    filters = [f"[0:v]split={count}{splits}"]
+    filters += [f"[s{i}]scale={r['scale']}[v{i}]" for i, r in enumerate(renditions)]
+
+    args = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+            "-filter_complex", ";".join(filters)]
+    for i, r in enumerate(renditions):
+        kbps = r["video_bitrate"]
+        args += ["-map", f"[v{i}]"]
+        args += [f"-b:v:{i}", f"{kbps}k", f"-maxrate:v:{i}", f"{int(kbps * 1.07)}k",
+                 f"-bufsize:v:{i}", f"{int(kbps * 1.5)}k"]
+        if has_audio:
+            args += ["-map", "a:0"]
+    args += [
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main", "-pix_fmt", "yuv420p",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+    ]
+    if has_audio:
+        args += ["-c:a", "aac", "-b:a", AUDIO_BITRATE, "-ac", "2"]
+
+    stream_map = " ".join(
+        f"v:{i},a:{i},name:{r['name']}" if has_audio else f"v:{i},name:{r['name']}"
+        for i, r in enumerate(renditions)
+    )
+    args += [
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(out_dir, "%v", "seg_%04d.ts"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", stream_map,
+        os.path.join(out_dir, "%v", "index.m3u8"),
+    ]
+    return args
+
+
+class TranscodeService:
+    """Claims queued jobs and runs at most TRANSCODE_WORKERS encodes on this node"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._active = 0
+
+    def start(self):
+        for i in range(self.settings.TRANSCODE_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+        logger.info(f"Started {self.settings.TRANSCODE_WORKERS} transcode worker(s)")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued on this node"""
+        self._wakeup.set()
+
+    async def enqueue(self, db: AsyncSession, user_id: UUID, source_key: str) -> TranscodeJob:
+        job = TranscodeJob(user_id=user_id, source_key=source_key)
+        db.add(job)
+        await db.commit()
+        self.notify()
+        return job
+
+    async def _worker(self, index: int):
+        from app.database import AsyncSessionLocal
+
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    job = await self._claim(db)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.settings.TRANSCODE_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._active += 1
+                try:
+                    await self._process(job)
+                finally:
+                    self._active -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Transcode worker {index} error: {e}")
+                await asyncio.sleep(self.settings.TRANSCODE_POLL_SECONDS)
+
+    async def _claim(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job, or one whose worker died mid-encode.
+        SKIP LOCKED lets several nodes poll the same table without blocking.
+        Jobs whose worker died on the last attempt are failed instead.
+        """
+        params = {
+            "timeout": self.settings.TRANSCODE_TIMEOUT_SECONDS,
+            "max_attempts": self.settings.TRANSCODE_MAX_ATTEMPTS,
+        }
+        await db.execute(
+            text("""
+                UPDATE transcode_jobs
+                SET status = 'failed',
+                    error = 'Worker stopped responding on the final attempt'
+                WHERE status = 'processing'
+                  AND started_at < NOW() - make_interval(secs => :timeout)
+                  AND attempts >= :max_attempts
+            """),
+            params
+        )
+        result = await db.execute(
+            text("""
+                UPDATE transcode_jobs
+                SET status = 'processing', started_at = NOW(), attempts = attempts + 1
+                WHERE id = (
+                    SELECT id FROM transcode_jobs
+                    WHERE (status = 'queued'
+                           OR (status = 'processing'
+                               AND started_at < NOW() - make_interval(secs => :timeout)))
+                      AND attempts < :max_attempts
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, user_id, source_key, attempts
+            """),
+            params
+        )
+        row = result.fetchone()
+        await db.commit()
+        if row is None:
+            return None
+        return {"id": row[0], "user_id": row[1], "source_key": row[2], "attempts": row[3]}
+
+    async def _process(self, job: Dict[str, Any]):
+        from app.database import AsyncSessionLocal
+
+        logger.info(f"Transcoding {job['source_key']} (attempt {job['attempts']})")
+        try:
+            output = await self.transcode(job["id"], job["user_id"], job["source_key"])
+        except Exception as e:
+            logger.error(f"Transcode of {job['source_key']} failed: {e}")
+            retry = job["attempts"] < self.settings.TRANSCODE_MAX_ATTEMPTS
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("UPDATE transcode_jobs SET status = :status, error = :error WHERE id = :id"),
+                    {"status": "queued" if retry else "failed", "error": str(e)[-2000:], "id": job["id"]}
+                )
+                await db.commit()
+            return
+
+        async with AsyncSessionLocal() as db:
+            # Lock the job so a concurrent reel creation either sees the
+            # output or is seen by us
+            result = await db.execute(
+                select(TranscodeJob).where(TranscodeJob.id == job["id"]).with_for_update()
+            )
+            record = result.scalars().first()
+            record.status = "complete"
+            record.output = output
+            record.error = None
+            record.completed_at = datetime.utcnow()
+            if record.reel_id:
+                reel_result = await db.execute(select(Reel).where(Reel.id == record.reel_id))
+                reel = reel_result.scalars().first()
+                if reel:
+                    apply_transcode_output(reel, output)
+            await db.commit()
+        logger.info(f"Transcoded {job['source_key']}: {len(output['renditions'])} rendition(s)")
+
+    async def transcode(self, job_id: UUID, user_id: UUID, source_key: str) -> Dict[str, Any]:
+        """Download, probe, encode, extract a poster, upload; returns the job output"""
+        storage = get_storage_service()
+        bucket = self.settings.AWS_S3_BUCKET
+        timeout = self.settings.TRANSCODE_TIMEOUT_SECONDS
+
+        with tempfile.TemporaryDirectory(dir=self.settings.TRANSCODE_WORK_DIR) as work_dir:
+            source = os.path.join(work_dir, "source" + os.path.splitext(source_key)[1])
+            await storage.download_file(bucket, source_key, source)
+
+            probe = json.loads(await _run([
+                self.settings.FFPROBE_PATH, "-v", "error", "-print_format", "json",
+                "-show_format", "-show_streams", source
+            ], timeout=60))
+            video = next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), None)
+            if video is None:
+                raise TranscodeError("No video stream")
+            has_audio = any(s.get("codec_type") == "audio" for s in probe["streams"])
+            width, height = int(video["width"]), int(video["height"])
+            # Phone footage often stores rotation as metadata
+            rotation = abs(int(video.get("tags", {}).get("rotate", 0) or 0))
+            for side_data in video.get("side_data_list", []):
+                rotation = abs(int(side_data.get("rotation", rotation) or 0))
+            if rotation in (90, 270):
+                width, height = height, width
+            duration = float(probe.get("format", {}).get("duration") or video.get("duration") or 0)
+
+            renditions = select_renditions(width, height)
+            hls_dir = os.path.join(work_dir, "hls")
+            for r in renditions:
+                os.makedirs(os.path.join(hls_dir, r["name"]), exist_ok=True)
+            await _run(build_hls_command(
+                self.settings.FFMPEG_PATH, source, hls_dir, renditions, has_audio,
+                self.settings.TRANSCODE_SEGMENT_SECONDS
+            ), timeout=timeout)
+
+            poster_path = os.path.join(work_dir, "poster.jpg")
+            await _run([
+                self.settings.FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-y",
+                "-ss", f"{min(1.0, duration / 2):.2f}", "-i", source,
+                "-frames:v", "1", "-q:v", "3", poster_path
+            ], timeout=120)
+
+            prefix = f"videos/{user_id}/{job_id}"
+            uploads = []
+            for directory, _, names in os.walk(hls_dir):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    key = f"{prefix}/hls/{os.path.relpath(path, hls_dir).replace(os.sep, '/')}"
+                    uploads.append(self._upload(path, key))
+            uploads.append(self._upload(poster_path, f"{prefix}/poster.jpg"))
+            await asyncio.gather(*uploads)
+
+            with open(poster_path, "rb") as f:
+                poster_data = f.read()
+
+        poster_key = f"{prefix}/poster.jpg"
+        poster_url = storage.public_url(bucket, poster_key)
+        poster_asset = await get_image_derivative_service().process(bucket, poster_key, poster_url, poster_data)
+
+        return {
+            "master_url": storage.public_url(bucket, f"{prefix}/hls/master.m3u8"),
+            "poster_url": poster_url,
+            "poster_blurhash": poster_asset.get("blurhash") if poster_asset else None,
+            "poster_color": poster_asset.get("dominant_color") if poster_asset else None,
+            "duration": round(duration, 2),
+            "width": width,
+            "height": height,
+            "renditions": renditions,
+        }
+
+    async def _upload(self, path: str, key: str):
+        storage = get_storage_service()
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+        with open(path, "rb") as f:
+            # Every job writes under its own prefix, so all outputs are immutable
+            await storage.upload_file(
+                f, self.settings.AWS_S3_BUCKET, key,
+                content_type=content_type,
+                cache_control=IMMUTABLE_CACHE_CONTROL
+            )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "active": self._active,
+        }
+
+
+def apply_transcode_output(reel: Reel, output: Dict[str, Any]):
+    """Point a reel at its HLS master playlist and poster"""
+    reel.video_url = output["master_url"]
+    reel.thumbnail_url = output["poster_url"]
+    reel.thumbnail_blurhash = output.get("poster_blurhash")
+    reel.thumbnail_color = output.get("poster_color")
+    reel.duration = int(round(output["duration"]))
+
+
+async def attach_reel(db: AsyncSession, reel: Reel) -> Optional[TranscodeJob]:
+    """
+    Link a new reel to the transcode job of its raw upload. If the job already
+    finished the reel is switched to the HLS output straight away; otherwise
+    the worker updates it on completion. Caller commits.
+    """
+    storage = get_storage_service()
+    key = storage.key_for_url(get_settings().AWS_S3_BUCKET, reel.video_url or "")
+    if key is None:
+        return None
+    result = await db.execute(
+        select(TranscodeJob)
+        .where(TranscodeJob.source_key == key, TranscodeJob.user_id == reel.user_id)
+        .with_for_update()
+    )
+    job = result.scalars().first()
+    if job is None:
+        return None
+    job.reel_id = reel.id
+    if job.status == "complete" and job.output:
+        apply_transcode_output(reel, job.output)
+    return job
+
+
+# Singleton instance
+_transcode_service: Optional[TranscodeService] = None
+
+def get_transcode_service() -> TranscodeService:
+    """Get or create transcode service instance"""
+    global _transcode_service
+    if _transcode_service is None:
+        _transcode_service = TranscodeService()
+    return _transcode_service
@@ -0,0 +1,139 @@
+"""
+Trending scores
+Periodic set-based recomputation of trending_score for products, posts and
+reels: each engagement event in the window (likes, comments, reel views,
+paid order quantity, reviews) contributes its weight decayed by age.
+Scores and the top-N trending flag are written back with one UPDATE per
+table, touching only rows whose value changed.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "trending:lock"
+
+# Table -> weighted event sources, each yielding (id, weight, created_at)
+EVENT_SOURCES = {
+    "feed_posts": [
+        "SELECT post_id, 1.0, created_at FROM likes WHERE post_id IS NOT NULL AND created_at > :since",
+        "SELECT post_id, 3.0, created_at FROM comments WHERE post_id IS NOT NULL AND created_at > :since",
+    ],
+    "reels": [
+        "SELECT reel_id, 0.1 * views, hour FROM reel_view_hourly WHERE hour > :since",
+        "SELECT reel_id, 1.0, created_at FROM likes WHERE reel_id IS NOT NULL AND created_at > :since",
+        "SELECT reel_id, 3.0, created_at FROM comments WHERE reel_id IS NOT NULL AND created_at > :since",
+    ],
+    "products": [
+        """SELECT oi.product_id, 5.0 * oi.quantity, o.created_at
+           FROM order_items oi JOIN orders o ON o.id = oi.order_id
+           WHERE o.created_at > :since AND o.payment_status = 'completed'""",
+        "SELECT product_id, 2.0, created_at FROM product_reviews WHERE created_at > :since",
+    ],
+}
+# Tables with a boolean `trending` flag set for the top N scores
+FLAGGED_TABLES = ("products", "reels")
+
+
+class TrendingService:
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def update_scores(self, db: AsyncSession, table: str, now: datetime) -> int:
+        """Recompute one table's scores; rows that fell out of the window go to 0"""
+        params = {
+            "now": now,
+            "since": now - timedelta(hours=self.settings.TRENDING_WINDOW_HOURS),
+            "tau": self.settings.TRENDING_DECAY_HOURS * 3600.0,
+        }
+        result = await db.execute(
+            text(f"""
+                WITH events (id, weight, created_at) AS (
+                    {' UNION ALL '.join(EVENT_SOURCES[table])}
+                ),
+                scores AS (
+                    SELECT id, SUM(weight * EXP(-EXTRACT(EPOCH FROM (CAST(:now AS TIMESTAMP) - created_at)) / CAST(:tau AS DOUBLE PRECISION))) AS score
+                    FROM events
+                    GROUP BY id
+                ),
+                targets AS (
+                    SELECT id FROM scores
+                    UNION
+                    SELECT id FROM {table} WHERE trending_score > 0
+                )
+                UPDATE {table} AS t
+                SET trending_score = COALESCE(s.score, 0)
+                FROM targets
+                LEFT JOIN scores s ON s.id = targets.id
+                WHERE t.id = targets.id
+                  AND t.trending_score IS DISTINCT FROM COALESCE(s.score, 0)
+            """),
+            params
+        )
+        return result.rowcount
+
+    async def update_flags(self, db: AsyncSession, table: str) -> int:
+        """Flag the top N by score (and unflag the rest) in one statement"""
+        result = await db.execute(
+            text(f"""
+                UPDATE {table} AS t
+                SET trending = ranked.flag
+                FROM (
+                    SELECT id, (trending_score > 0 AND ROW_NUMBER() OVER (ORDER BY trending_score DESC) <= :top_n) AS flag
+                    FROM {table}
+                    WHERE trending OR trending_score > 0
+                ) ranked
+                WHERE t.id = ranked.id AND t.trending IS DISTINCT FROM ranked.flag
+            """),
+            {"top_n": self.settings.TRENDING_TOP_N}
+        )
+        return result.rowcount
+
+    async def refresh(self, db: AsyncSession) -> Dict[str, int]:
+        """Recompute every table; returns rows changed per table"""
+        now = datetime.utcnow()
+        changed = {}
+        for table in EVENT_SOURCES:
+            changed[table] = await self.update_scores(db, table, now)
+            if table in FLAGGED_TABLES:
+                changed[table] += await self.update_flags(db, table)
+            await db.commit()
+
+        # Hourly view buckets are only needed for the window
+        await db.execute(
+            text("DELETE FROM reel_view_hourly WHERE hour < :since"),
+            {"since": now - timedelta(hours=self.settings.TRENDING_WINDOW_HOURS + 1)}
+        )
+        await db.commit()
+        logger.info(f"Trending scores refreshed: {changed}")
+        return changed
+
+
+# Singleton instance
+_trending_service: Optional[TrendingService] = None
+
+def get_trending_service() -> TrendingService:
+    """Get or create trending service instance"""
+    global _trending_service
+    if _trending_service is None:
+        _trending_service = TrendingService()
+    return _trending_service
+
+
+async def run_trending_refresh():
+    """Periodic job: recompute trending scores on a single node"""
+    from app.database import AsyncSessionLocal
+
+    settings = get_settings()
+    if not await get_redis().set(LOCK_KEY, "1", nx=True, ex=settings.TRENDING_INTERVAL_SECONDS):
+        return
+    async with AsyncSessionLocal() as db:
+        await get_trending_service().refresh(db)
@@ -0,0 +1,139 @@
+"""
+Author summaries
+Public user cards (username, avatar, verified/artist flags) embedded in
+post, reel and comment responses. A per-request loader coalesces every
+author lookup made while building a response into one Redis MGET and at
+most one users IN query; cards are shared across requests for a short TTL.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.schemas.feed import AuthorSummary
+from app.services.redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+CARD_TTL_SECONDS = 60
+CARD_FIELDS = ("id", "username", "avatar_url", "is_verified", "is_artist")
+
+
+def _card_key(user_id) -> str:
+    return f"user:card:{user_id}"
+
+
+async def invalidate_user_card(user_id):
+    """Drop a cached card after the user changes their public profile"""
+    try:
+        await get_redis().delete(_card_key(user_id))
+    except Exception as e:
+        logger.error(f"User card invalidation failed: {e}")
+
+
+class UserCardLoader:
+    """
+    DataLoader for user cards. load() calls made in the same event loop
+    tick are dispatched as one batch; results are memoised for the request.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.cards: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.pending: Dict[str, asyncio.Future] = {}
+        self._dispatches: Set[asyncio.Task] = set()
+        # Batches dispatched while another is in flight share the session
+        self._lock = asyncio.Lock()
+
+    def load(self, user_id) -> asyncio.Future:
+        user_id = str(user_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if user_id in self.cards:
+            future.set_result(self.cards[user_id])
+            return future
+        if user_id in self.pending:
+            return self.pending[user_id]
+        self.pending[user_id] = future
+        if len(self.pending) == 1:
+            # Runs once the caller yields, by which time the batch is collected
+            task = loop.create_task(self._dispatch())
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+        return future
+
+    async def load_many(self, user_ids: Iterable) -> List[Optional[Dict[str, Any]]]:
+        return list(await asyncio.gather(*(self.load(user_id) for user_id in user_ids)))
+
+    async def attach(self, items: list) -> list:
+        """Set `author` on response objects carrying `user_id`"""
+        cards = await self.load_many(item.user_id for item in items)
+        for item, card in zip(items, cards):
+            item.author = AuthorSummary(**card) if card else None
+        return items
+
+    async def _dispatch(self):
+        batch, self.pending = self.pending, {}
+        try:
+            async with self._lock:
+                cards = await self._fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for user_id, future in batch.items():
+            self.cards[user_id] = cards.get(user_id)
+            if not future.done():
+                future.set_result(self.cards[user_id])
+
+    async def _fetch(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        cards: Dict[str, Dict[str, Any]] = {}
+        redis = get_redis()
+        try:
+            cached = await redis.mget([_card_key(user_id) for user_id in user_ids])
+            for user_id, value in zip(user_ids, cached):
+                if value is not None:
+                    cards[user_id] = json.loads(value)
+        except Exception as e:
+            logger.error(f"User card cache read failed: {e}")
+            redis = None
+
+        missing = [user_id for user_id in user_ids if user_id not in cards]
+        if not missing:
+            return cards
+
+        result = await self.db.execute(
+            text(f"SELECT {', '.join(CARD_FIELDS)} FROM users WHERE id = ANY(:ids)"),
+            {"ids": [UUID(user_id) for user_id in missing]}
+        )
+        fetched = {}
+        for row in result.mappings().all():
+            card = dict(row)
+            card["id"] = str(card["id"])
+            card["is_verified"] = bool(card["is_verified"])
+            card["is_artist"] = bool(card["is_artist"])
+            fetched[card["id"]] = card
+        cards.update(fetched)
+
+        if redis is not None and fetched:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                for user_id, card in fetched.items():
+                    pipe.set(_card_key(user_id), json.dumps(card), ex=CARD_TTL_SECONDS)
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"User card cache write failed: {e}")
+        return cards
+
+
+async def get_user_card_loader(db: AsyncSession = Depends(get_db)) -> UserCardLoader:
+    """Per-request loader (FastAPI caches dependencies within a request)"""
+    return UserCardLoader(db)
@@ -75,15 +75,19 @@ CREATE TABLE products (
   rating FLOAT DEFAULT 0,
   review_count INTEGER DEFAULT 0,
   trending BOOLEAN DEFAULT FALSE,
+  trending_score DOUBLE PRECISION NOT NULL DEFAULT 0,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   is_active BOOLEAN DEFAULT TRUE,
+  makeup_type VARCHAR(50),
+  shade_hex VARCHAR(7),
   embedding vector(384)
 );
 
 CREATE INDEX idx_products_category ON products(category_id);
 CREATE INDEX idx_products_seller ON products(seller_id);
 CREATE INDEX idx_products_embedding ON products USING ivfflat (embedding vector_cosine_ops);
+CREATE INDEX idx_products_trending_score ON products(trending_score DESC) WHERE is_active = TRUE;
 
 CREATE TABLE product_reviews (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -147,6 +151,7 @@ CREATE TABLE feed_posts (
   comment_count INTEGER DEFAULT 0,
   share_count INTEGER DEFAULT 0,
   is_published BOOLEAN DEFAULT TRUE,
+  trending_score DOUBLE PRECISION NOT NULL DEFAULT 0,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   embedding vector(384)
@@ -154,8 +159,19 @@ CREATE TABLE feed_posts (
 
 CREATE INDEX idx_feed_posts_user ON feed_posts(user_id);
 CREATE INDEX idx_feed_posts_created ON feed_posts(created_at DESC);
+CREATE INDEX idx_feed_posts_trending_score ON feed_posts(trending_score DESC) WHERE is_published = TRUE;
 CREATE INDEX idx_feed_posts_embedding ON feed_posts USING ivfflat (embedding vector_cosine_ops);
 
+-- Normalised FeedPost.tags (lowercase, no '#'); created_at copied from the post
+CREATE TABLE post_tags (
+  post_id UUID NOT NULL REFERENCES feed_posts(id) ON DELETE CASCADE,
+  tag VARCHAR(100) NOT NULL,
+  created_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (post_id, tag)
+);
+
+CREATE INDEX idx_post_tags_tag_created ON post_tags(tag, created_at DESC, post_id DESC);
+
 CREATE TABLE reels (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -163,6 +179,8 @@ CREATE TABLE reels (
   description TEXT,
   video_url VARCHAR(500),
   thumbnail_url VARCHAR(500),
+  thumbnail_blurhash VARCHAR(64),
+  thumbnail_color VARCHAR(7),
   duration INTEGER,
   view_count INTEGER DEFAULT 0,
   like_count INTEGER DEFAULT 0,
@@ -170,13 +188,25 @@ CREATE TABLE reels (
   share_count INTEGER DEFAULT 0,
   filters_applied JSONB,
   trending BOOLEAN DEFAULT FALSE,
+  trending_score DOUBLE PRECISION NOT NULL DEFAULT 0,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   embedding vector(384)
 );
 
 CREATE INDEX idx_reels_user ON reels(user_id);
-CREATE INDEX idx_reels_trending ON reels(trending, created_at DESC);
+CREATE INDEX idx_reels_trending_score ON reels(trending_score DESC);
+CREATE INDEX idx_reels_created ON reels(created_at DESC);
+
+-- Reel views per hour (written by the view flush), for trending windows
+CREATE TABLE reel_view_hourly (
+  reel_id UUID NOT NULL REFERENCES reels(id) ON DELETE CASCADE,
+  hour TIMESTAMP NOT NULL,
+  views INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (reel_id, hour)
+);
+
+CREATE INDEX idx_reel_view_hourly_hour ON reel_view_hourly(hour);
 CREATE INDEX idx_reels_embedding ON reels USING ivfflat (embedding vector_cosine_ops);
 
 CREATE TABLE likes (
@@ -208,6 +238,60 @@ CREATE TABLE comments (
   )
 );
 
+-- Counter snapshots already folded into posts/reels (write-behind flush)
+CREATE TABLE counter_flushes (
+  flush_id VARCHAR(32) PRIMARY KEY,
+  table_name VARCHAR(50) NOT NULL,
+  applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_counter_flushes_applied ON counter_flushes(applied_at);
+
+CREATE TABLE follows (
+  follower_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  followee_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (follower_id, followee_id),
+  CHECK (follower_id <> followee_id)
+);
+
+-- ============================================
+-- AI MIRROR TABLES
+-- ============================================
+
+CREATE TABLE mirror_styles (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  style_mode VARCHAR(100) NOT NULL,
+  face_analysis JSONB,
+  recommended_products JSONB DEFAULT '[]',
+  makeup_guide JSONB,
+  ar_overlay_data JSONB,
+  embedding vector(384),
+  is_saved VARCHAR(50) DEFAULT 'draft',
+  encrypted_json_url VARCHAR(500),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_mirror_styles_user ON mirror_styles(user_id, created_at DESC);
+CREATE INDEX idx_mirror_styles_drafts ON mirror_styles(user_id, created_at DESC) WHERE is_saved = 'draft';
+CREATE INDEX idx_mirror_styles_shareable_embedding ON mirror_styles
+  USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64)
+  WHERE is_saved IN ('saved', 'shared');
+
+CREATE TABLE ar_overlays (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  mirror_style_id UUID NOT NULL REFERENCES mirror_styles(id) ON DELETE CASCADE,
+  overlay_type VARCHAR(50) NOT NULL,
+  color_code VARCHAR(7),
+  product_id UUID REFERENCES products(id),
+  intensity INTEGER DEFAULT 100,
+  coordinates JSONB,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================
 -- CHAT & MESSAGING TABLES
 -- ============================================
@@ -309,6 +393,74 @@ CREATE TABLE transactions (
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- ============================================
+-- MEDIA UPLOADS
+-- ============================================
+
+CREATE TABLE media_uploads (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  key VARCHAR(500) NOT NULL,
+  kind VARCHAR(20) NOT NULL,
+  content_type VARCHAR(100) NOT NULL,
+  size BIGINT NOT NULL,
+  sha256 VARCHAR(64),
+  status VARCHAR(20) DEFAULT 'pending',
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  expires_at TIMESTAMP,
+  completed_at TIMESTAMP,
+  asset JSONB
+);
+
+CREATE INDEX idx_media_uploads_user ON media_uploads(user_id, created_at DESC);
+CREATE INDEX idx_media_uploads_pending ON media_uploads(expires_at) WHERE status = 'pending';
+CREATE INDEX idx_media_uploads_key ON media_uploads(key);
+
+-- Content-addressed objects (media/{sha256}); one row per distinct payload
+CREATE TABLE media_objects (
+  sha256 VARCHAR(64) PRIMARY KEY,
+  key VARCHAR(500) NOT NULL UNIQUE,
+  content_type VARCHAR(100) NOT NULL,
+  size BIGINT NOT NULL,
+  ref_count INTEGER NOT NULL DEFAULT 1 CHECK (ref_count >= 0),
+  asset JSONB,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  referenced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  released_at TIMESTAMP
+);
+
+CREATE INDEX idx_media_objects_released ON media_objects(released_at) WHERE ref_count = 0;
+
+CREATE TABLE image_derivative_jobs (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  source_key VARCHAR(500) NOT NULL UNIQUE,
+  size BIGINT NOT NULL,
+  status VARCHAR(20) DEFAULT 'queued',
+  attempts INTEGER DEFAULT 0,
+  error TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP,
+  completed_at TIMESTAMP
+);
+
+CREATE INDEX idx_image_derivative_jobs_claimable ON image_derivative_jobs(created_at) WHERE status IN ('queued', 'processing');
+
+CREATE TABLE transcode_jobs (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  reel_id UUID REFERENCES reels(id) ON DELETE SET NULL,
+  source_key VARCHAR(500) NOT NULL UNIQUE,
+  status VARCHAR(20) DEFAULT 'queued',
+  attempts INTEGER DEFAULT 0,
+  output JSONB,
+  error TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP,
+  completed_at TIMESTAMP
+);
+
+CREATE INDEX idx_transcode_jobs_claimable ON transcode_jobs(created_at) WHERE status IN ('queued', 'processing');
+
 -- ============================================
 -- AUDIT & MODERATION TABLES
 -- ============================================
@@ -346,7 +498,16 @@ CREATE INDEX idx_orders_user ON orders(user_id, created_at DESC);
 CREATE INDEX idx_orders_status ON orders(status);
 CREATE INDEX idx_chat_conversations_user ON chat_conversations(user_1_id);
 CREATE INDEX idx_likes_user ON likes(user_id);
+CREATE INDEX idx_likes_created ON likes USING brin (created_at);
+CREATE INDEX idx_comments_created ON comments USING brin (created_at);
+CREATE INDEX idx_orders_created ON orders USING brin (created_at);
+CREATE INDEX idx_product_reviews_created ON product_reviews USING brin (created_at);
+CREATE INDEX idx_follows_followee ON follows(followee_id, follower_id);
 CREATE INDEX idx_comments_post ON comments(post_id);
+-- Comment threads: keyset pages of top-level comments, replies per parent
+CREATE INDEX idx_comments_post_top ON comments(post_id, created_at DESC, id DESC) WHERE parent_comment_id IS NULL;
+CREATE INDEX idx_comments_reel_top ON comments(reel_id, created_at DESC, id DESC) WHERE parent_comment_id IS NULL;
+CREATE INDEX idx_comments_parent ON comments(parent_comment_id, created_at, id);
 CREATE INDEX idx_audit_logs_user ON audit_logs(user_id, created_at DESC);
 
 -- Add updated_at trigger function
@@ -0,0 +1,101 @@
+"""
+Benchmark the server-side selfie analysis pipeline.
+
+Usage:
+    python scripts/bench_face_analysis.py [fixture_dir] [--workers N] [--rounds N]
+
+With no fixture directory a synthetic set of selfies across the tone range is
+generated, so the benchmark runs without any checked-in images.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.face_analysis_service import analyze_selfie_bytes  # noqa: E402
+
+# Representative skin colours from fair to deep (sRGB)
+SYNTHETIC_TONES = [
+    (241, 214, 196), (232, 190, 160), (208, 160, 122),
+    (182, 128, 92), (141, 93, 63), (96, 62, 42),
+]
+
+
+def synthetic_fixtures(size=(1080, 1440)) -> list:
+    """Phone-sized JPEG selfies: noisy background, hair block, skin ellipse"""
+    rng = np.random.default_rng(7)
+    fixtures = []
+    for tone in SYNTHETIC_TONES:
+        background = rng.integers(0, 255, size=(size[1], size[0], 3), dtype=np.uint8)
+        image = Image.fromarray(background)
+        draw = ImageDraw.Draw(image)
+        w, h = size
+        draw.rectangle([0, 0, w, int(h * 0.15)], fill=(30, 20, 15))
+        draw.ellipse([w * 0.2, h * 0.1, w * 0.8, h * 0.85], fill=tone)
+        draw.ellipse([w * 0.42, h * 0.62, w * 0.58, h * 0.68], fill=(170, 60, 70))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        fixtures.append((f"synthetic_{tone[0]}_{tone[1]}_{tone[2]}.jpg", buffer.getvalue()))
+    return fixtures
+
+
+def load_fixtures(directory: str) -> list:
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(directory, name), "rb") as f:
+                fixtures.append((name, f.read()))
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixture_dir", nargs="?")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-dim", type=int, default=256)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixture_dir) if args.fixture_dir else synthetic_fixtures()
+    if not fixtures:
+        print("No fixture images found")
+        return 1
+
+    # Per-image stage timings (single process)
+    print(f"{'image':40} {'tone':8} {'undertone':9} {'decode':>8} {'sample':>8} {'cluster':>8} {'total':>8}")
+    for name, data in fixtures:
+        result = analyze_selfie_bytes(data, args.max_dim)
+        t = result["timings_ms"]
+        print(
+            f"{name[:40]:40} {result['skin_tone']:8} {result['undertone']:9} "
+            f"{t['decode_ms']:8.2f} {t['sample_ms']:8.2f} {t['cluster_ms']:8.2f} {t['total_ms']:8.2f}"
+        )
+
+    # Throughput through the process pool
+    batch = [data for _, data in fixtures] * args.rounds
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(analyze_selfie_bytes, batch[:args.workers], [args.max_dim] * args.workers))
+        started = time.perf_counter()
+        results = list(pool.map(analyze_selfie_bytes, batch, [args.max_dim] * len(batch)))
+        elapsed = time.perf_counter() - started
+
+    totals = [r["timings_ms"]["total_ms"] for r in results]
+    print()
+    print(f"images: {len(batch)}  workers: {args.workers}  wall: {elapsed:.2f}s  "
+          f"throughput: {len(batch) / elapsed:.1f} img/s")
+    print(f"per-image total ms  p50: {statistics.median(totals):.2f}  "
+          f"p95: {np.percentile(totals, 95):.2f}  max: {max(totals):.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
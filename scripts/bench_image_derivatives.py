@@ -0,0 +1,120 @@
+"""
+Benchmark the image derivative pipeline (decode, orient, resize, encode).
+
+Usage:
+    python scripts/bench_image_derivatives.py [fixture_dir] [--workers N] [--rounds N]
+
+With no fixture directory a synthetic corpus of phone-sized JPEGs (with EXIF
+orientation) and PNGs is generated, so the benchmark runs without any
+checked-in images.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.image_derivative_service import build_derivatives, avif_supported  # noqa: E402
+
+DEFAULT_WIDTHS = [320, 640, 1080]
+
+
+def synthetic_fixtures() -> list:
+    """Smooth gradients plus noise, roughly as compressible as real photos"""
+    rng = np.random.default_rng(11)
+    fixtures = []
+    for i, (w, h) in enumerate([(4032, 3024), (3024, 4032), (1920, 1080), (1200, 1200)]):
+        yy, xx = np.mgrid[:h, :w]
+        base = np.stack([xx * 255 // w, yy * 255 // h, (xx + yy) * 127 // (w + h)], axis=-1)
+        noise = rng.integers(-12, 12, size=(h, w, 3))
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels)
+
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6 if i % 2 else 1  # rotated phone shot
+        exif[0x010F] = "BenchCam"
+        image.save(buffer, format="JPEG", quality=92, exif=exif)
+        fixtures.append((f"synthetic_{w}x{h}.jpg", buffer.getvalue()))
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).convert("RGBA").resize((1200, 1200)).save(buffer, format="PNG")
+    fixtures.append(("synthetic_alpha.png", buffer.getvalue()))
+    return fixtures
+
+
+def load_fixtures(directory: str) -> list:
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(directory, name), "rb") as f:
+                fixtures.append((name, f.read()))
+    return fixtures
+
+
+def _run(data: bytes, widths: list, quality: int, formats: tuple) -> dict:
+    result = build_derivatives(data, widths, quality, formats)
+    return {
+        "timings_ms": result["timings_ms"],
+        "bytes_out": sum(len(v["data"]) for v in result["variants"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixture_dir", nargs="?")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixture_dir) if args.fixture_dir else synthetic_fixtures()
+    if not fixtures:
+        print("No fixture images found")
+        return 1
+    formats = ("webp", "avif") if avif_supported() else ("webp",)
+
+    # Per-image stage timings (single process)
+    print(f"formats: {', '.join(formats)}  widths: {args.widths}")
+    print(f"{'image':32} {'in KB':>8} {'out KB':>8} {'decode':>8} {'encode':>8} {'total':>8}")
+    for name, data in fixtures:
+        result = _run(data, args.widths, args.quality, formats)
+        t = result["timings_ms"]
+        print(
+            f"{name[:32]:32} {len(data) / 1024:8.0f} {result['bytes_out'] / 1024:8.0f} "
+            f"{t['decode_ms']:8.2f} {t['encode_ms']:8.2f} {t['total_ms']:8.2f}"
+        )
+
+    # Throughput through the process pool
+    batch = [data for _, data in fixtures] * args.rounds
+    n = len(batch)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(_run, batch[:args.workers], [args.widths] * args.workers,
+                      [args.quality] * args.workers, [formats] * args.workers))
+        started = time.perf_counter()
+        results = list(pool.map(_run, batch, [args.widths] * n, [args.quality] * n, [formats] * n))
+        elapsed = time.perf_counter() - started
+
+    totals = [r["timings_ms"]["total_ms"] for r in results]
+    bytes_in = sum(len(d) for d in batch)
+    bytes_out = sum(r["bytes_out"] for r in results)
+    print()
+    print(f"images: {n}  workers: {args.workers}  wall: {elapsed:.2f}s  "
+          f"throughput: {n / elapsed:.1f} img/s")
+    print(f"per-image total ms  p50: {statistics.median(totals):.2f}  "
+          f"p95: {np.percentile(totals, 95):.2f}  max: {max(totals):.2f}")
+    print(f"bytes in: {bytes_in / 1e6:.1f} MB  all variants out: {bytes_out / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
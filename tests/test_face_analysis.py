@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services.face_analysis_service import (
+    AnalysisQueueFullError,
+    FaceAnalysisService,
+    analyze_selfie_bytes,
+    srgb_to_lab,
+)
+from app.services.shade_index import ciede2000
+
+
+def _selfie(skin, size=(400, 500), fmt="JPEG") -> bytes:
+    """A skin-coloured face ellipse on a blue background"""
+    image = Image.new("RGB", size, (30, 60, 160))
+    w, h = size
+    ImageDraw.Draw(image).ellipse((w * 0.2, h * 0.12, w * 0.8, h * 0.84), fill=skin)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=95)
+    return buffer.getvalue()
+
+
+def test_srgb_to_lab_known_colours():
+    lab = srgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]]))
+    assert lab[0] == pytest.approx([100.0, 0.0, 0.0], abs=0.1)
+    assert lab[1] == pytest.approx([0.0, 0.0, 0.0], abs=0.1)
+    assert lab[2] == pytest.approx([53.24, 80.09, 67.20], abs=0.1)
+
+
+@pytest.mark.parametrize("skin,tone", [
+    ((241, 214, 196), "fair"),
+    ((224, 172, 140), "light"),
+    ((141, 85, 54), "dark"),
+    ((90, 56, 37), "deep"),
+])
+def test_analyze_selfie_measures_the_face(skin, tone):
+    result = analyze_selfie_bytes(_selfie(skin), max_dim=256)
+
+    assert result["skin_tone"] == tone
+    expected = srgb_to_lab(np.array([skin]))[0]
+    assert ciede2000(expected, np.array([result["skin_lab"]]))[0] < 2.0
+    # Downscaled to fit max_dim, aspect ratio kept
+    assert result["image_size"] == [205, 256]
+    assert result["sampled_pixels"] > 0
+
+
+def test_undertone_follows_hue():
+    assert analyze_selfie_bytes(_selfie((241, 214, 196)))["undertone"] == "warm"
+    assert analyze_selfie_bytes(_selfie((230, 160, 170)))["undertone"] == "cool"
+
+
+@pytest.mark.asyncio
+async def test_service_runs_in_the_pool_and_records_metrics():
+    service = FaceAnalysisService()
+    try:
+        result = await service.analyze(_selfie((224, 172, 140), fmt="PNG"))
+    finally:
+        service.shutdown()
+
+    assert result["skin_tone"] == "light"
+    assert "queue_wait_ms" in result["timings_ms"]
+    metrics = service.get_metrics()
+    assert metrics["processed"] == 1
+    assert metrics["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_service_rejects_when_the_queue_is_full():
+    service = FaceAnalysisService()
+    service.max_queue = 0
+    with pytest.raises(AnalysisQueueFullError):
+        await service.analyze(_selfie((224, 172, 140)))
+    assert service.get_metrics()["rejected"] == 1
@@ -0,0 +1,196 @@
+import re
+from uuid import uuid4
+
+import pytest
+
+from app.services.follow_service import (
+    CELEBRITIES_KEY,
+    FollowService,
+    _followers_key,
+    _outbox_key,
+    _timeline_key,
+)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeFollowDB:
+    """The follows table and post/reel rows, answering the follow service's SQL"""
+
+    def __init__(self):
+        self.follows = set()
+        self.items = []  # (table, id, user_id, created_at epoch)
+
+    def add(self, table, user_id, created_at):
+        item_id = str(uuid4())
+        self.items.append((table, item_id, str(user_id), float(created_at)))
+        return item_id
+
+    def _followees(self, user_id):
+        return {b for a, b in self.follows if a == str(user_id)}
+
+    def _newest(self, table, authors, limit):
+        rows = sorted((i for i in self.items if i[0] == table and i[2] in authors), key=lambda i: -i[3])
+        return [(i[1], i[3]) for i in rows[:limit]]
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        params = params or {}
+        pair = (str(params.get("follower_id")), str(params.get("followee_id")))
+        if sql.startswith("INSERT INTO follows"):
+            if pair in self.follows:
+                return _Result([])
+            self.follows.add(pair)
+            return _Result([(pair[0],)])
+        if sql.startswith("DELETE FROM follows"):
+            if pair not in self.follows:
+                return _Result([])
+            self.follows.discard(pair)
+            return _Result([(pair[0],)])
+        if sql.startswith("SELECT follower_id FROM follows"):
+            return _Result([(a,) for a, b in self.follows if b == str(params["user_id"])])
+        if sql.startswith("SELECT followee_id FROM follows WHERE"):
+            return _Result([(b,) for b in self._followees(params["user_id"])])
+        if "HAVING COUNT(*) >" in sql:
+            counts = {}
+            for _, b in self.follows:
+                counts[b] = counts.get(b, 0) + 1
+            return _Result([(b,) for b, n in counts.items() if n > params["threshold"]])
+        table = re.search(r"FROM (feed_posts|reels)", sql).group(1)
+        if "user_id IN (SELECT followee_id" in sql:
+            return _Result(self._newest(table, self._followees(params["user_id"]), params["limit"]))
+        return _Result(self._newest(table, {str(params["author_id"])}, params["limit"]))
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class _SessionFactory:
+    """Stands in for AsyncSessionLocal in publish()"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def db(monkeypatch):
+    import app.database
+
+    db = FakeFollowDB()
+    monkeypatch.setattr(app.database, "AsyncSessionLocal", _SessionFactory(db))
+    return db
+
+
+@pytest.fixture
+def follows(redis):
+    return FollowService()
+
+
+async def _post(follows, db, author_id, created_at):
+    item_id = db.add("feed_posts", author_id, created_at)
+    await follows.publish("posts", author_id, item_id, _utc(created_at))
+    return item_id
+
+
+def _utc(epoch):
+    from datetime import datetime
+
+    return datetime.utcfromtimestamp(epoch)
+
+
+@pytest.mark.asyncio
+async def test_follow_backfills_and_publish_fans_out(follows, db):
+    reader, author = uuid4(), uuid4()
+    old = db.add("feed_posts", author, 1000)
+
+    assert await follows.follow(db, reader, author) is True
+    assert await follows.follow(db, reader, author) is False
+    assert await follows.timeline_ids(db, "posts", reader, None, 10) == [old]
+
+    new = await _post(follows, db, author, 2000)
+    assert await follows.timeline_ids(db, "posts", reader, None, 10) == [new, old]
+    assert await follows.timeline_ids(db, "posts", reader, 2000, 10) == [old]
+    assert await follows.counts(db, author) == (1, 0)
+    assert await follows.is_following(db, reader, author)
+
+
+@pytest.mark.asyncio
+async def test_unfollow_after_the_outbox_expired(follows, db, redis):
+    reader, author, other = uuid4(), uuid4(), uuid4()
+    old_posts = [db.add("feed_posts", author, t) for t in (1000, 1100, 1200)]
+    kept = db.add("feed_posts", other, 1300)
+    await follows.follow(db, reader, author)
+    await follows.follow(db, reader, other)
+    assert set(await follows.timeline_ids(db, "posts", reader, None, 10)) == {*old_posts, kept}
+
+    # The author's outbox ages out; the next publish starts a partial one
+    # holding only the new post, while the reader's timeline stays warm
+    await redis.delete(_outbox_key("posts", author))
+    new = await _post(follows, db, author, 2000)
+    assert await redis.zrange(_outbox_key("posts", author), 0, -1) == [new]
+
+    assert await follows.unfollow(db, reader, author) is True
+
+    assert await follows.timeline_ids(db, "posts", reader, None, 10) == [kept]
+    assert not await follows.is_following(db, reader, author)
+
+
+@pytest.mark.asyncio
+async def test_celebrities_are_merged_on_read(follows, db, redis, settings, monkeypatch):
+    monkeypatch.setattr(settings, "FOLLOW_CELEBRITY_THRESHOLD", 1)
+    fans, star = [uuid4(), uuid4()], uuid4()
+    for fan in fans:
+        await follows.follow(db, fan, star)
+    assert str(star) in await redis.smembers(CELEBRITIES_KEY)
+
+    post = await _post(follows, db, star, 3000)
+
+    # Not fanned out on write, but every fan sees it
+    assert not await redis.exists(*[_timeline_key("posts", fan) for fan in fans])
+    for fan in fans:
+        assert await follows.timeline_ids(db, "posts", fan, None, 10) == [post]
+
+
+@pytest.mark.asyncio
+async def test_keys_expire_and_writes_do_not_extend_them(follows, db, redis, settings):
+    ttl = settings.FOLLOW_CACHE_TTL_SECONDS
+    reader, author = uuid4(), uuid4()
+    await follows.follow(db, reader, author)
+    await follows.timeline_ids(db, "posts", reader, None, 10)
+
+    timeline = _timeline_key("posts", reader)
+    assert 0 < await redis.ttl(timeline) <= ttl
+    assert 0 < await redis.ttl(_followers_key(author)) <= ttl
+
+    # A write keeps the remaining lifetime; only a read refreshes it
+    await redis.expire(timeline, 60)
+    await _post(follows, db, author, 2000)
+    assert await redis.ttl(timeline) <= 60
+    await follows.timeline_ids(db, "posts", reader, None, 10)
+    assert await redis.ttl(timeline) > 60
+
+    # Fan-out into a follower with no cached timeline leaves a partial key that still expires
+    await redis.delete(timeline)
+    await _post(follows, db, author, 3000)
+    assert 0 < await redis.ttl(timeline) <= ttl
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_placeholder import _encode83, compute_placeholder, dominant_color, encode_blurhash
+
+
+def _reference_blurhash(pixels, x_components, y_components):
+    """Straight per-pixel port of the reference blurhash encoder"""
+    height, width, _ = pixels.shape
+
+    def to_linear(value):
+        v = value / 255.0
+        return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+    def to_srgb(value):
+        v = max(0.0, min(1.0, value))
+        return int(v * 12.92 * 255 + 0.5) if v <= 0.0031308 else int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+    def sign_pow(value, exp):
+        return math.copysign(abs(value) ** exp, value)
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1.0 if i == 0 and j == 0 else 2.0
+            r = g = b = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * math.cos(math.pi * j * y / height)
+                    r += basis * to_linear(pixels[y, x, 0])
+                    g += basis * to_linear(pixels[y, x, 1])
+                    b += basis * to_linear(pixels[y, x, 2])
+            scale = 1.0 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        result += _encode83(0, 1)
+    result += _encode83((to_srgb(dc[0]) << 16) + (to_srgb(dc[1]) << 8) + to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (int(max(0, min(18, math.floor(sign_pow(v / max_value, 0.5) * 9 + 9.5)))) for v in factor)
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+@pytest.mark.parametrize("components", [(4, 3), (3, 4), (1, 1), (5, 2)])
+def test_blurhash_matches_reference_encoder(components):
+    pixels = np.random.default_rng(7).integers(0, 256, size=(12, 16, 3), dtype=np.uint8)
+    assert encode_blurhash(pixels, *components) == _reference_blurhash(pixels, *components)
+
+
+def test_blurhash_of_a_solid_colour():
+    pixels = np.full((8, 8, 3), (255, 0, 0), dtype=np.uint8)
+    blurhash = encode_blurhash(pixels, 4, 3)
+    # Size flag, AC maximum, then the DC term carries the colour itself
+    assert blurhash[0] == "L"
+    assert blurhash[2:6] == _encode83(0xFF0000, 4)
+    assert len(blurhash) == 4 + 2 * 4 * 3
+
+
+def test_dominant_color_ignores_transparent_pixels():
+    pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+    pixels[:3] = (0, 0, 255)
+    pixels[3] = (250, 10, 10)
+    alpha = np.zeros((4, 4), dtype=np.uint8)
+    alpha[3] = 255
+
+    assert dominant_color(pixels) == "#0000FF"
+    assert dominant_color(pixels, alpha) == "#FA0A0A"
+
+
+def test_compute_placeholder_follows_aspect_ratio():
+    wide = compute_placeholder(Image.new("RGB", (300, 100), (20, 120, 40)))
+    tall = compute_placeholder(Image.new("RGBA", (100, 300), (20, 120, 40, 255)))
+
+    # First character encodes the component grid: 4x3 landscape, 3x4 portrait
+    assert wide["blurhash"][0] == _encode83(3 + 2 * 9, 1)
+    assert tall["blurhash"][0] == _encode83(2 + 3 * 9, 1)
+    assert wide["dominant_color"] == tall["dominant_color"] == "#147828"
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from starlette.requests import Request
+
+from app.services.media_ingest_service import (
+    MalformedUploadError,
+    UnsupportedMediaTypeError,
+    UploadTooLargeError,
+    file_chunks,
+    multipart_file_chunks,
+    read_upload,
+    sniff_content_type,
+    stream_upload,
+    stream_uploads,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 20
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 1000
+IMAGES = {"image/png", "image/jpeg"}
+
+
+def _upload(data: bytes, filename: str = "file") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+BOUNDARY = "----test-boundary"
+
+
+def _form(fields: dict, files: dict) -> bytes:
+    body = b""
+    for name, value in fields.items():
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n".encode()
+            + value + b"\r\n"
+        )
+    for name, data in files.items():
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{name}.bin\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n".encode()
+            + data + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class _Body:
+    """An ASGI request body delivered in small pieces, counting what was read"""
+
+    def __init__(self, body: bytes, piece: int = 700):
+        self.pieces = [body[i:i + piece] for i in range(0, len(body), piece)]
+        self.received = 0
+
+    async def __call__(self):
+        chunk = self.pieces[self.received]
+        self.received += 1
+        return {"type": "http.request", "body": chunk, "more_body": self.received < len(self.pieces)}
+
+
+def _request(body: _Body, content_type: str = f"multipart/form-data; boundary={BOUNDARY}") -> Request:
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, body)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(settings, monkeypatch):
+    # Several chunks per file so limits are checked mid-stream
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+
+
+@pytest.mark.parametrize("head,expected", [
+    (b"\xff\xd8\xff\xdb", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"\x1a\x45\xdf\xa3", "video/webm"),
+    (b"\x00\x00\x00\x18ftypmp42", "video/mp4"),
+    (b"\x00\x00\x00\x14ftypqt  ", "video/quicktime"),
+    (b"<svg xmlns=", None),
+])
+def test_sniff_content_type(head, expected):
+    assert sniff_content_type(head) == expected
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_writes_the_sniffed_type(local_storage):
+    result = await stream_upload(file_chunks(_upload(PNG, "photo.jpg")), "posts/abc", IMAGES, max_size=len(PNG))
+
+    assert result["key"] == "posts/abc.png"
+    assert result["type"] == "image/png"
+    assert result["size"] == len(PNG)
+    assert result["sha256"] == hashlib.sha256(PNG).hexdigest()
+    with open(local_storage.local_path(result["key"]), "rb") as f:
+        assert f.read() == PNG
+    assert (await local_storage.head_object("bucket", result["key"]))["content_type"] == "image/png"
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_over_the_limit_leaves_nothing_behind(local_storage):
+    with pytest.raises(UploadTooLargeError):
+        await stream_upload(file_chunks(_upload(PNG)), "posts/big", IMAGES, max_size=len(PNG) - 1)
+
+    assert await local_storage.head_object("bucket", "posts/big.png") is None
+    assert not [name for _, _, names in os.walk(local_storage.root) for name in names]
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_rejects_unsniffable_content(local_storage):
+    with pytest.raises(UnsupportedMediaTypeError):
+        await stream_upload(file_chunks(_upload(b"<svg></svg>")), "posts/x", IMAGES, max_size=1024)
+    with pytest.raises(UnsupportedMediaTypeError):
+        await stream_upload(file_chunks(_upload(b"GIF89a" + b"\x00" * 10)), "posts/x", IMAGES, max_size=1024)
+    assert await local_storage.list_files("bucket") == []
+
+
+@pytest.mark.asyncio
+async def test_read_upload_applies_the_same_limits():
+    result = await read_upload(_upload(JPEG), IMAGES, max_size=len(JPEG))
+    assert result["data"] == JPEG
+    assert result["type"] == "image/jpeg"
+
+    with pytest.raises(UploadTooLargeError):
+        await read_upload(_upload(PNG), IMAGES, max_size=1500)
+    with pytest.raises(UnsupportedMediaTypeError):
+        await read_upload(_upload(b""), IMAGES, max_size=1500)
+
+
+@pytest.mark.asyncio
+async def test_stream_uploads_reports_per_file_results(local_storage):
+    files = [_upload(PNG, "a.png"), _upload(b"nope", "b.txt"), _upload(JPEG, "c.jpg")]
+
+    async def upload(file):
+        return await stream_upload(file_chunks(file), f"batch/{file.filename}", IMAGES, max_size=len(PNG))
+
+    results = await stream_uploads(files, upload, concurrency=2)
+
+    assert [r["filename"] for r in results] == ["a.png", "b.txt", "c.jpg"]
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[1]["error"] == "Unsupported media type: unknown"
+
+
+@pytest.mark.asyncio
+async def test_multipart_body_streams_only_the_file_field(local_storage):
+    body = _Body(_form({"caption": b"x" * 2000}, {"other": JPEG, "file": PNG}))
+    chunks = multipart_file_chunks(_request(body), "file")
+
+    result = await stream_upload(chunks, "videos/abc", IMAGES, max_size=len(PNG))
+
+    assert result["type"] == "image/png"
+    assert result["sha256"] == hashlib.sha256(PNG).hexdigest()
+    with open(local_storage.local_path(result["key"]), "rb") as f:
+        assert f.read() == PNG
+
+
+@pytest.mark.asyncio
+async def test_oversized_multipart_body_is_cut_off_mid_transfer(local_storage):
+    body = _Body(_form({}, {"file": PNG * 10}))
+
+    with pytest.raises(UploadTooLargeError):
+        await stream_upload(multipart_file_chunks(_request(body), "file"), "videos/big", IMAGES, max_size=len(PNG))
+
+    # Stopped reading shortly after the limit, not at the end of the body
+    assert body.received < len(body.pieces) / 2
+    assert not [name for _, _, names in os.walk(local_storage.root) for name in names]
+
+
+@pytest.mark.asyncio
+async def test_multipart_body_without_the_file_field(local_storage):
+    with pytest.raises(MalformedUploadError):
+        async for _ in multipart_file_chunks(_request(_Body(_form({"file": PNG}, {}))), "file"):
+            pass
+    with pytest.raises(MalformedUploadError):
+        async for _ in multipart_file_chunks(_request(_Body(PNG), "application/octet-stream"), "file"):
+            pass
@@ -0,0 +1,160 @@
+import importlib.util
+import io
+from pathlib import Path
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+
+from app.services import local_media_service
+from app.services.local_media_service import LocalMediaService, RangeNotSatisfiable, parse_range
+
+
+def _load_media_api():
+    """app.api's __init__ imports every router; load only the media one"""
+    path = Path(__file__).resolve().parents[1] / "app" / "api" / "media.py"
+    spec = importlib.util.spec_from_file_location("media_api_under_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+media = _load_media_api()
+
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("items=0-1", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=0-1,5-9", None),
+    ("bytes=abc-def", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1200", "bytes=50-10", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+@pytest.fixture
+def media_service(monkeypatch):
+    service = LocalMediaService()
+    monkeypatch.setattr(local_media_service, "_local_media_service", service)
+    yield service
+    service.shutdown()
+
+
+@pytest_asyncio.fixture
+async def stored(local_storage):
+    await local_storage.upload_file(
+        io.BytesIO(BODY), "bucket", "images/a.bin",
+        content_type="image/webp", cache_control="public, max-age=31536000, immutable"
+    )
+    return "/uploads/images/a.bin"
+
+
+@pytest_asyncio.fixture
+async def client(media_service):
+    app = FastAPI()
+    app.include_router(media.router)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_full_body_with_stored_headers(client, stored):
+    response = await client.get(stored)
+
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.headers["etag"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mmap_max_bytes", [1024 * 1024, 0])
+async def test_range_from_mmap_and_stream(client, stored, media_service, mmap_max_bytes):
+    media_service.mmap_max_bytes = mmap_max_bytes
+    response = await client.get(stored, headers={"Range": "bytes=100-299"})
+
+    assert response.status_code == 206
+    assert response.content == BODY[100:300]
+    assert response.headers["content-range"] == f"bytes 100-299/{len(BODY)}"
+    assert response.headers["content-length"] == "200"
+
+
+@pytest.mark.asyncio
+async def test_head_sends_no_body(client, stored):
+    response = await client.head(stored, headers={"Range": "bytes=-10"})
+
+    assert response.status_code == 206
+    assert response.content == b""
+    assert response.headers["content-length"] == "10"
+
+
+@pytest.mark.asyncio
+async def test_if_range_matching_etag_serves_the_range(client, stored):
+    etag = (await client.head(stored)).headers["etag"]
+    response = await client.get(stored, headers={"Range": "bytes=0-9", "If-Range": etag})
+
+    assert response.status_code == 206
+    assert response.content == BODY[:10]
+
+
+@pytest.mark.asyncio
+async def test_stale_if_range_serves_the_full_body(client, stored):
+    response = await client.get(stored, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+@pytest.mark.asyncio
+async def test_if_none_match_returns_304(client, stored):
+    etag = (await client.head(stored)).headers["etag"]
+
+    response = await client.get(stored, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert (await client.get(stored, headers={"If-None-Match": "*"})).status_code == 304
+    assert (await client.get(stored, headers={"If-None-Match": '"other"'})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_unsatisfiable_range_returns_416(client, stored):
+    response = await client.get(stored, headers={"Range": f"bytes={len(BODY)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+@pytest.mark.asyncio
+async def test_accel_redirect_hands_off_the_body(client, stored, media_service, monkeypatch):
+    monkeypatch.setattr(media_service.settings, "STORAGE_LOCAL_ACCEL_REDIRECT", "/_media/")
+    response = await client.get(stored)
+
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/_media/images/a.bin"
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/uploads/images/a.bin.meta", "/uploads/missing.bin", "/uploads/../secret"])
+async def test_hidden_and_missing_keys_are_404(client, stored, path):
+    assert (await client.get(path)).status_code == 404
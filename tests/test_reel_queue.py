@@ -0,0 +1,115 @@
+from uuid import uuid4
+
+import pytest
+
+from app.services.reel_queue_service import ReelQueueService, _queue_key, _refill_lock_key
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeReelDB:
+    """Returns reel ids in ranking order for the refill and fallback queries"""
+
+    def __init__(self, reel_ids):
+        self.reel_ids = reel_ids
+        self.queries = []
+
+    async def execute(self, statement, params=None):
+        self.queries.append(str(statement))
+        limit = params.get("limit", len(self.reel_ids))
+        return _Result([(reel_id,) for reel_id in self.reel_ids[:limit]])
+
+
+@pytest.fixture
+def queue(redis, settings, monkeypatch):
+    monkeypatch.setattr(settings, "REEL_QUEUE_LENGTH", 20)
+    # No background refills: they open their own database session
+    monkeypatch.setattr(settings, "REEL_QUEUE_LOW_WATER", 0)
+    return ReelQueueService()
+
+
+def test_bloom_offsets_are_deterministic_and_in_range(queue, settings):
+    bits = queue._bits("reel-1")
+    assert bits == queue._bits("reel-1")
+    assert len(bits) == settings.REEL_SEEN_BLOOM_HASHES
+    assert all(0 <= bit < settings.REEL_SEEN_BLOOM_BITS for bit in bits)
+    assert bits != queue._bits("reel-2")
+
+
+@pytest.mark.asyncio
+async def test_seen_has_no_false_negatives_and_few_false_positives(queue):
+    user_id = uuid4()
+    seen_ids = [str(uuid4()) for _ in range(500)]
+    await queue.mark_seen(user_id, seen_ids)
+
+    assert all(await queue.seen(user_id, seen_ids))
+    unseen = await queue.seen(user_id, [str(uuid4()) for _ in range(1000)])
+    assert sum(unseen) / len(unseen) < 0.01
+    # Filters are per user
+    assert not any(await queue.seen(uuid4(), seen_ids[:100]))
+
+
+@pytest.mark.asyncio
+async def test_seen_fades_after_two_generations(queue, monkeypatch):
+    user_id = uuid4()
+    generation = queue._generation()
+    await queue.mark_seen(user_id, ["reel-1"])
+
+    monkeypatch.setattr(queue, "_generation", lambda: generation + 1)
+    assert await queue.seen(user_id, ["reel-1"]) == [True]
+    monkeypatch.setattr(queue, "_generation", lambda: generation + 2)
+    assert await queue.seen(user_id, ["reel-1"]) == [False]
+
+
+@pytest.mark.asyncio
+async def test_next_ids_never_repeats_a_reel(queue, redis):
+    user_id = uuid4()
+    reel_ids = [str(uuid4()) for _ in range(50)]
+    db = FakeReelDB(reel_ids)
+
+    served = []
+    for _ in range(6):
+        served.extend(await queue.next_ids(db, user_id, 10))
+
+    assert served == reel_ids
+    assert await queue.next_ids(db, user_id, 10) == []
+    assert not await redis.exists(_refill_lock_key(user_id))
+
+
+@pytest.mark.asyncio
+async def test_refill_skips_reels_seen_on_another_device(queue, redis):
+    user_id = uuid4()
+    reel_ids = [str(uuid4()) for _ in range(10)]
+    await queue.mark_seen(user_id, reel_ids[:4])
+
+    assert await queue.refill(FakeReelDB(reel_ids), user_id) == 6
+    assert await redis.lrange(_queue_key(user_id), 0, -1) == reel_ids[4:]
+
+
+@pytest.mark.asyncio
+async def test_refill_leaves_another_workers_lock_alone(queue, redis):
+    user_id = uuid4()
+    await redis.set(_refill_lock_key(user_id), "other-worker", ex=30)
+
+    assert await queue.refill(FakeReelDB([str(uuid4())]), user_id) == 0
+    assert await redis.get(_refill_lock_key(user_id)) == "other-worker"
+
+
+@pytest.mark.asyncio
+async def test_next_ids_falls_back_to_the_database_without_redis(queue, monkeypatch):
+    class DownRedis:
+        def pipeline(self, **kwargs):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr("app.services.reel_queue_service.get_redis", lambda: DownRedis())
+    reel_ids = [str(uuid4()) for _ in range(10)]
+    db = FakeReelDB(reel_ids)
+
+    assert await queue.next_ids(db, uuid4(), 3) == reel_ids[:3]
+    assert "ORDER BY trending_score DESC, created_at DESC" in db.queries[-1]
@@ -0,0 +1,141 @@
+import os
+from uuid import uuid4
+
+import pytest
+
+from app.services import resumable_upload_service
+from app.services.media_ingest_service import UnsupportedMediaTypeError, UploadTooLargeError
+from app.services.resumable_upload_service import (
+    ResumableUploadService,
+    UploadLockedError,
+    UploadOffsetMismatchError,
+)
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 64
+VIDEO_TYPES = {"video/mp4", "video/webm", "video/quicktime"}
+USER_ID = uuid4()
+
+
+async def _body(data: bytes, chunk_size: int = 1000, fail_after: int = None):
+    """Request body as the ASGI stream yields it; optionally drops the connection"""
+    sent = 0
+    for start in range(0, len(data), chunk_size):
+        if fail_after is not None and sent >= fail_after:
+            raise ConnectionResetError("client disconnected")
+        chunk = data[start:start + chunk_size]
+        sent += len(chunk)
+        yield chunk
+
+
+@pytest.fixture
+def service(redis, local_storage):
+    return ResumableUploadService()
+
+
+def _part_files(storage):
+    return [name for _, _, names in os.walk(storage.root) for name in names if name.endswith(".part")]
+
+
+@pytest.mark.asyncio
+async def test_single_request_upload(service, local_storage):
+    session = await service.create(USER_ID, len(VIDEO), {"filename": "a.mp4"}, f"videos/{USER_ID}")
+    session = await service.append(session, 0, _body(VIDEO), VIDEO_TYPES)
+
+    assert session["offset"] == len(VIDEO)
+    assert session["result"]["type"] == "video/mp4"
+    assert session["result"]["key"].endswith(".mp4")
+    with open(local_storage.local_path(session["key"]), "rb") as f:
+        assert f.read() == VIDEO
+
+
+@pytest.mark.asyncio
+async def test_interrupted_upload_resumes_from_the_committed_offset(service, local_storage):
+    session = await service.create(USER_ID, len(VIDEO), {}, f"videos/{USER_ID}")
+
+    with pytest.raises(ConnectionResetError):
+        await service.append(session, 0, _body(VIDEO, fail_after=5000), VIDEO_TYPES)
+
+    stored = await service.get(session["id"], USER_ID)
+    assert stored["offset"] == 5000
+    assert stored["result"] is None
+
+    # A client that lost track of the offset is told where to resume (409 in the API)
+    with pytest.raises(UploadOffsetMismatchError) as mismatch:
+        await service.append(stored, 0, _body(VIDEO), VIDEO_TYPES)
+    assert mismatch.value.offset == 5000
+
+    session = await service.append(stored, 5000, _body(VIDEO[5000:]), VIDEO_TYPES)
+    assert session["offset"] == len(VIDEO)
+    with open(local_storage.local_path(session["key"]), "rb") as f:
+        assert f.read() == VIDEO
+    assert _part_files(local_storage) == []
+
+
+@pytest.mark.asyncio
+async def test_completed_upload_is_idempotent(service):
+    session = await service.create(USER_ID, len(VIDEO), {}, f"videos/{USER_ID}")
+    await service.append(session, 0, _body(VIDEO), VIDEO_TYPES)
+
+    again = await service.append(await service.get(session["id"], USER_ID), len(VIDEO), _body(b""), VIDEO_TYPES)
+    assert again["result"]["size"] == len(VIDEO)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_patch_is_locked_out(service, redis):
+    session = await service.create(USER_ID, len(VIDEO), {}, f"videos/{USER_ID}")
+    await redis.set(f"{service._key(session['id'])}:lock", "other-request")
+
+    with pytest.raises(UploadLockedError):
+        await service.append(session, 0, _body(VIDEO), VIDEO_TYPES)
+    # Someone else's lock is never released by the loser
+    assert await redis.get(f"{service._key(session['id'])}:lock") == "other-request"
+
+
+@pytest.mark.asyncio
+async def test_lost_lock_stops_before_writing_more(service, redis, local_storage, monkeypatch):
+    monkeypatch.setattr(resumable_upload_service, "LOCK_REFRESH_SECONDS", 0)
+    session = await service.create(USER_ID, len(VIDEO), {}, f"videos/{USER_ID}")
+    lock_key = f"{service._key(session['id'])}:lock"
+
+    async def stolen_after_first_chunk():
+        yield VIDEO[:1000]
+        # Our lock expired and another request took it over
+        await redis.set(lock_key, "other-request")
+        yield VIDEO[1000:2000]
+
+    with pytest.raises(UploadLockedError):
+        await service.append(session, 0, stolen_after_first_chunk(), VIDEO_TYPES)
+    assert await redis.get(lock_key) == "other-request"
+    assert (await service.get(session["id"], USER_ID))["offset"] == 0
+
+
+@pytest.mark.asyncio
+async def test_body_past_the_declared_length_is_rejected(service):
+    session = await service.create(USER_ID, 3000, {}, f"videos/{USER_ID}")
+
+    with pytest.raises(UploadTooLargeError):
+        await service.append(session, 0, _body(VIDEO[:4000]), VIDEO_TYPES)
+    assert (await service.get(session["id"], USER_ID))["offset"] == 3000
+
+
+@pytest.mark.asyncio
+async def test_non_video_is_rejected_before_storage(service, local_storage):
+    session = await service.create(USER_ID, 2000, {}, f"videos/{USER_ID}")
+
+    with pytest.raises(UnsupportedMediaTypeError):
+        await service.append(session, 0, _body(b"\x89PNG\r\n\x1a\n" + b"\x00" * 1992), VIDEO_TYPES)
+    assert await local_storage.list_files("bucket") == []
+
+
+@pytest.mark.asyncio
+async def test_terminate_drops_the_partial_object(service, local_storage):
+    session = await service.create(USER_ID, len(VIDEO), {}, f"videos/{USER_ID}")
+    with pytest.raises(ConnectionResetError):
+        await service.append(session, 0, _body(VIDEO, fail_after=3000), VIDEO_TYPES)
+    assert len(_part_files(local_storage)) == 1
+
+    await service.terminate(await service.get(session["id"], USER_ID))
+
+    assert _part_files(local_storage) == []
+    with pytest.raises(resumable_upload_service.UploadSessionNotFoundError):
+        await service.get(session["id"], USER_ID)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.shade_index import ShadeIndex, ciede2000, hex_to_lab
+
+
+# Reference pairs from Sharma, Wu & Dalal (2005), Table 1
+SHARMA_PAIRS = [
+    ((50.0, 2.6772, -79.7751), (50.0, 0.0, -82.7485), 2.0425),
+    ((50.0, 3.1571, -77.2803), (50.0, 0.0, -82.7485), 2.8615),
+    ((50.0, -1.3802, -84.2814), (50.0, 0.0, -82.7485), 1.0000),
+    ((50.0, 2.5, 0.0), (50.0, 0.0, -2.5), 4.3065),
+    ((50.0, 2.5, 0.0), (73.0, 25.0, -18.0), 27.1492),
+    ((50.0, 2.5, 0.0), (50.0, 3.2592, 0.3350), 1.0000),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((22.7233, 20.0904, -46.6940), (23.0331, 14.9730, -42.5619), 2.0373),
+    ((2.0776, 0.0795, -1.1350), (0.9033, -0.0636, -0.5514), 0.9082),
+]
+
+
+@pytest.mark.parametrize("reference,candidate,expected", SHARMA_PAIRS)
+def test_ciede2000_matches_reference_pairs(reference, candidate, expected):
+    distance = ciede2000(np.array(reference), np.array([candidate]))[0]
+    assert distance == pytest.approx(expected, abs=1e-4)
+
+
+def test_ciede2000_is_vectorized_and_symmetric():
+    reference = np.array(SHARMA_PAIRS[4][0])
+    candidates = np.array([pair[1] for pair in SHARMA_PAIRS])
+    forward = ciede2000(reference, candidates)
+    backward = [ciede2000(c, reference[None, :])[0] for c in candidates]
+    assert forward.shape == (len(SHARMA_PAIRS),)
+    assert forward == pytest.approx(backward, abs=1e-6)
+    assert ciede2000(reference, reference[None, :])[0] == pytest.approx(0.0)
+
+
+class _Product:
+    def __init__(self, product_id, makeup_type, shade_hex, stock_quantity=10, is_active=True):
+        self.id = product_id
+        self.makeup_type = makeup_type
+        self.shade_hex = shade_hex
+        self.stock_quantity = stock_quantity
+        self.is_active = is_active
+
+
+def test_nearest_ranks_in_stock_shades():
+    index = ShadeIndex()
+    index.upsert_product(_Product("red", "lipstick", "#C0392B"))
+    index.upsert_product(_Product("pink", "lipstick", "#E8A0B0"))
+    index.upsert_product(_Product("brown", "lipstick", "#6E3B2A"))
+    index.upsert_product(_Product("red-sold-out", "lipstick", "#C1392B", stock_quantity=0))
+    index.upsert_product(_Product("blush", "blush", "#C0392B"))
+
+    matches = index.nearest("lipstick", "#BF3A2C", k=2)
+
+    assert [m["product_id"] for m in matches] == ["red", "brown"]
+    assert matches[0]["delta_e"] < matches[1]["delta_e"]
+    assert index.nearest_lab("lipstick", hex_to_lab("#E8A0B0"), k=1)[0]["product_id"] == "pink"
+
+
+def test_updates_move_and_remove_shades():
+    index = ShadeIndex()
+    index.upsert_product(_Product("a", "lipstick", "#C0392B"))
+    index.upsert_product(_Product("b", "lipstick", "#E8A0B0"))
+
+    index.upsert_product(_Product("a", "blush", "#C0392B"))
+    assert [m["product_id"] for m in index.nearest("lipstick", "#C0392B", k=5)] == ["b"]
+    assert [m["product_id"] for m in index.nearest("blush", "#C0392B", k=5)] == ["a"]
+
+    index.remove_product("b")
+    assert index.nearest("lipstick", "#C0392B") == []
+    assert index.nearest("unknown", "#C0392B") == []